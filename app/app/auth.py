@@ -1,73 +0,0 @@
-# auth_service.py - Authentication Logic
-
-from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from fastapi import HTTPException, status
-import secrets
-
-from app.models import User, APIKey
-from app.schemas import UserCreate
-from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def create_user(db: Session, user_data: UserCreate):
-    user = User(username=user_data.username, 
-                email=user_data.email, 
-                password_hash=hash_password(user_data.password),
-                role='user')
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
-
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(User).filter(User.username == username).first()
-    if user and verify_password(password, user.password_hash):
-        return user
-    return None
-
-def create_access_token(data: dict, expires_delta: timedelta = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-
-def get_current_user(token: str):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        return {"username": username}
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-
-def generate_api_key(db: Session, user_id: int):
-    api_key = secrets.token_hex(32)
-    new_key = APIKey(user_id=user_id, api_key=api_key)
-    db.add(new_key)
-    db.commit()
-    return {"api_key": api_key}
-
-def list_api_keys(db: Session, user_id: int):
-    return db.query(APIKey).filter(APIKey.user_id == user_id).all()
-
-def revoke_api_key(db: Session, key_id: int, user_id: int):
-    api_key = db.query(APIKey).filter(APIKey.id == key_id, APIKey.user_id == user_id).first()
-    if not api_key:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="API Key not found")
-    db.delete(api_key)
-    db.commit()
-    return {"message": "API key revoked"}
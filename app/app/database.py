@@ -1,22 +1,176 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from pgvector.asyncpg import register_vector
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from app.services.metrics import register_collector
 
 # Load environment variables
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# asyncpg driver URL for the async chat path (derived from DATABASE_URL unless set explicitly)
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1) if DATABASE_URL else None,
+)
+# Optional streaming replica for read-only queries (falls back to the primary)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL") or DATABASE_URL
+ASYNC_DATABASE_REPLICA_URL = os.getenv(
+    "ASYNC_DATABASE_REPLICA_URL",
+    DATABASE_REPLICA_URL.replace("postgresql://", "postgresql+asyncpg://", 1) if os.getenv("DATABASE_REPLICA_URL") else ASYNC_DATABASE_URL,
+)
+
+def pool_settings(prefix: str, size: int, overflow: int) -> dict:
+    """Reads <prefix>_POOL_SIZE / _MAX_OVERFLOW / _POOL_TIMEOUT / _POOL_RECYCLE / _POOL_PRE_PING."""
+    return {
+        "pool_size": int(os.getenv(f"{prefix}_POOL_SIZE", size)),
+        "max_overflow": int(os.getenv(f"{prefix}_MAX_OVERFLOW", overflow)),
+        "pool_timeout": float(os.getenv(f"{prefix}_POOL_TIMEOUT", 10)),
+        "pool_recycle": int(os.getenv(f"{prefix}_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.getenv(f"{prefix}_POOL_PRE_PING", "true").lower() == "true",
+    }
+
+# Checkout wait-time counters per pool, keyed by pool name
+pool_wait_stats = {}
+_pool_stats_lock = threading.Lock()
+
+def _empty_wait_stats() -> dict:
+    return {"checkouts": 0, "wait_total_ms": 0.0, "wait_max_ms": 0.0, "timeouts": 0}
+
+def timed_pool(pool_class, name: str):
+    """Pool subclass that records how long each connection checkout waits."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = pool_class._do_get(self)
+        except Exception:
+            with _pool_stats_lock:
+                pool_wait_stats.setdefault(name, _empty_wait_stats())["timeouts"] += 1
+            raise
+        waited_ms = 1000 * (time.perf_counter() - started)
+        with _pool_stats_lock:
+            stats = pool_wait_stats.setdefault(name, _empty_wait_stats())
+            stats["checkouts"] += 1
+            stats["wait_total_ms"] += waited_ms
+            stats["wait_max_ms"] = max(stats["wait_max_ms"], waited_ms)
+        return connection
+
+    return type(f"Timed{pool_class.__name__}", (pool_class,), {"_do_get": _do_get})
+
+def make_engine(name: str, url: str, prefix: str, size: int, overflow: int):
+    return create_engine(url, poolclass=timed_pool(QueuePool, name), **pool_settings(prefix, size, overflow))
+
+def make_async_engine(name: str, url: str, prefix: str, size: int, overflow: int):
+    async_engine = create_async_engine(url, poolclass=timed_pool(AsyncAdaptedQueuePool, name), **pool_settings(prefix, size, overflow))
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def register_vector_codec(dbapi_connection, connection_record):
+        """Teach each asyncpg connection the pgvector type."""
+        dbapi_connection.run_async(register_vector)
+
+    return async_engine
+
+# Primary: writes and the hot chat path
+engine = make_engine("primary", DATABASE_URL, "DB", 5, 10)
+async_engine = make_async_engine("async_primary", ASYNC_DATABASE_URL, "DB_ASYNC", 10, 20)
+# Read-only hot path (KB/vector lookups), on the replica when one is configured
+read_engine = make_engine("read", DATABASE_REPLICA_URL, "DB_READ", 5, 10)
+async_read_engine = make_async_engine("async_read", ASYNC_DATABASE_REPLICA_URL, "DB_ASYNC_READ", 10, 20)
+# Dashboards, exports and admin listings get their own small pool so they can't starve chat traffic
+analytics_engine = make_engine("analytics", DATABASE_REPLICA_URL, "DB_ANALYTICS", 2, 3)
 
-engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AnalyticsSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=analytics_engine)
 Base = declarative_base()
 
-# Dependency for database sessions
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+ENGINES = {
+    "primary": engine,
+    "async_primary": async_engine,
+    "read": read_engine,
+    "async_read": async_read_engine,
+    "analytics": analytics_engine,
+}
+
+def pool_stats() -> dict:
+    """Current utilization and checkout wait times for every pool."""
+    stats = {}
+    for name, db_engine in ENGINES.items():
+        pool = db_engine.pool
+        with _pool_stats_lock:
+            waits = dict(pool_wait_stats.get(name) or _empty_wait_stats())
+        stats[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "checkouts": waits["checkouts"],
+            "avg_wait_ms": round(waits["wait_total_ms"] / waits["checkouts"], 3) if waits["checkouts"] else 0.0,
+            "max_wait_ms": round(waits["wait_max_ms"], 3),
+            "timeouts": waits["timeouts"],
+        }
+    return stats
+
+def _pool_samples():
+    pools = pool_stats()
+    metrics = (
+        ("checked_out", "gauge"), ("overflow", "gauge"), ("size", "gauge"),
+        ("checkouts", "counter"), ("timeouts", "counter"), ("avg_wait_ms", "gauge"), ("max_wait_ms", "gauge"),
+    )
+    return [
+        (f"db_pool_{key}_total" if metric_type == "counter" else f"db_pool_{key}", metric_type, f"Connection pool {key.replace('_', ' ')}",
+         [({"pool": name}, stats[key]) for name, stats in pools.items()])
+        for key, metric_type in metrics
+    ]
+
+register_collector(_pool_samples)
+
+async def dispose_engines():
+    for db_engine in ENGINES.values():
+        result = db_engine.dispose()
+        if hasattr(result, "__await__"):
+            await result
+
+# Dependency for database sessions (primary; use for anything that writes)
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+# Dependency for read-only sessions (replica when configured)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency for dashboard/export/admin reads (separate pool)
+def get_analytics_db():
+    db = AnalyticsSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency for async database sessions
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dependency for async read-only sessions (chat retrieval)
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
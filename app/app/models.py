@@ -1,11 +1,14 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, func, Text, Float, ARRAY
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, DateTime, func, text, Text, Computed, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import TSVECTOR, JSONB
+from pgvector.sqlalchemy import Vector
+from sqlalchemy.orm import relationship, deferred
 from app.database import Base
 
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id", ondelete="CASCADE"))
     first_name = Column(String(50))
     last_name = Column(String(50))
     username = Column(String(50), unique=True, nullable=False)
@@ -21,10 +24,13 @@ class APIKey(Base):
     __tablename__ = "api_keys"
 
     id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id", ondelete="CASCADE"))
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     api_key = Column(String(255), unique=True, nullable=False)
-    status = Column(String(20), default="active")
+    status = Column(String(20), default="active")  # 'active' or 'revoked'
+    last_used = Column(DateTime)  # Written in batches by the API key cache, so it lags by up to one flush interval
     created_at = Column(DateTime, default=func.now())
+    expires_at = Column(DateTime)
 
     owner = relationship("User", back_populates="api_keys")
 
@@ -36,9 +42,17 @@ class Tenant(Base):
     domain = Column(String(255), unique=True, nullable=False)
     created_at = Column(DateTime, default=func.now())
     
+# Text search config of knowledge_base.search_vector (also spelled out in db/init.sql). Queries must
+# use the same one, so it is fixed here rather than configurable: changing it means rebuilding the column
+TEXT_SEARCH_CONFIG = "english"
+
 class KnowledgeBase(Base):
     __tablename__ = "knowledge_base"
-    __table_args__ = {"extend_existing": True}  # Prevents duplicate definition errors
+    __table_args__ = (
+        Index("idx_knowledge_base_search", "search_vector", postgresql_using="gin"),
+        Index("idx_knowledge_base_tenant", "tenant_id", "id"),
+        {"extend_existing": True},  # Prevents duplicate definition errors
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id", ondelete="CASCADE"))
@@ -47,35 +61,121 @@ class KnowledgeBase(Base):
     category = Column(String)
     source = Column(String, nullable=False)  # 'manual' or 'ai_generated'
     created_at = Column(DateTime, default=func.now())
+    content_hash = Column(String(64))  # sha256 of content; drives re-embedding
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(content, '')), 'B')",
+        persisted=True,
+    )))
 
 class VectorIndex(Base):
     __tablename__ = "vector_index"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        Index(
+            "idx_vector_index_embedding_hnsw", "embedding_vector",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding_vector": "vector_cosine_ops"},
+        ),
+        Index("idx_vector_index_tenant", "tenant_id"),
+        Index("idx_vector_index_knowledge", "knowledge_id"),
+        {"extend_existing": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id", ondelete="CASCADE"))
     knowledge_id = Column(Integer, ForeignKey("knowledge_base.id", ondelete="CASCADE"))
-    embedding_vector = Column(ARRAY(Float))  # Vector embedding storage
+    embedding_vector = Column(Vector(384))  # MiniLM embedding (pgvector)
     model_used = Column(String, nullable=False)
+    content_hash = Column(String(64))  # Hash of the knowledge content this vector was built from
     created_at = Column(DateTime, default=func.now())
 
+class EmbeddingJob(Base):
+    __tablename__ = "embedding_jobs"
+    __table_args__ = (
+        Index("idx_embedding_jobs_pending", "available_at", postgresql_where=text("status = 'pending'")),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    tenant_id = Column(Integer)
+    knowledge_id = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # 'pending' or 'failed'
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=func.now())
+    available_at = Column(DateTime, default=func.now())
+
 class ChatbotSettings(Base):
     __tablename__ = "chatbot_settings"
+    __table_args__ = (UniqueConstraint("tenant_id", "setting_key"),)
 
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id", ondelete="CASCADE"))
-    setting_key = Column(String(255), unique=True, nullable=False)
+    setting_key = Column(String(255), nullable=False)
     setting_value = Column(Text, nullable=False)
 
 class ChatLogs(Base):
     __tablename__ = "chat_logs"
+    __table_args__ = (
+        # Keyset pagination of history/log listings (newest first)
+        Index("idx_chat_logs_tenant_user", "tenant_id", "user_id", "created_at", "id"),
+        Index("idx_chat_logs_user", "user_id", "created_at", "id"),
+        Index("idx_chat_logs_tenant_created", "tenant_id", "created_at"),
+        # Time-range scans (rollups) over append-ordered rows
+        Index("idx_chat_logs_created", "created_at", postgresql_using="brin"),
+        # Monthly partitions (see rollup_service); retention drops whole partitions
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id", ondelete="CASCADE"))
     user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     message = Column(Text, nullable=False)
     response = Column(Text, nullable=False)
-    source = Column(String(50), nullable=False)  # 'knowledge_base', 'vector_search', 'ai_model'
+    source = Column(String(50), nullable=False)  # 'knowledge_base', 'vector_search', 'hybrid_search', 'cached_ai_response', 'ai_model'
     user_feedback = Column(String(10))  # 'positive', 'neutral', 'negative'
     intent_detected = Column(String(255))
-    created_at = Column(DateTime, default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime, primary_key=True, default=func.now())  # Partition key, so part of the primary key
+
+class ChatLogRollup(Base):
+    """Hourly chat log counts per tenant and answer source, maintained by the rollup worker."""
+    __tablename__ = "chat_log_rollups"
+
+    tenant_id = Column(Integer, primary_key=True)  # 0 for logs without a tenant
+    bucket = Column(DateTime, primary_key=True)  # Start of the hour (UTC)
+    source = Column(String(50), primary_key=True)
+    requests = Column(Integer, nullable=False)
+    positive_feedback = Column(Integer, nullable=False)
+    neutral_feedback = Column(Integer, nullable=False)
+    negative_feedback = Column(Integer, nullable=False)
+
+class ChatIntentRollup(Base):
+    """Hourly intent_detected counts per tenant."""
+    __tablename__ = "chat_intent_rollups"
+
+    tenant_id = Column(Integer, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    intent = Column(String(255), primary_key=True)
+    requests = Column(Integer, nullable=False)
+
+class ChatLogRollupState(Base):
+    __tablename__ = "chat_log_rollup_state"
+
+    name = Column(String(50), primary_key=True)
+    rolled_up_to = Column(DateTime, nullable=False)  # Rollups are complete for logs created before this
+    updated_at = Column(DateTime, default=func.now())
+
+class RateLimitCounter(Base):
+    __tablename__ = "rate_limit_counters"
+
+    bucket_key = Column(String(255), primary_key=True)
+    window_start = Column(BigInteger, primary_key=True)  # Unix time of the window start
+    hits = Column(Integer, nullable=False, default=0)
+
+class ChatSession(Base):
+    """Conversation memory rows for SESSION_MEMORY_BACKEND=postgres."""
+    __tablename__ = "chat_sessions"
+
+    session_key = Column(Text, primary_key=True)  # JSON of (tenant_id, user_id, session_id)
+    state = Column(JSONB, nullable=False)  # Recent turns, pending turns and the rolling summary
+    expires_at = Column(DateTime, nullable=False)
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_analytics_db
 from app.services.admin_service import get_all_users, update_user, delete_user, get_all_tenants, create_tenant
 from app.services.auth_service import get_current_user
+from app.services.pagination import InvalidCursor, DEFAULT_PAGE_SIZE
 
 router = APIRouter()
 
@@ -11,10 +13,13 @@ def admin_only(user: dict):
         raise HTTPException(status_code=403, detail="Admin access required")
 
 @router.get("/admin/users")
-def list_users(db: Session = Depends(get_db), user: dict = Depends(get_current_user)):
-    """List all users (Admin only)."""
+def list_users(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, db: Session = Depends(get_analytics_db), user: dict = Depends(get_current_user)):
+    """List users one page at a time (Admin only)."""
     admin_only(user)
-    return get_all_users(db)
+    try:
+        return get_all_users(db, limit, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.put("/admin/users/update/{id}")
 def modify_user(id: int, update_data: dict, db: Session = Depends(get_db), user: dict = Depends(get_current_user)):
@@ -35,10 +40,13 @@ def remove_user(id: int, db: Session = Depends(get_db), user: dict = Depends(get
     return {"message": "User deleted successfully"}
 
 @router.get("/admin/tenants")
-def list_tenants(db: Session = Depends(get_db), user: dict = Depends(get_current_user)):
-    """List all tenants (Admin only)."""
+def list_tenants(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, db: Session = Depends(get_analytics_db), user: dict = Depends(get_current_user)):
+    """List tenants one page at a time (Admin only)."""
     admin_only(user)
-    return get_all_tenants(db)
+    try:
+        return get_all_tenants(db, limit, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.post("/admin/tenants/create")
 def new_tenant(tenant_data: dict, db: Session = Depends(get_db), user: dict = Depends(get_current_user)):
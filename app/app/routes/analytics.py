@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional
+from datetime import datetime
+from sqlalchemy.orm import Session
+from app.database import get_analytics_db
+from app.services.auth_service import get_current_user
+from app.services.api_key_service import require_api_key, resolve_tenant, ApiKeyPrincipal
+from app.services.analytics_service import get_source_summary, get_request_timeseries, get_top_intents, InvalidRange
+from app.services.rollup_service import rollup_status
+
+router = APIRouter()
+
+@router.get("/analytics/sources")
+def source_summary(tenant_id: Optional[int] = None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   db: Session = Depends(get_analytics_db), principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
+    """Get requests, hit rate and feedback ratios per answer source (from hourly rollups)."""
+    try:
+        return get_source_summary(db, resolve_tenant(principal, tenant_id), start, end)
+    except InvalidRange as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@router.get("/analytics/timeseries")
+def request_timeseries(tenant_id: Optional[int] = None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       interval: str = "day", db: Session = Depends(get_analytics_db),
+                       principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
+    """Get requests and feedback per hour/day/week/month and answer source."""
+    try:
+        return get_request_timeseries(db, resolve_tenant(principal, tenant_id), start, end, interval)
+    except InvalidRange as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@router.get("/analytics/intents")
+def top_intents(tenant_id: Optional[int] = None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                limit: int = 20, db: Session = Depends(get_analytics_db),
+                principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
+    """Get the most frequent detected intents."""
+    try:
+        return get_top_intents(db, resolve_tenant(principal, tenant_id), start, end, min(max(limit, 1), 100))
+    except InvalidRange as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@router.get("/analytics/rollups/stats")
+def rollup_stats(db: Session = Depends(get_analytics_db), user: dict = Depends(get_current_user)):
+    """Get the rollup watermark and lag, chat_logs partitions and worker counters (Admin only)."""
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return rollup_status(db)
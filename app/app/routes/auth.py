@@ -1,15 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_db, get_async_db
 from .. import models, schemas
 from ..services import auth_service
+from ..services.auth_service import get_current_user
+from ..services.api_key_service import api_key_cache, key_digest, notify_api_key_changed
 import uuid
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+# Register and login are async so bcrypt waits on the password pool instead of holding a request thread
+
 @router.post("/register", response_model=schemas.UserResponse)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    hashed_password = auth_service.get_password_hash(user.password)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    hashed_password = await auth_service.get_password_hash_async(user.password)
     db_user = models.User(
         first_name=user.first_name,
         last_name=user.last_name,
@@ -18,16 +24,19 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         password_hash=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/login", response_model=schemas.TokenResponse)
-def login(user: schemas.LoginRequest, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
-    if not db_user or not auth_service.verify_password(user.password, db_user.password_hash):
+async def login(user: schemas.LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    db_user = (await db.execute(
+        select(models.User.id, models.User.username, models.User.password_hash, models.User.role)
+        .where(models.User.username == user.username, models.User.is_active.is_not(False))
+    )).first()
+    if not db_user or not await auth_service.verify_password_async(user.password, db_user.password_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    access_token = auth_service.create_access_token(data={"sub": db_user.username})
+    access_token = auth_service.create_access_token(data={"sub": db_user.username, "uid": db_user.id, "role": db_user.role})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/logout")
@@ -35,30 +44,41 @@ def logout():
     return {"message": "Logged out successfully"}
 
 @router.get("/me", response_model=schemas.UserResponse)
-def get_current_user(db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == 1).first()  # Replace with real user fetching logic
+def read_current_user(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    user = db.query(models.User).filter(models.User.id == current_user["id"]).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 @router.post("/api-key/generate", response_model=schemas.APIKeyResponse)
-def generate_api_key(db: Session = Depends(get_db)):
+def generate_api_key(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    # Keys inherit the owner's tenant; a tenantless key would be refused by every tenant-scoped route
+    tenant_id = db.query(models.User.tenant_id).filter(models.User.id == current_user["id"]).scalar()
+    if tenant_id is None:
+        raise HTTPException(status_code=400, detail="User is not assigned to a tenant")
     api_key = str(uuid.uuid4())
-    new_api_key = models.APIKey(user_id=1, api_key=api_key)  # Replace with real user fetching logic
+    new_api_key = models.APIKey(user_id=current_user["id"], tenant_id=tenant_id, api_key=api_key)
     db.add(new_api_key)
     db.commit()
     db.refresh(new_api_key)
     return new_api_key
 
 @router.get("/api-key/list", response_model=list[schemas.APIKeyResponse])
-def list_api_keys(db: Session = Depends(get_db)):
-    return db.query(models.APIKey).filter(models.APIKey.user_id == 1).all()  # Replace with real user fetching logic
+def list_api_keys(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    return db.query(models.APIKey).filter(models.APIKey.user_id == current_user["id"]).all()
 
 @router.delete("/api-key/revoke/{key_id}")
-def revoke_api_key(key_id: int, db: Session = Depends(get_db)):
-    api_key = db.query(models.APIKey).filter(models.APIKey.id == key_id, models.APIKey.user_id == 1).first()
+def revoke_api_key(key_id: int, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    api_key = db.query(models.APIKey).filter(models.APIKey.id == key_id, models.APIKey.user_id == current_user["id"]).first()
     if not api_key:
         raise HTTPException(status_code=404, detail="API Key not found")
+    notify_api_key_changed(db, api_key.api_key)
     db.delete(api_key)
     db.commit()
+    api_key_cache.invalidate(key_digest(api_key.api_key))
     return {"message": "API key revoked"}
+
+@router.get("/stats")
+def auth_stats():
+    """Password pool load and token claims cache counters."""
+    return {"password_pool": auth_service.password_stats, "claims_cache": {**auth_service.claims_cache_stats, "entries": len(auth_service._claims_cache)}}
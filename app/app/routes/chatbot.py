@@ -1,41 +1,137 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.services.chatbot_service import handle_chat_query, get_chat_history, get_chatbot_settings, update_chatbot_settings
+import json
+from app.database import get_db, get_analytics_db, AnalyticsSessionLocal
+from app.services.response_cache import response_cache
+from app.services.rate_limiter import RateLimitExceeded
+from app.services.log_writer import chat_log_writer
+from app.services.single_flight import llm_flights
+from app.services.llm_client import llm_client
+from app.services.session_memory import session_memory
+from app.services.settings_cache import settings_cache
+from app.services.api_key_service import require_api_key, resolve_tenant, resolve_user, api_key_cache, ApiKeyPrincipal
+from app.services.logs_service import chat_log_export_query
+from app.services.pagination import stream_export, export_media_type, InvalidCursor, DEFAULT_PAGE_SIZE, EXPORT_FORMATS
+from app.services.chatbot_service import handle_chat_query, stream_chat_query, RATE_LIMIT_MESSAGE, get_chat_history, get_chatbot_settings, update_chatbot_settings
 
 router = APIRouter()
 
 class ChatQuery(BaseModel):
     message: str
+    user_id: Optional[int] = None
+    tenant_id: Optional[int] = None
+    session_id: Optional[str] = None  # Enables conversation memory across queries
+    stream: bool = False
 
 class ChatbotSettingsUpdate(BaseModel):
     setting_key: str
     setting_value: str
+    tenant_id: Optional[int] = None
 
 @router.post("/chatbot/query")
-def chatbot_query(query: ChatQuery, db: Session = Depends(get_db)):
+async def chatbot_query(query: ChatQuery, principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
     """Process user query and fetch chatbot response."""
-    response = handle_chat_query(db, query.message)
+    query.tenant_id = resolve_tenant(principal, query.tenant_id)
+    if query.stream:
+        chunks = stream_chat_query(query.message, query.user_id, query.tenant_id, query.session_id)
+        try:
+            # Retrieval and the rate limit run before the first chunk: a limited request gets a real 429
+            first = await anext(chunks)
+        except RateLimitExceeded as exc:
+            raise HTTPException(status_code=429, detail=RATE_LIMIT_MESSAGE, headers=exc.decision.headers())
+        except StopAsyncIteration:
+            first = None
+        return StreamingResponse(
+            sse_chat_events(first, chunks),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    try:
+        response = await handle_chat_query(query.message, query.user_id, query.tenant_id, query.session_id)
+    except RateLimitExceeded as exc:
+        raise HTTPException(status_code=429, detail=RATE_LIMIT_MESSAGE, headers=exc.decision.headers())
     if not response:
         raise HTTPException(status_code=404, detail="No suitable response found")
     return {"response": response}
 
+async def sse_chat_events(first: Optional[str], chunks):
+    """Formats streamed response chunks as Server-Sent Events."""
+    if first is not None:
+        yield f"data: {json.dumps({'token': first})}\n\n"
+    async for token in chunks:
+        yield f"data: {json.dumps({'token': token})}\n\n"
+    yield "event: done\ndata: {}\n\n"
+
+@router.get("/chatbot/cache/stats")
+def chatbot_cache_stats():
+    """Get response cache size and hit/miss counters."""
+    return response_cache.stats()
+
+@router.get("/chatbot/api-keys/stats")
+def api_key_cache_stats():
+    """Get API key cache hit/miss counters and pending last_used writes."""
+    return api_key_cache.get_stats()
+
+@router.get("/chatbot/coalescing/stats")
+def llm_coalescing_stats():
+    """Get upstream LLM calls, callers that joined an in-flight call, and failures."""
+    return llm_flights.get_stats()
+
+@router.get("/chatbot/llm/stats")
+def llm_client_stats():
+    """Get per-model LLM latency, errors, retries, fallbacks and circuit breaker state."""
+    return llm_client.get_stats()
+
+@router.get("/chatbot/sessions/stats")
+async def session_memory_stats():
+    """Get conversation memory sessions, evictions and summary updates."""
+    return session_memory.get_stats()
+
+@router.get("/chatbot/logs/stats")
+def chatbot_log_writer_stats():
+    """Get chat log write-behind queue depth and flushed/dropped counters."""
+    return chat_log_writer.get_stats()
+
 @router.get("/chatbot/history")
-def chatbot_history(db: Session = Depends(get_db)):
-    """Retrieve past chatbot interactions."""
-    history = get_chat_history(db, user["id"])
-    return history
+def chatbot_history(user_id: Optional[int] = None, tenant_id: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                    db: Session = Depends(get_analytics_db), principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
+    """Retrieve past chatbot interactions, one page at a time (pass next_cursor back to continue)."""
+    user_id, tenant_id = resolve_user(principal, user_id), resolve_tenant(principal, tenant_id)
+    try:
+        return get_chat_history(db, user_id, tenant_id, limit, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/chatbot/history/export")
+def chatbot_history_export(user_id: Optional[int] = None, tenant_id: Optional[int] = None, format: str = "ndjson",
+                           principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
+    """Stream a user's full chat history as NDJSON or CSV."""
+    user_id, tenant_id = resolve_user(principal, user_id), resolve_tenant(principal, tenant_id)
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'")
+    return StreamingResponse(
+        stream_export(AnalyticsSessionLocal, chat_log_export_query(user_id, tenant_id), format),
+        media_type=export_media_type(format),
+    )
 
 @router.get("/chatbot/settings")
-def chatbot_settings(db: Session = Depends(get_db)):
+def chatbot_settings(tenant_id: Optional[int] = None, principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
     """Get chatbot settings."""
-    return get_chatbot_settings(db)
+    return get_chatbot_settings(resolve_tenant(principal, tenant_id))
+
+@router.get("/chatbot/settings/cache/stats")
+def chatbot_settings_cache_stats():
+    """Get settings cache hit/miss counters and change-listener status."""
+    return settings_cache.get_stats()
 
 @router.put("/chatbot/settings/update")
-def update_settings(update_data: ChatbotSettingsUpdate, db: Session = Depends(get_db)):
+def update_settings(update_data: ChatbotSettingsUpdate, db: Session = Depends(get_db), principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
     """Update chatbot settings."""
-    success = update_chatbot_settings(db, update_data.setting_key, update_data.setting_value)
+    tenant_id = resolve_tenant(principal, update_data.tenant_id)
+    success = update_chatbot_settings(db, update_data.setting_key, update_data.setting_value, tenant_id)
     if not success:
         raise HTTPException(status_code=400, detail="Failed to update settings")
     return {"message": "Settings updated successfully"}
@@ -1,8 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends
+import io
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_read_db, get_analytics_db, AnalyticsSessionLocal
 from app.models import KnowledgeBase
+from app.services.knowledge_service import search_knowledge_entries, get_all_knowledge_entries, knowledge_query, TEXT_SEARCH_LIMIT
+from app.services.pagination import stream_export, export_media_type, InvalidCursor, DEFAULT_PAGE_SIZE, EXPORT_FORMATS
+from app.services.sync_service import enqueue_embedding_job, queue_stats
+from app.services.ingestion_service import ingest_documents, parse_records, detect_format, IngestionError, INGEST_FORMATS
 
 router = APIRouter()
 
@@ -13,20 +20,62 @@ class KnowledgeBaseEntry(BaseModel):
     source: str  # 'manual' or 'ai_generated'
 
 @router.get("/knowledge-base/entries")
-def get_knowledge_entries(db: Session = Depends(get_db)):
-    """Retrieve all knowledge base entries."""
-    entries = db.query(KnowledgeBase).all()
-    return entries
+def get_knowledge_entries(tenant_id: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, db: Session = Depends(get_analytics_db)):
+    """Retrieve knowledge base entries one page at a time (pass next_cursor back to continue)."""
+    try:
+        return get_all_knowledge_entries(db, tenant_id, limit, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/knowledge-base/entries/export")
+def export_knowledge_entries(tenant_id: Optional[int] = None, format: str = "ndjson"):
+    """Stream all knowledge base entries as NDJSON or CSV."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'")
+    return StreamingResponse(
+        stream_export(AnalyticsSessionLocal, knowledge_query(tenant_id).order_by(KnowledgeBase.id), format),
+        media_type=export_media_type(format),
+    )
+
+@router.get("/knowledge-base/search")
+def search_knowledge_base(q: str, tenant_id: Optional[int] = None, limit: int = TEXT_SEARCH_LIMIT, db: Session = Depends(get_read_db)):
+    """Full-text search over knowledge base titles and content, best match first."""
+    return search_knowledge_entries(db, q, tenant_id, min(limit, 50))
 
 @router.post("/knowledge-base/add")
 def add_knowledge_entry(entry: KnowledgeBaseEntry, db: Session = Depends(get_db)):
     """Add a new knowledge base entry."""
     new_entry = KnowledgeBase(**entry.dict())
     db.add(new_entry)
+    enqueue_embedding_job(db, new_entry)
     db.commit()
     db.refresh(new_entry)
     return {"message": "Entry added successfully", "entry": new_entry}
 
+@router.post("/knowledge-base/ingest")
+def ingest_knowledge_file(
+    file: UploadFile = File(...),
+    tenant_id: Optional[int] = Form(None),
+    format: Optional[str] = Form(None),
+    category: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+):
+    """Bulk-import a JSONL/CSV/Markdown/text file: chunk, embed in batches and bulk insert."""
+    fmt = format or detect_format(file.filename)
+    if fmt not in INGEST_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}'")
+    lines = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    documents = parse_records(lines, fmt, default_title=file.filename or "Untitled", category=category)
+    try:
+        report = ingest_documents(db, documents, tenant_id)
+    except IngestionError as exc:
+        # Batches committed before the failure stay in the knowledge base: say how much
+        committed = {"committed_documents": exc.report["committed_documents"], "committed_chunks": exc.report["committed_chunks"]}
+        if isinstance(exc.__cause__, (ValueError, KeyError)):
+            raise HTTPException(status_code=400, detail={"message": f"Could not parse input: {exc}", **committed})
+        raise HTTPException(status_code=500, detail={"message": "Ingestion failed", **committed})
+    return {"message": "Ingestion completed", "report": report}
+
 @router.put("/knowledge-base/update/{id}")
 def update_knowledge_entry(id: int, entry: KnowledgeBaseEntry, db: Session = Depends(get_db)):
     """Update an existing knowledge base entry."""
@@ -35,6 +84,7 @@ def update_knowledge_entry(id: int, entry: KnowledgeBaseEntry, db: Session = Dep
         raise HTTPException(status_code=404, detail="Entry not found")
     for key, value in entry.dict().items():
         setattr(db_entry, key, value)
+    enqueue_embedding_job(db, db_entry)  # No-op unless the content changed
     db.commit()
     return {"message": "Entry updated successfully"}
 
@@ -47,3 +97,8 @@ def delete_knowledge_entry(id: int, db: Session = Depends(get_db)):
     db.delete(db_entry)
     db.commit()
     return {"message": "Entry deleted successfully"}
+
+@router.get("/knowledge-base/sync/stats")
+def embedding_sync_stats(db: Session = Depends(get_db)):
+    """Get re-embedding queue depth, lag and worker counters."""
+    return queue_stats(db)
@@ -1,18 +1,34 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.services.logs_service import get_all_logs, get_log_by_id, delete_log_entry
+from app.database import get_db, get_analytics_db, AnalyticsSessionLocal
+from app.services.logs_service import get_all_logs, get_log_by_id, delete_log_entry, chat_log_export_query
+from app.services.auth_service import get_current_user
+from app.services.pagination import stream_export, export_media_type, InvalidCursor, DEFAULT_PAGE_SIZE, EXPORT_FORMATS
 
 router = APIRouter()
 
 @router.get("/logs/conversations")
-def get_chat_logs(db: Session = Depends(get_db)):
-    """Retrieve all chatbot conversation logs."""
-    logs = get_all_logs(db, user["id"])
-    return logs
+def get_chat_logs(tenant_id: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, db: Session = Depends(get_analytics_db), user: dict = Depends(get_current_user)):
+    """Retrieve chatbot conversation logs, one page at a time (pass next_cursor back to continue)."""
+    try:
+        return get_all_logs(db, user["id"], tenant_id, limit, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/logs/conversations/export")
+def export_chat_logs(tenant_id: Optional[int] = None, format: str = "ndjson", user: dict = Depends(get_current_user)):
+    """Stream all conversation logs as NDJSON or CSV."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'")
+    return StreamingResponse(
+        stream_export(AnalyticsSessionLocal, chat_log_export_query(user["id"], tenant_id), format),
+        media_type=export_media_type(format),
+    )
 
 @router.get("/logs/conversations/{id}")
-def get_chat_log(id: int, db: Session = Depends(get_db)):
+def get_chat_log(id: int, db: Session = Depends(get_db), user: dict = Depends(get_current_user)):
     """Retrieve a specific chatbot conversation log."""
     log_entry = get_log_by_id(db, id, user["id"])
     if not log_entry:
@@ -20,7 +36,7 @@ def get_chat_log(id: int, db: Session = Depends(get_db)):
     return log_entry
 
 @router.delete("/logs/delete/{id}")
-def delete_chat_log(id: int, db: Session = Depends(get_db)):
+def delete_chat_log(id: int, db: Session = Depends(get_db), user: dict = Depends(get_current_user)):
     """Delete a conversation log."""
     success = delete_log_entry(db, id, user["id"])
     if not success:
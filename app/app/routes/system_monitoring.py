@@ -1,8 +1,10 @@
-import psutil
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, pool_stats
+from app.services.auth_service import get_current_user
 from app.services.system_monitoring_service import get_api_usage_stats, get_system_logs
+from app.services.metrics import render_prometheus, system_sampler
 router = APIRouter()
 
 def admin_only(user: dict):
@@ -12,16 +14,27 @@ def admin_only(user: dict):
 @router.get("/system/health")
 def system_health():
     """Check system health status."""
-    return {"status": "ok", "cpu_usage": psutil.cpu_percent(), "memory_usage": psutil.virtual_memory().percent}
+    system = system_sampler.current()
+    return {"status": "ok", "cpu_usage": system["cpu_usage"], "memory_usage": system["memory_usage"]}
+
+@router.get("/system/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint: chat stage latencies, cache, LLM, pool and system metrics."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@router.get("/system/db-pools")
+def database_pools():
+    """Get connection pool utilization and checkout wait times."""
+    return pool_stats()
 
 @router.get("/system/stats")
-def system_stats(db: Session = Depends(get_db)):
+def system_stats(db: Session = Depends(get_db), user: dict = Depends(get_current_user)):
     """Get API usage and performance stats (Admin only)."""
     admin_only(user)
     return get_api_usage_stats(db)
 
 @router.get("/system/logs")
-def system_logs():
+def system_logs(user: dict = Depends(get_current_user)):
     """Fetch system logs (Admin only)."""
     admin_only(user)
     return get_system_logs()
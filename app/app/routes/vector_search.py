@@ -1,46 +1,83 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
+from typing import Optional
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_read_db, get_analytics_db
 from app.services.vector_service import (
     store_vector_embedding,
     search_vector_entries,
     get_all_vector_entries,
-    delete_vector_entry
+    delete_vector_entry,
+    embedding_engine,
+    embedding_backend,
+    VECTOR_SEARCH_K,
+    VECTOR_MIN_SIMILARITY,
 )
+from app.services.retrieval_service import hybrid_search
+from app.services.api_key_service import require_api_key, resolve_tenant, ApiKeyPrincipal
 
 router = APIRouter()
 
 class VectorSearchQuery(BaseModel):
     query_text: str  # Text to search for
+    tenant_id: Optional[int] = None
+    k: int = VECTOR_SEARCH_K
+    min_similarity: float = VECTOR_MIN_SIMILARITY
+    ef_search: Optional[int] = None  # HNSW candidate list size (recall vs latency)
 
 class VectorStoreEntry(BaseModel):
     knowledge_id: int
     text: str  # Text to generate embedding from
+    tenant_id: Optional[int] = None
 
 @router.post("/vector-search/query")
-def search_vector(query: VectorSearchQuery, db: Session = Depends(get_db)):
+def search_vector(query: VectorSearchQuery, db: Session = Depends(get_read_db), principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
     """Perform a similarity search based on input text."""
-    results = search_vector_entries(db, query.query_text)
+    query.tenant_id = resolve_tenant(principal, query.tenant_id)
+    results = search_vector_entries(
+        db, query.query_text, query.tenant_id, min(query.k, 100), query.min_similarity, query.ef_search
+    )
     if not results:
         raise HTTPException(status_code=404, detail="No similar entries found")
     return results
 
+@router.post("/vector-search/hybrid")
+def search_hybrid(query: VectorSearchQuery, db: Session = Depends(get_read_db), principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
+    """Full-text and similarity search fused by reciprocal rank, with each entry's scores and source."""
+    query.tenant_id = resolve_tenant(principal, query.tenant_id)
+    results = hybrid_search(
+        db, query.query_text, query.tenant_id, min(query.k, 100), query.min_similarity, query.ef_search
+    )
+    if not results:
+        raise HTTPException(status_code=404, detail="No matching entries found")
+    return results
+
 @router.post("/vector-search/store")
-def store_vector(entry: VectorStoreEntry, db: Session = Depends(get_db)):
+def store_vector(entry: VectorStoreEntry, db: Session = Depends(get_db), principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
     """Store a new vector embedding from text."""
-    new_vector = store_vector_embedding(db, entry.knowledge_id, entry.text)
-    return {"message": "Vector entry stored successfully", "entry": new_vector}
+    tenant_id = resolve_tenant(principal, entry.tenant_id)
+    new_vector = store_vector_embedding(db, entry.knowledge_id, entry.text, tenant_id=tenant_id)
+    return {"message": "Vector entry stored successfully", "entry": {"id": new_vector.id, "knowledge_id": new_vector.knowledge_id}}
 
 @router.get("/vector-search/entries")
-def get_vector_entries(db: Session = Depends(get_db)):
+def get_vector_entries(tenant_id: Optional[int] = None, db: Session = Depends(get_analytics_db), principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
     """Retrieve all stored vector embeddings."""
-    return get_all_vector_entries(db)
+    return get_all_vector_entries(db, resolve_tenant(principal, tenant_id))
 
 @router.delete("/vector-search/delete/{id}")
-def delete_vector(id: int, db: Session = Depends(get_db)):
+def delete_vector(id: int, db: Session = Depends(get_db), principal: Optional[ApiKeyPrincipal] = Depends(require_api_key)):
     """Delete a vector entry by ID."""
-    deleted_entry = delete_vector_entry(db, id)
+    deleted_entry = delete_vector_entry(db, id, resolve_tenant(principal, None))
     if not deleted_entry:
         raise HTTPException(status_code=404, detail="Vector entry not found")
     return {"message": "Vector entry deleted successfully"}
+
+@router.get("/vector-search/embedding/stats")
+def embedding_stats():
+    """Get embedding micro-batch size and queue-wait metrics."""
+    return embedding_engine.stats()
+
+@router.get("/vector-search/embedding/backend")
+def embedding_backend_report():
+    """Get the embedding backend and its load/warm-up report."""
+    return embedding_backend.report
@@ -1,9 +1,15 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.models import User, Tenant
+from app.services.pagination import keyset_page, DEFAULT_PAGE_SIZE
 
-def get_all_users(db: Session):
-    """Retrieves all users from the database."""
-    return db.query(User).all()
+# Listed columns (password hashes never leave the service)
+USER_COLUMNS = (User.id, User.first_name, User.last_name, User.username, User.email, User.role, User.is_active, User.created_at)
+TENANT_COLUMNS = (Tenant.id, Tenant.name, Tenant.domain, Tenant.created_at)
+
+def get_all_users(db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    """Retrieves one page of users, ordered by ID."""
+    return keyset_page(db, select(*USER_COLUMNS), [User.id], limit, cursor)
 
 def update_user(db: Session, user_id: int, update_data: dict):
     """Updates user details."""
@@ -24,9 +30,9 @@ def delete_user(db: Session, user_id: int):
     db.commit()
     return True
 
-def get_all_tenants(db: Session):
-    """Retrieves all tenants from the database."""
-    return db.query(Tenant).all()
+def get_all_tenants(db: Session, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    """Retrieves one page of tenants, ordered by ID."""
+    return keyset_page(db, select(*TENANT_COLUMNS), [Tenant.id], limit, cursor)
 
 def create_tenant(db: Session, tenant_data: dict):
     """Creates a new tenant."""
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.orm import Session
+from app.models import ChatLogRollup, ChatIntentRollup
+
+# Dashboards read only the hourly rollups (see rollup_service), never chat_logs itself
+ANALYTICS_DEFAULT_DAYS = 7
+ANALYTICS_INTERVALS = ("hour", "day", "week", "month")
+# Answers served without an LLM call; their share of all requests is the hit rate
+STORED_ANSWER_SOURCES = ("knowledge_base", "vector_search", "hybrid_search", "cached_ai_response")
+FEEDBACK_COLUMNS = (ChatLogRollup.positive_feedback, ChatLogRollup.neutral_feedback, ChatLogRollup.negative_feedback)
+
+class InvalidRange(ValueError):
+    pass
+
+def resolve_range(start: datetime = None, end: datetime = None) -> tuple:
+    """Defaults to the last ANALYTICS_DEFAULT_DAYS days (UTC)."""
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=ANALYTICS_DEFAULT_DAYS)
+    if start >= end:
+        raise InvalidRange("start must be before end")
+    return start, end
+
+def _scoped(stmt, table, tenant_id: int, start: datetime, end: datetime):
+    """Filters to the tenant (all tenants when None) and the hour buckets overlapping [start, end)."""
+    stmt = stmt.where(table.bucket >= func.date_trunc("hour", start), table.bucket < end)
+    if tenant_id is not None:
+        stmt = stmt.where(table.tenant_id == tenant_id)
+    return stmt
+
+def _feedback(positive: int, neutral: int, negative: int) -> dict:
+    rated = positive + neutral + negative
+    return {
+        "positive": positive, "neutral": neutral, "negative": negative,
+        "positive_ratio": round(positive / rated, 4) if rated else None,
+    }
+
+def get_source_summary(db: Session, tenant_id: int = None, start: datetime = None, end: datetime = None) -> dict:
+    """Requests, share and feedback per answer source, plus the overall stored-answer hit rate."""
+    start, end = resolve_range(start, end)
+    rows = db.execute(_scoped(
+        select(ChatLogRollup.source, func.sum(ChatLogRollup.requests), *[func.sum(column) for column in FEEDBACK_COLUMNS])
+        .group_by(ChatLogRollup.source),
+        ChatLogRollup, tenant_id, start, end,
+    )).all()
+    total = sum(row[1] for row in rows)
+    stored = sum(row[1] for row in rows if row.source in STORED_ANSWER_SOURCES)
+    sources = [
+        {"source": row.source, "requests": row[1], "share": round(row[1] / total, 4), **_feedback(*row[2:])}
+        for row in sorted(rows, key=lambda row: row[1], reverse=True)
+    ]
+    totals = [sum(row[i] for row in rows) for i in range(2, 2 + len(FEEDBACK_COLUMNS))]
+    return {
+        "tenant_id": tenant_id, "start": start, "end": end,
+        "requests": total,
+        "hit_rate": round(stored / total, 4) if total else None,
+        "feedback": _feedback(*totals),
+        "sources": sources,
+    }
+
+def get_request_timeseries(db: Session, tenant_id: int = None, start: datetime = None, end: datetime = None,
+                           interval: str = "day") -> list:
+    """Requests and feedback per `interval` bucket and source, oldest first."""
+    if interval not in ANALYTICS_INTERVALS:
+        raise InvalidRange(f"interval must be one of {', '.join(ANALYTICS_INTERVALS)}")
+    start, end = resolve_range(start, end)
+    bucket = func.date_trunc(literal_column(f"'{interval}'"), ChatLogRollup.bucket).label("bucket")  # Grouped: inline, not bound
+    rows = db.execute(_scoped(
+        select(bucket, ChatLogRollup.source, func.sum(ChatLogRollup.requests), *[func.sum(column) for column in FEEDBACK_COLUMNS])
+        .group_by(bucket, ChatLogRollup.source).order_by(bucket, ChatLogRollup.source),
+        ChatLogRollup, tenant_id, start, end,
+    )).all()
+    return [{"bucket": row.bucket, "source": row.source, "requests": row[2], **_feedback(*row[3:])} for row in rows]
+
+def get_top_intents(db: Session, tenant_id: int = None, start: datetime = None, end: datetime = None, limit: int = 20) -> list:
+    """Most frequent intent_detected values in the range."""
+    start, end = resolve_range(start, end)
+    requests = func.sum(ChatIntentRollup.requests).label("requests")
+    rows = db.execute(_scoped(
+        select(ChatIntentRollup.intent, requests).group_by(ChatIntentRollup.intent).order_by(requests.desc()).limit(limit),
+        ChatIntentRollup, tenant_id, start, end,
+    )).all()
+    return [{"intent": row.intent, "requests": row.requests} for row in rows]
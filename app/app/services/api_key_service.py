@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple, Optional
+from fastapi import Header, HTTPException, status
+from sqlalchemy import select, update, bindparam
+from sqlalchemy.orm import Session
+from app.database import AsyncSessionLocal, async_engine
+from app.models import APIKey
+from app.services.change_listener import change_listener, notify_change
+from app.services.metrics import register_stats
+
+# API key authentication for widget/API traffic
+API_KEY_AUTH = os.getenv("API_KEY_AUTH", "true").lower() == "true"
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", 300))
+API_KEY_CACHE_MAX_ENTRIES = int(os.getenv("API_KEY_CACHE_MAX_ENTRIES", 10000))
+API_KEY_NEGATIVE_TTL = float(os.getenv("API_KEY_NEGATIVE_TTL", 60))
+API_KEY_NEGATIVE_MAX_ENTRIES = int(os.getenv("API_KEY_NEGATIVE_MAX_ENTRIES", 100000))
+API_KEY_LAST_USED_FLUSH_INTERVAL = float(os.getenv("API_KEY_LAST_USED_FLUSH_INTERVAL", 30))
+API_KEY_NOTIFY_CHANNEL = "api_keys_changed"
+
+logger = logging.getLogger(__name__)
+
+class ApiKeyPrincipal(NamedTuple):
+    key_id: int
+    tenant_id: Optional[int]
+    user_id: Optional[int]
+
+def key_digest(api_key: str) -> str:
+    """Keys are cached by SHA-256 digest so raw keys don't sit in worker memory."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+def notify_api_key_changed(db: Session, api_key: str):
+    """Drops the key from every worker's cache once the caller's transaction commits."""
+    notify_change(db, API_KEY_NOTIFY_CHANNEL, key_digest(api_key))
+
+class ApiKeyCache:
+    """LRU of valid keys plus a negative LRU of unknown/revoked ones, both with TTLs.
+
+    Only misses in both reach the database; `last_used` is collected in memory
+    and written back in one batched UPDATE per flush interval.
+    """
+
+    def __init__(self, ttl: float = API_KEY_CACHE_TTL, max_entries: int = API_KEY_CACHE_MAX_ENTRIES,
+                 negative_ttl: float = API_KEY_NEGATIVE_TTL, negative_max_entries: int = API_KEY_NEGATIVE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.negative_max_entries = negative_max_entries
+        self._valid = OrderedDict()  # digest -> (expires_at, principal, key_expires_at)
+        self._invalid = OrderedDict()  # digest -> expires_at
+        self._generation = 0  # Bumped on every invalidation so in-flight lookups don't re-cache stale rows
+        self._last_used = {}  # key_id -> datetime of the latest use not yet written
+        self._lock = threading.Lock()
+        self._task = None
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "rejected": 0, "invalidations": 0, "last_used_flushed": 0}
+
+    def _cached(self, digest: str, now: float):
+        """Returns (found, principal): principal is None for a cached rejection."""
+        entry = self._valid.get(digest)
+        if entry:
+            expires_at, principal, key_expires_at = entry
+            if expires_at > now and (key_expires_at is None or key_expires_at > datetime.utcnow()):
+                self._valid.move_to_end(digest)
+                self.stats["hits"] += 1
+                return True, principal
+            del self._valid[digest]
+        rejected_until = self._invalid.get(digest)
+        if rejected_until:
+            if rejected_until > now:
+                self.stats["negative_hits"] += 1
+                return True, None
+            del self._invalid[digest]
+        return False, None
+
+    def _remember(self, digest: str, generation: int, row):
+        now = time.monotonic()
+        with self._lock:
+            if generation != self._generation:
+                return
+            if row is None:
+                self._invalid[digest] = now + self.negative_ttl
+                if len(self._invalid) > self.negative_max_entries:
+                    self._invalid.popitem(last=False)
+                return
+            self._valid[digest] = (now + self.ttl, ApiKeyPrincipal(row.id, row.tenant_id, row.user_id), row.expires_at)
+            if len(self._valid) > self.max_entries:
+                self._valid.popitem(last=False)
+
+    async def authenticate(self, api_key: str) -> Optional[ApiKeyPrincipal]:
+        digest = key_digest(api_key)
+        found, principal = self._cached(digest, time.monotonic())
+        if not found:
+            self.stats["misses"] += 1
+            generation = self._generation
+            # Primary, not a replica: a revocation must be visible on the next miss
+            async with AsyncSessionLocal() as db:
+                row = (await db.execute(
+                    select(APIKey.id, APIKey.tenant_id, APIKey.user_id, APIKey.expires_at).where(
+                        APIKey.api_key == api_key, APIKey.status == "active"
+                    )
+                )).first()
+            if row is not None and row.expires_at is not None and row.expires_at <= datetime.utcnow():
+                row = None
+            self._remember(digest, generation, row)
+            principal = ApiKeyPrincipal(row.id, row.tenant_id, row.user_id) if row else None
+        if principal is None:
+            self.stats["rejected"] += 1
+            return None
+        self._last_used[principal.key_id] = datetime.utcnow()
+        return principal
+
+    def invalidate(self, digest: str = None):
+        """Forgets one key (by digest), or everything when digest is None."""
+        with self._lock:
+            if digest is None:
+                self._valid.clear()
+                self._invalid.clear()
+            else:
+                self._valid.pop(digest, None)
+                self._invalid.pop(digest, None)
+            self._generation += 1
+        self.stats["invalidations"] += 1
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Writes pending last_used timestamps, then stops the flusher."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush_last_used()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(API_KEY_LAST_USED_FLUSH_INTERVAL)
+            try:
+                await self.flush_last_used()
+            except Exception:
+                logger.exception("API key last_used flush failed")
+
+    async def flush_last_used(self):
+        pending, self._last_used = self._last_used, {}
+        if not pending:
+            return
+        async with async_engine.begin() as conn:
+            await conn.execute(
+                update(APIKey).where(APIKey.id == bindparam("key_id")).values(last_used=bindparam("used_at")),
+                [{"key_id": key_id, "used_at": used_at} for key_id, used_at in pending.items()],
+            )
+        self.stats["last_used_flushed"] += len(pending)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "cached_keys": len(self._valid),
+            "cached_rejections": len(self._invalid),
+            "pending_last_used": len(self._last_used),
+            "listening": change_listener.listening,
+        }
+
+# Shared per-process cache
+api_key_cache = ApiKeyCache()
+register_stats("api_key_cache", api_key_cache.get_stats, counters=("hits", "negative_hits", "misses", "rejected", "invalidations", "last_used_flushed"))
+change_listener.subscribe(API_KEY_NOTIFY_CHANNEL, lambda payload: api_key_cache.invalidate(payload or None), api_key_cache.invalidate)
+
+async def require_api_key(x_api_key: Optional[str] = Header(None)) -> Optional[ApiKeyPrincipal]:
+    """FastAPI dependency: authenticates the X-API-Key header (no-op when API_KEY_AUTH is off)."""
+    if not API_KEY_AUTH:
+        return None
+    if not x_api_key:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing API key")
+    principal = await api_key_cache.authenticate(x_api_key)
+    if principal is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
+    return principal
+
+def resolve_tenant(principal: Optional[ApiKeyPrincipal], tenant_id: Optional[int]) -> Optional[int]:
+    """A key is bound to its tenant: fills in a missing tenant_id and rejects a different one.
+
+    Keys without a tenant are refused rather than trusted with the caller's tenant_id
+    (or None, which would read across all tenants).
+    """
+    if principal is None:
+        return tenant_id
+    if principal.tenant_id is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="API key is not bound to a tenant")
+    if tenant_id is not None and tenant_id != principal.tenant_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="API key is not valid for this tenant")
+    return principal.tenant_id
+
+def resolve_user(principal: Optional[ApiKeyPrincipal], user_id: Optional[int]) -> int:
+    """A key with an owner only reads that user's data; without auth the user_id must be given."""
+    if principal is not None and principal.user_id is not None:
+        if user_id is not None and user_id != principal.user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="API key is not valid for this user")
+        return principal.user_id
+    if user_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="user_id is required")
+    return user_id
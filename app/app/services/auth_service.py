@@ -1,6 +1,13 @@
+import asyncio
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from passlib.context import CryptContext
 import jwt
 from dotenv import load_dotenv
@@ -11,8 +18,16 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "default_secret_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+# bcrypt runs on its own small pool (bcrypt releases the GIL) so login bursts can't take over the request threads
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))  # Beyond this, logins get 503
+JWT_CLAIMS_CACHE_MAX_ENTRIES = int(os.getenv("JWT_CLAIMS_CACHE_MAX_ENTRIES", 10000))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+# completed = hashed/verified (match or not); cancelled = dropped from the pool queue before it ran
+password_stats = {"pending": 0, "completed": 0, "failed": 0, "cancelled": 0, "rejected": 0}
+_password_stats_lock = threading.Lock()  # Jobs finish on pool threads
 
 def verify_password(plain_password, hashed_password):
     """Verify if the given plain password matches the hashed password."""
@@ -22,9 +37,64 @@ def get_password_hash(password):
     """Generate a hashed password."""
     return pwd_context.hash(password)
 
+def _password_job_done(future):
+    """Frees the slot when the job itself ends: a caller that disconnected doesn't stop a running bcrypt."""
+    outcome = "cancelled" if future.cancelled() else "failed" if future.exception() else "completed"
+    with _password_stats_lock:
+        password_stats["pending"] -= 1
+        password_stats[outcome] += 1
+
+async def _run_password_job(func, *args):
+    with _password_stats_lock:
+        if password_stats["pending"] >= PASSWORD_HASH_MAX_PENDING:
+            password_stats["rejected"] += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many login attempts, try again shortly", headers={"Retry-After": "1"})
+        password_stats["pending"] += 1
+    future = password_pool.submit(func, *args)
+    future.add_done_callback(_password_job_done)
+    return await asyncio.wrap_future(future)
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    """verify_password on the bounded password pool."""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    """get_password_hash on the bounded password pool."""
+    return await _run_password_job(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token with an optional expiration time."""
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+# token -> decoded claims, kept until the token expires (LRU-bounded)
+_claims_cache = OrderedDict()
+claims_cache_stats = {"hits": 0, "misses": 0}
+
+def decode_access_token(token: str) -> dict:
+    """Verifies a token once, then serves its claims from memory until `exp`."""
+    claims = _claims_cache.get(token)
+    if claims is not None:
+        if claims["exp"] > time.time():
+            _claims_cache.move_to_end(token)
+            claims_cache_stats["hits"] += 1
+            return claims
+        del _claims_cache[token]
+    claims_cache_stats["misses"] += 1
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]})
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+    _claims_cache[token] = claims
+    if len(_claims_cache) > JWT_CLAIMS_CACHE_MAX_ENTRIES:
+        _claims_cache.popitem(last=False)
+    return claims
+
+async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))) -> dict:
+    """FastAPI dependency: the bearer token's user as {"id", "username", "role"}."""
+    if credentials is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    claims = decode_access_token(credentials.credentials)
+    return {"id": claims.get("uid"), "username": claims["sub"], "role": claims.get("role", "user")}
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+import asyncpg
+from sqlalchemy import select, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from app.database import ASYNC_DATABASE_URL
+
+# Cross-worker cache invalidation over Postgres LISTEN/NOTIFY
+# (disable behind poolers that don't support LISTEN; cache TTLs still bound staleness)
+CHANGE_NOTIFY = os.getenv("CHANGE_NOTIFY", "true").lower() == "true"
+CHANGE_LISTEN_KEEPALIVE = float(os.getenv("CHANGE_LISTEN_KEEPALIVE", 30))
+CHANGE_LISTEN_RETRY = float(os.getenv("CHANGE_LISTEN_RETRY", 5))
+
+logger = logging.getLogger(__name__)
+
+def notify_change(db: Session, channel: str, payload: str = ""):
+    """Queues a notification; Postgres delivers it to every listener when the transaction commits."""
+    db.execute(select(func.pg_notify(channel, payload)))
+
+class ChangeListener:
+    """One dedicated LISTEN connection per process, dispatching notifications to in-memory caches."""
+
+    def __init__(self):
+        self._handlers = {}  # channel -> (on_notify(payload), on_reconnect())
+        self._task = None
+        self.listening = False
+        self.stats = {"notifications": 0, "reconnects": 0}
+
+    def subscribe(self, channel: str, on_notify, on_reconnect):
+        """`on_reconnect` runs after the connection is re-established, since notifications sent meanwhile were lost."""
+        self._handlers[channel] = (on_notify, on_reconnect)
+
+    async def start(self):
+        if CHANGE_NOTIFY and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _dispatch(self, connection, pid, channel, payload):
+        self.stats["notifications"] += 1
+        try:
+            self._handlers[channel][0](payload)
+        except Exception:
+            logger.exception("Change notification handler failed for %s", channel)
+
+    async def _listen(self):
+        dsn = make_url(ASYNC_DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        reconnect = False
+        while True:
+            try:
+                conn = await asyncpg.connect(dsn)
+            except Exception:
+                logger.exception("Change listener could not connect")
+                await asyncio.sleep(CHANGE_LISTEN_RETRY)
+                continue
+            try:
+                for channel in self._handlers:
+                    await conn.add_listener(channel, self._dispatch)
+                if reconnect:
+                    self.stats["reconnects"] += 1
+                    for _, on_reconnect in self._handlers.values():
+                        on_reconnect()
+                reconnect = True
+                self.listening = True
+                while True:
+                    await asyncio.sleep(CHANGE_LISTEN_KEEPALIVE)
+                    await conn.execute("SELECT 1")  # Surfaces a dead connection
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Change listener connection lost")
+            finally:
+                self.listening = False
+                if not conn.is_closed():
+                    conn.terminate()
+            await asyncio.sleep(CHANGE_LISTEN_RETRY)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "listening": self.listening, "channels": list(self._handlers)}
+
+# Shared per-process listener
+change_listener = ChangeListener()
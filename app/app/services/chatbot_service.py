@@ -1,99 +1,263 @@
 from sqlalchemy.orm import Session
-from app.models import KnowledgeBase, ChatLogs, ChatbotSettings
-from app.services.vector_service import search_vector_entries
-import requests
-import os
+from app.database import AsyncReadSessionLocal
+from app.models import ChatbotSettings
+from app.services.knowledge_service import search_knowledge_entries_async
+from app.services.vector_service import generate_embedding_async
+from app.services.retrieval_service import hybrid_search_async
+from app.services.response_cache import response_cache, normalize_message
+from app.services.single_flight import llm_flights, FlightCancelled
+from app.services.llm_client import llm_client, LLMError
+from app.services.prompt_builder import build_prompt, RAG_TOP_K, RAG_MIN_SIMILARITY
+from app.services.session_memory import session_memory
+from app.services.log_writer import chat_log_writer
+from app.services.logs_service import get_all_logs
+from app.services.pagination import DEFAULT_PAGE_SIZE
+from app.services.rate_limiter import check_ai_rate_limit, RateLimitExceeded
+from app.services.settings_cache import settings_cache, notify_settings_changed
+from app.services.metrics import stage_timer, tenant_label, chat_request_seconds, chat_requests_total, stage_errors_total
+import asyncio
+import logging
 import time
 from datetime import datetime, timedelta
-from cachetools import TTLCache
 
-# Load OpenRouter API Key
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_API_URL = "https://openrouter.ai/api/generate"
+AI_UNAVAILABLE_MESSAGE = "AI service is currently unavailable."
+RATE_LIMIT_MESSAGE = "Rate limit exceeded. Please wait before making another AI request."
 
-# Caching Mechanism (Cache AI responses for 10 minutes, max 100 queries)
-cached_responses = TTLCache(maxsize=100, ttl=600)
+logger = logging.getLogger(__name__)
 
-# Rate Limit Dictionary (Allow max 5 AI queries per user per minute)
-user_rate_limits = {}
-RATE_LIMIT = 5  # Max AI calls per minute
+async def _text_search_stage(message: str, tenant_id: int = None):
+    """Ranked full-text KB search; returns the best answer or None."""
+    # Each stage owns its session: an AsyncSession can't run two queries at once,
+    # and a cancelled stage must not leave a shared connection mid-query
+    async with AsyncReadSessionLocal() as db:
+        results = await search_knowledge_entries_async(db, message, tenant_id)
+    return results[0]["content"] if results else None
 
-def handle_chat_query(db: Session, message: str, user_id: int):
-    """Handles chatbot queries with RAG, caching, and rate limiting."""
-    global user_rate_limits
-    
-    # Step 1: Check Knowledge Base for direct match
-    db_entry = db.query(KnowledgeBase).filter(KnowledgeBase.content.ilike(f"%{message}%")).first()
-    if db_entry:
-        log_chat_interaction(db, user_id, message, db_entry.content, "knowledge_base")
-        return db_entry.content
-    
-    # Step 2: Use Vector Search to find similar responses
-    vector_results = search_vector_entries(db, message)
-    if vector_results:
-        best_match = vector_results[0]  # Take the most relevant response
-        knowledge_entry = db.query(KnowledgeBase).filter(KnowledgeBase.id == best_match["knowledge_id"]).first()
-        if knowledge_entry:
-            log_chat_interaction(db, user_id, message, knowledge_entry.content, "vector_search")
-            return knowledge_entry.content
-    
-    # Step 3: Check Cache for AI Response
-    if message in cached_responses:
-        cached_response = cached_responses[message]
-        log_chat_interaction(db, user_id, message, cached_response, "cached_ai_response")
-        return cached_response
+async def _hybrid_search_stage(message: str, tenant_id: int = None):
+    """Embedding, then fused full-text + vector retrieval in one query.
+
+    Returns (best qualified match or None, top-k passages, query_vector); the passages
+    include weaker matches that can still serve as LLM context.
+    """
+    with stage_timer("embedding", tenant_id):
+        query_vector = await generate_embedding_async(message)
+    async with AsyncReadSessionLocal() as db:
+        results = await hybrid_search_async(
+            db, message, query_vector, tenant_id, limit=RAG_TOP_K, candidate_min_similarity=RAG_MIN_SIMILARITY
+        )
+    return next((r for r in results if r["qualified"]), None), results, query_vector
+
+async def _cancel(*tasks):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def _record_stage_error(task: asyncio.Task, stage: str, tenant_id: int = None):
+    """Logs and counts a stage that raised but was skipped in favour of another one."""
+    if task.cancelled() or task.exception() is None:
+        return
+    stage_errors_total.inc(stage=stage, tenant=tenant_label(tenant_id))
+    logger.error("%s stage failed for tenant %s", stage, tenant_id, exc_info=task.exception())
+
+async def find_stored_response(message: str, tenant_id: int = None, use_response_cache: bool = True):
+    """Looks up an answer that doesn't need the LLM.
+
+    Returns (response, source, embedding, passages); response is None on a miss. The
+    query embedding is handed back so a later cache write doesn't have to recompute it,
+    and the retrieved passages so the LLM prompt can use them as context. Follow-up
+    questions in a conversation skip the AI response cache, since its answers were
+    written for other contexts.
+    """
+    # Step 1: Exact repeat of a cached question, no embedding needed
+    if use_response_cache:
+        with stage_timer("cache_lookup", tenant_id):
+            cached_response = response_cache.get_exact(tenant_id, message)
+        if cached_response is not None:
+            return cached_response, "cached_ai_response", None, []
+
+    # Step 2: Full-text search races embedding + hybrid retrieval. A full-text hit answers
+    # without waiting for the embedding; otherwise the fused ranking decides.
+    text_task = asyncio.create_task(_text_search_stage(message, tenant_id))
+    hybrid_task = asyncio.create_task(_hybrid_search_stage(message, tenant_id))
+    try:
+        done, _ = await asyncio.wait((text_task, hybrid_task), return_when=asyncio.FIRST_COMPLETED)
+        if text_task in done and not text_task.exception() and text_task.result() is not None:
+            return text_task.result(), "knowledge_base", None, []
+        # The hybrid query covers the full-text ranking too, so its answer (or miss) is final
+        best_match, passages, query_vector = await hybrid_task
+        if best_match is not None:
+            return best_match["content"], best_match["source"], query_vector, passages
+    finally:
+        await _cancel(text_task, hybrid_task)
+        _record_stage_error(text_task, "text_search", tenant_id)
+
+    # Step 3: Check the tenant's semantic cache for an AI response to a similar question
+    if use_response_cache:
+        with stage_timer("cache_lookup", tenant_id):
+            cached_response = response_cache.get(tenant_id, message, query_vector)
+        if cached_response is not None:
+            return cached_response, "cached_ai_response", query_vector, passages
+    return None, None, query_vector, passages
+
+def record_chat_request(tenant_id: int, source: str, started: float):
+    labels = {"tenant": tenant_label(tenant_id), "source": source}
+    chat_requests_total.inc(**labels)
+    chat_request_seconds.observe(time.perf_counter() - started, **labels)
+
+def session_key(tenant_id: int, user_id: int, session_id: str = None):
+    """Conversation memory key; None (stateless) without a session_id."""
+    return (tenant_id, user_id, session_id) if session_id else None
+
+async def _load_history(key):
+    return None if key is None else await session_memory.get_context(key)
+
+async def handle_chat_query(message: str, user_id: int, tenant_id: int = None, session_id: str = None):
+    """Handles chatbot queries with RAG, caching, conversation memory and rate limiting."""
+    started = time.perf_counter()
+    key = session_key(tenant_id, user_id, session_id)
+    history = await _load_history(key)
+    contextual = history is not None and not history.empty
+    response, source, query_vector, passages = await find_stored_response(message, tenant_id, use_response_cache=not contextual)
+    if response is not None:
+        log_chat_interaction(user_id, message, response, source, tenant_id)
+        record_chat_request(tenant_id, source, started)
+        await _remember(key, message, response)
+        return response
     
-    # Step 4: Apply Rate Limit per User
-    current_time = time.time()
-    user_requests = user_rate_limits.get(user_id, [])
-    user_requests = [t for t in user_requests if current_time - t < 60]  # Keep only last 60 seconds requests
+    # Step 4: Apply per-user and per-tenant AI rate limits
+    with stage_timer("rate_limit", tenant_id):
+        decision = await check_ai_rate_limit(tenant_id, user_id)
+    if not decision.allowed:
+        record_chat_request(tenant_id, "rate_limited", started)
+        raise RateLimitExceeded(decision)
     
-    if len(user_requests) >= RATE_LIMIT:
-        return "Rate limit exceeded. Please wait before making another AI request."
+    # Step 5: If no match found, ask the LLM with the retrieved passages (and conversation
+    # memory) as context. Identical in-flight questions share one call, and the cache is
+    # filled once when it completes.
+    try:
+        with stage_timer("llm", tenant_id):
+            ai_response = await llm_flights.result(
+                llm_flight_key(tenant_id, message, key if contextual else None),
+                lambda: _complete_ai_response(message, passages, tenant_id, history),
+                on_result=None if contextual else lambda text: response_cache.set(tenant_id, message, text, query_vector),
+            )
+    except FlightCancelled:
+        ai_response = None
+    if ai_response is None:
+        record_chat_request(tenant_id, "ai_unavailable", started)
+        return AI_UNAVAILABLE_MESSAGE
+    log_chat_interaction(user_id, message, ai_response, "ai_model", tenant_id)
+    record_chat_request(tenant_id, "ai_model", started)
+    await _remember(key, message, ai_response)
+    return ai_response
+
+async def stream_chat_query(message: str, user_id: int, tenant_id: int = None, session_id: str = None):
+    """Streaming variant of handle_chat_query; yields response text chunks as they arrive.
+
+    Raises RateLimitExceeded before yielding anything when the AI limits are hit.
+    """
+    started = time.perf_counter()
+    key = session_key(tenant_id, user_id, session_id)
+    history = await _load_history(key)
+    contextual = history is not None and not history.empty
+    response, source, query_vector, passages = await find_stored_response(message, tenant_id, use_response_cache=not contextual)
+    if response is not None:
+        record_chat_request(tenant_id, source, started)
+        yield response
+        log_chat_interaction(user_id, message, response, source, tenant_id)
+        await _remember(key, message, response)
+        return
     
-    user_requests.append(current_time)
-    user_rate_limits[user_id] = user_requests
+    with stage_timer("rate_limit", tenant_id):
+        decision = await check_ai_rate_limit(tenant_id, user_id)
+    if not decision.allowed:
+        record_chat_request(tenant_id, "rate_limited", started)
+        raise RateLimitExceeded(decision)  # Before the first chunk, so the route can still answer 429
     
-    # Step 5: If no match found, use OpenRouter AI Model
-    ai_response = generate_ai_response(message)
-    cached_responses[message] = ai_response  # Store in cache
-    log_chat_interaction(db, user_id, message, ai_response, "ai_model")
-    return ai_response
+    # Proxy tokens to the caller while assembling the full text for logs; concurrent
+    # identical questions follow one shared stream, which fills the cache once
+    chunks = []
+    try:
+        with stage_timer("llm", tenant_id):
+            async for token in llm_flights.stream(
+                llm_flight_key(tenant_id, message, key if contextual else None),
+                lambda: _stream_ai_response(message, passages, tenant_id, history),
+                on_result=None if contextual else lambda text: response_cache.set(tenant_id, message, text, query_vector),
+            ):
+                chunks.append(token)
+                yield token
+    except (LLMError, FlightCancelled):
+        if not chunks:
+            record_chat_request(tenant_id, "ai_unavailable", started)
+            yield AI_UNAVAILABLE_MESSAGE
+        return
+    ai_response = "".join(chunks)
+    if ai_response:
+        log_chat_interaction(user_id, message, ai_response, "ai_model", tenant_id)
+        record_chat_request(tenant_id, "ai_model", started)
+        await _remember(key, message, ai_response)
+
+async def _remember(key, message: str, response: str):
+    if key is not None:
+        await session_memory.append(key, message, response)
+
+def llm_flight_key(tenant_id: int, message: str, session=None):
+    """Coalescing key; follow-ups in a conversation only coalesce within that conversation."""
+    return tenant_id, normalize_message(message), session
+
+async def _prompt(message: str, passages: list, tenant_id: int = None, history=None) -> list:
+    with stage_timer("prompt_build", tenant_id):
+        return await build_prompt(message, passages, tenant_id, history)
+
+async def _complete_ai_response(message: str, passages: list, tenant_id: int = None, history=None):
+    """Prompt assembly + generate_ai_response as a one-chunk source for llm_flights (built once per flight)."""
+    ai_response = await generate_ai_response(await _prompt(message, passages, tenant_id, history))
+    if ai_response is not None:
+        yield ai_response
+
+async def _stream_ai_response(message: str, passages: list, tenant_id: int = None, history=None):
+    async for token in stream_ai_response(await _prompt(message, passages, tenant_id, history)):
+        yield token
+
+async def generate_ai_response(messages: list):
+    """Generates a chatbot response through the LLM client (with model fallback). Returns None if the service fails."""
+    try:
+        return await llm_client.complete(messages) or "I couldn't generate a response."
+    except LLMError:
+        return None
+
+def stream_ai_response(messages: list):
+    """Streams completion tokens; raises LLMError if no model can answer."""
+    return llm_client.stream(messages)
+
+def log_chat_interaction(user_id: int, message: str, response: str, source: str, tenant_id: int = None):
+    """Logs chatbot interactions for future analysis (buffered; written in batches off the request path)."""
+    chat_log_writer.log({
+        "tenant_id": tenant_id,
+        "user_id": user_id,
+        "message": message,
+        "response": response,
+        "source": source,
+        "created_at": datetime.utcnow(),
+    })
+
+def get_chat_history(db: Session, user_id: int, tenant_id: int = None, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    """Retrieves one page of past chatbot interactions for a user, newest first."""
+    return get_all_logs(db, user_id, tenant_id, limit, cursor)
+
+def get_chatbot_settings(tenant_id: int = None) -> dict:
+    """Retrieves a tenant's chatbot settings (served from the per-process settings cache)."""
+    return settings_cache.get(tenant_id)
 
-def generate_ai_response(message: str) -> str:
-    """Generates a chatbot response using OpenRouter API."""
-    headers = {"Authorization": f"Bearer {OPENROUTER_API_KEY}", "Content-Type": "application/json"}
-    data = {"prompt": message, "max_tokens": 150}
-    response = requests.post(OPENROUTER_API_URL, json=data, headers=headers)
-    if response.status_code == 200:
-        return response.json().get("text", "I couldn't generate a response.")
-    return "AI service is currently unavailable."
-
-def log_chat_interaction(db: Session, user_id: int, message: str, response: str, source: str):
-    """Logs chatbot interactions for future analysis."""
-    chat_log = ChatLogs(
-        user_id=user_id,
-        message=message,
-        response=response,
-        source=source,
-        created_at=datetime.utcnow()
-    )
-    db.add(chat_log)
-    db.commit()
-
-def get_chat_history(db: Session, user_id: int):
-    """Retrieves past chatbot interactions for a user."""
-    return db.query(ChatLogs).filter(ChatLogs.user_id == user_id).order_by(ChatLogs.created_at.desc()).all()
-
-def get_chatbot_settings(db: Session):
-    """Retrieves chatbot settings from the database."""
-    return db.query(ChatbotSettings).all()
-
-def update_chatbot_settings(db: Session, setting_key: str, setting_value: str):
-    """Updates chatbot settings dynamically."""
-    setting = db.query(ChatbotSettings).filter(ChatbotSettings.setting_key == setting_key).first()
+def update_chatbot_settings(db: Session, setting_key: str, setting_value: str, tenant_id: int = None):
+    """Updates a tenant's setting and tells every worker to drop its cached copy."""
+    setting = db.query(ChatbotSettings).filter(
+        ChatbotSettings.tenant_id == tenant_id, ChatbotSettings.setting_key == setting_key
+    ).first()
     if setting:
         setting.setting_value = setting_value
+        notify_settings_changed(db, tenant_id)
         db.commit()
+        settings_cache.invalidate(tenant_id)
         return True
     return False
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+import numpy as np
+import psutil
+
+# Embedding backend selection ("sentence-transformers" or "onnx") and model location
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+# ONNX export shipped in the model repo; the qint8 variants are dynamically quantized for CPU
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx2.onnx")
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", 0))  # 0 = onnxruntime default
+EMBEDDING_MAX_SEQ_LENGTH = int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", 256))
+
+class EmbeddingBackend:
+    """Lazily loaded text encoder. Subclasses implement _load() and _encode()."""
+
+    name = "base"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, dim: int = 384):
+        self.model_name = model_name
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.report = {"backend": self.name, "model": model_name, "dim": dim, "loaded": False}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self):
+        """Loads the model once; safe to call from several threads."""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            process = psutil.Process()
+            rss_before = process.memory_info().rss
+            started = time.perf_counter()
+            self._load()
+            self._loaded = True
+            self.report.update({
+                "loaded": True,
+                "load_seconds": round(time.perf_counter() - started, 3),
+                "rss_delta_mb": round((process.memory_info().rss - rss_before) / 2**20, 1),
+            })
+
+    def warm_up(self) -> dict:
+        """Loads the model and runs one encode so the first request pays nothing."""
+        self.load()
+        started = time.perf_counter()
+        self.encode(["warm up"])
+        self.report["warmup_encode_ms"] = round(1000 * (time.perf_counter() - started), 1)
+        self.report["rss_mb"] = round(psutil.Process().memory_info().rss / 2**20, 1)
+        return self.report
+
+    def encode(self, texts: list) -> np.ndarray:
+        """Returns an (n, dim) float32 array of unit-normalized embeddings."""
+        self.load()
+        return self._encode(texts)
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _encode(self, texts: list) -> np.ndarray:
+        raise NotImplementedError
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """PyTorch sentence-transformers model (the reference implementation)."""
+
+    name = "sentence-transformers"
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer  # Deferred: importing torch is slow
+        self.model = SentenceTransformer(self.model_name, device="cpu")
+
+    def _encode(self, texts: list) -> np.ndarray:
+        return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True, normalize_embeddings=True)
+
+class OnnxBackend(EmbeddingBackend):
+    """ONNX Runtime CPU path (optionally int8-quantized) producing the same 384-dim vectors.
+
+    Mirrors the all-MiniLM-L6-v2 pipeline: tokenize, transformer, mean pooling
+    over the attention mask, L2 normalization. Needs onnxruntime and tokenizers.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, dim: int = 384, onnx_file: str = EMBEDDING_ONNX_FILE):
+        super().__init__(model_name, dim)
+        self.onnx_file = onnx_file
+        self.report["onnx_file"] = onnx_file
+
+    def _resolve(self, filename: str) -> str:
+        # A local directory (e.g. baked into the image) wins over the Hugging Face cache
+        if os.path.isdir(self.model_name):
+            return os.path.join(self.model_name, filename)
+        from huggingface_hub import hf_hub_download
+        return hf_hub_download(self.model_name, filename)
+
+    def _load(self):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as exc:
+            raise RuntimeError("EMBEDDING_BACKEND=onnx requires the onnxruntime and tokenizers packages") from exc
+        self.tokenizer = Tokenizer.from_file(self._resolve("tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=EMBEDDING_MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+        options = onnxruntime.SessionOptions()
+        if EMBEDDING_ONNX_THREADS:
+            options.intra_op_num_threads = EMBEDDING_ONNX_THREADS
+        self.session = onnxruntime.InferenceSession(
+            self._resolve(self.onnx_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode(self, texts: list) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        mask = attention_mask[:, :, np.newaxis].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+EMBEDDING_BACKENDS = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+def get_embedding_backend(name: str = EMBEDDING_BACKEND) -> EmbeddingBackend:
+    """Instantiates the configured backend without loading the model."""
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{name}' (expected one of {', '.join(EMBEDDING_BACKENDS)})")
+    return EMBEDDING_BACKENDS[name]()
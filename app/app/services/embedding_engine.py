@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Micro-batching settings: a batch is flushed when it is full or the oldest request has waited this long
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", 32))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", 3))
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding requests into batched encode calls.
+
+    Sync callers block on embed(); async callers await embed_async(). Both share
+    one queue drained by a background thread, so requests from route threads and
+    the event loop land in the same batches.
+    """
+
+    def __init__(self, encode_batch, max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+                 max_wait_ms: float = EMBEDDING_BATCH_MAX_WAIT_MS):
+        self.encode_batch = encode_batch  # callable: list[str] -> sequence of vectors
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.encode_time_total = 0.0
+        self.errors = 0
+
+    def submit(self, text: str) -> Future:
+        """Queues one text; the returned future resolves to its embedding (list of floats)."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def embed(self, text: str) -> list:
+        return self.submit(text).result()
+
+    async def embed_async(self, text: str) -> list:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def embed_many(self, texts: list) -> list:
+        """Encodes a caller-assembled batch directly (bulk jobs don't need the queue)."""
+        if not texts:
+            return []
+        return [vector.tolist() for vector in self.encode_batch(list(texts))]
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Drain whatever is already queued, then wait out the remaining window
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Callers that gave up (e.g. a cancelled embed_async) are dropped before encoding
+            batch = [item for item in self._next_batch() if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._encode(batch)
+            except Exception:
+                logger.exception("Embedding batch failed")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("embedding batch failed"))
+
+    def _encode(self, batch: list):
+        started = time.perf_counter()
+        try:
+            vectors = self.encode_batch([text for text, _, _ in batch])
+        except Exception as exc:
+            with self._stats_lock:
+                self.errors += 1
+            for _, future, _ in batch:
+                future.set_exception(exc)
+            return
+        finished = time.perf_counter()
+        for (_, future, _), vector in zip(batch, vectors):
+            future.set_result(vector.tolist())
+        self._record(batch, started, finished)
+
+    def _record(self, batch, started: float, finished: float):
+        waits = [started - enqueued for _, _, enqueued in batch]
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.queue_wait_total += sum(waits)
+            self.queue_wait_max = max(self.queue_wait_max, max(waits))
+            self.encode_time_total += finished - started
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_seen,
+                "avg_queue_wait_ms": 1000 * self.queue_wait_total / self.items if self.items else 0.0,
+                "max_queue_wait_ms": 1000 * self.queue_wait_max,
+                "avg_encode_ms": 1000 * self.encode_time_total / self.batches if self.batches else 0.0,
+                "queue_depth": self._queue.qsize(),
+                "errors": self.errors,
+                "batch_limit": self.max_batch_size,
+                "wait_limit_ms": 1000 * self.max_wait,
+            }
@@ -0,0 +1,160 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models import KnowledgeBase, VectorIndex
+from app.services.vector_service import embedding_engine
+
+# Chunking and batching settings for bulk knowledge ingestion
+INGEST_CHUNK_WORDS = int(os.getenv("INGEST_CHUNK_WORDS", 200))
+INGEST_CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", 40))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 256))
+INGEST_COMMIT_EVERY = int(os.getenv("INGEST_COMMIT_EVERY", 20))  # Batches per transaction
+
+INGEST_FORMATS = ("jsonl", "csv", "markdown", "text")
+EXTENSION_FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv", ".md": "markdown", ".markdown": "markdown"}
+
+logger = logging.getLogger(__name__)
+
+class IngestionError(Exception):
+    """Ingestion stopped partway; `report` holds the committed_documents/committed_chunks that were kept."""
+
+    def __init__(self, cause: Exception, report: dict):
+        super().__init__(str(cause))
+        self.report = report
+
+def compute_content_hash(content: str) -> str:
+    """Hash of the text that gets embedded; unchanged hash means unchanged vectors."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def detect_format(filename: str) -> str:
+    """Guesses the input format from a file name (plain text by default)."""
+    return EXTENSION_FORMATS.get(os.path.splitext(filename or "")[1].lower(), "text")
+
+def parse_records(lines, fmt: str, default_title: str = "Untitled", category: str = None):
+    """Stream-parses an iterable of text lines into {title, content, category} documents."""
+    if fmt == "jsonl":
+        for line in lines:
+            if line.strip():
+                record = json.loads(line)
+                yield _document(record.get("title"), record.get("content"), record.get("category") or category, default_title)
+    elif fmt == "csv":
+        for record in csv.DictReader(lines):
+            yield _document(record.get("title"), record.get("content"), record.get("category") or category, default_title)
+    elif fmt == "markdown":
+        # Each heading starts a new document; text before the first heading uses the default title
+        title, body = default_title, []
+        for line in lines:
+            heading = re.match(r"^#{1,6}\s+(.*)", line)
+            if heading:
+                if "".join(body).strip():
+                    yield _document(title, "".join(body), category, default_title)
+                title, body = heading.group(1).strip(), []
+            else:
+                body.append(line)
+        if "".join(body).strip():
+            yield _document(title, "".join(body), category, default_title)
+    elif fmt == "text":
+        content = "".join(lines)
+        if content.strip():
+            yield _document(default_title, content, category, default_title)
+    else:
+        raise ValueError(f"Unsupported format '{fmt}' (expected one of {', '.join(INGEST_FORMATS)})")
+
+def _document(title, content, category, default_title):
+    return {"title": (title or default_title).strip()[:255], "content": (content or "").strip(), "category": category}
+
+def chunk_text(text: str, chunk_words: int = INGEST_CHUNK_WORDS, overlap: int = INGEST_CHUNK_OVERLAP):
+    """Splits text into overlapping word windows so long documents embed well."""
+    words = text.split()
+    if len(words) <= chunk_words:
+        return [" ".join(words)] if words else []
+    step = max(chunk_words - overlap, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+def iter_chunks(documents, source: str = "manual", report: dict = None):
+    """Expands documents into knowledge base rows, one per chunk, as (row, whether it is the document's last chunk)."""
+    for doc in documents:
+        if report is not None:
+            report["documents"] += 1
+        chunks = chunk_text(doc["content"])
+        for i, chunk in enumerate(chunks, start=1):
+            title = doc["title"] if len(chunks) == 1 else f"{doc['title']} (part {i}/{len(chunks)})"
+            yield {"title": title[:255], "content": chunk, "category": doc["category"], "source": source,
+                   "content_hash": compute_content_hash(chunk)}, i == len(chunks)
+
+def ingest_documents(db: Session, documents, tenant_id: int = None, source: str = "manual",
+                     batch_size: int = INGEST_BATCH_SIZE, commit_every: int = INGEST_COMMIT_EVERY, progress=None):
+    """Chunks, embeds and bulk-inserts documents into knowledge_base and vector_index.
+
+    Each batch is embedded in one model call and written with two multi-row
+    INSERTs; the transaction is committed every `commit_every` batches.
+    `progress` is called with the running report after every batch. On failure the open
+    transaction is rolled back and IngestionError reports what earlier commits kept.
+    """
+    report = {"documents": 0, "chunks": 0, "batches": 0, "commits": 0, "committed_documents": 0, "committed_chunks": 0,
+              "embed_seconds": 0.0, "elapsed_seconds": 0.0, "chunks_per_second": 0.0}
+    started = time.perf_counter()
+    batch = []
+    uncommitted = {"documents": 0, "chunks": 0}  # Written in the open transaction; documents counted once their last chunk is
+
+    def commit():
+        db.commit()
+        report["commits"] += 1
+        report["committed_documents"] += uncommitted["documents"]
+        report["committed_chunks"] += uncommitted["chunks"]
+        uncommitted.update(documents=0, chunks=0)
+
+    def flush():
+        embed_started = time.perf_counter()
+        vectors = embedding_engine.embed_many([row["content"] for row in batch])
+        report["embed_seconds"] += time.perf_counter() - embed_started
+
+        ids = db.execute(
+            insert(KnowledgeBase).returning(KnowledgeBase.id, sort_by_parameter_order=True),
+            [{**row, "tenant_id": tenant_id} for row in batch],
+        ).scalars().all()
+        db.execute(insert(VectorIndex), [
+            {"tenant_id": tenant_id, "knowledge_id": knowledge_id, "embedding_vector": vector, "model_used": "MiniLM",
+             "content_hash": row["content_hash"]}
+            for knowledge_id, vector, row in zip(ids, vectors, batch)
+        ])
+        report["chunks"] += len(batch)
+        report["batches"] += 1
+        uncommitted["chunks"] += len(batch)
+        if report["batches"] % commit_every == 0:
+            commit()
+        batch.clear()
+
+        elapsed = time.perf_counter() - started
+        report["elapsed_seconds"] = round(elapsed, 3)
+        report["chunks_per_second"] = round(report["chunks"] / elapsed, 1) if elapsed else 0.0
+        if progress:
+            progress(report)
+
+    try:
+        for row, last_chunk in iter_chunks(documents, source, report):
+            batch.append(row)
+            uncommitted["documents"] += last_chunk
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        commit()
+    except Exception as exc:
+        db.rollback()
+        logger.warning("Ingestion for tenant %s stopped after committing %s chunks: %r", tenant_id, report["committed_chunks"], exc)
+        raise IngestionError(exc, report) from exc
+    report["embed_seconds"] = round(report["embed_seconds"], 3)
+    logger.info("Ingested %s chunks for tenant %s: %s", report["chunks"], tenant_id, report)
+    return report
@@ -1,15 +1,38 @@
+import os
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session
-from app.models import KnowledgeBase
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import KnowledgeBase, TEXT_SEARCH_CONFIG
 from app.schemas import KnowledgeBaseSchema
+from app.services.sync_service import enqueue_embedding_job
+from app.services.pagination import keyset_page, DEFAULT_PAGE_SIZE
+from app.services.metrics import stage_timer
 
-def get_all_knowledge_entries(db: Session):
-    """Retrieves all knowledge base entries."""
-    return db.query(KnowledgeBase).all()
+# Full-text search settings for the knowledge base direct-match step (TEXT_SEARCH_CONFIG is fixed by the indexed column)
+TEXT_SEARCH_LIMIT = int(os.getenv("KB_TEXT_SEARCH_LIMIT", 5))
+TEXT_SEARCH_MIN_RANK = float(os.getenv("KB_TEXT_SEARCH_MIN_RANK", 0.0))
+
+# Listed columns for knowledge base pages and exports (keyed on id)
+KNOWLEDGE_COLUMNS = (
+    KnowledgeBase.id, KnowledgeBase.tenant_id, KnowledgeBase.title, KnowledgeBase.content,
+    KnowledgeBase.category, KnowledgeBase.source, KnowledgeBase.created_at,
+)
+
+def knowledge_query(tenant_id: int = None):
+    stmt = select(*KNOWLEDGE_COLUMNS)
+    if tenant_id is not None:
+        stmt = stmt.where(KnowledgeBase.tenant_id == tenant_id)
+    return stmt
+
+def get_all_knowledge_entries(db: Session, tenant_id: int = None, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    """Retrieves one page of knowledge base entries, ordered by ID."""
+    return keyset_page(db, knowledge_query(tenant_id), [KnowledgeBase.id], limit, cursor)
 
 def add_knowledge_entry(db: Session, entry_data: KnowledgeBaseSchema):
     """Adds a new knowledge base entry."""
     new_entry = KnowledgeBase(**entry_data.dict())
     db.add(new_entry)
+    enqueue_embedding_job(db, new_entry)
     db.commit()
     db.refresh(new_entry)
     return new_entry
@@ -21,6 +44,7 @@ def update_knowledge_entry(db: Session, entry_id: int, entry_data: KnowledgeBase
         return None
     for key, value in entry_data.dict().items():
         setattr(db_entry, key, value)
+    enqueue_embedding_job(db, db_entry)  # No-op unless the content changed
     db.commit()
     return db_entry
 
@@ -31,4 +55,31 @@ def delete_knowledge_entry(db: Session, entry_id: int):
         return None
     db.delete(db_entry)
     db.commit()
-    return db_entry
\ No newline at end of file
+    return db_entry
+
+def build_text_search_query(query_text: str, tenant_id: int = None, limit: int = TEXT_SEARCH_LIMIT):
+    """Builds a ranked full-text query over title+content (served by the GIN index)."""
+    ts_query = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, query_text)
+    rank = func.ts_rank_cd(KnowledgeBase.search_vector, ts_query).label("rank")
+    stmt = select(KnowledgeBase.id, KnowledgeBase.title, KnowledgeBase.content, rank).where(
+        KnowledgeBase.search_vector.op("@@")(ts_query)
+    )
+    if tenant_id is not None:
+        stmt = stmt.where(KnowledgeBase.tenant_id == tenant_id)
+    return stmt.order_by(rank.desc()).limit(limit)
+
+def _text_search_results(rows):
+    return [
+        {"id": r.id, "title": r.title, "content": r.content, "rank": r.rank}
+        for r in rows if r.rank >= TEXT_SEARCH_MIN_RANK
+    ]
+
+def search_knowledge_entries(db: Session, query_text: str, tenant_id: int = None, limit: int = TEXT_SEARCH_LIMIT):
+    """Returns the top-k knowledge base entries matching the text, best first."""
+    with stage_timer("kb_search", tenant_id):
+        return _text_search_results(db.execute(build_text_search_query(query_text, tenant_id, limit)).all())
+
+async def search_knowledge_entries_async(db: AsyncSession, query_text: str, tenant_id: int = None, limit: int = TEXT_SEARCH_LIMIT):
+    """Async variant of search_knowledge_entries for the chat pipeline."""
+    with stage_timer("kb_search", tenant_id):
+        return _text_search_results((await db.execute(build_text_search_query(query_text, tenant_id, limit))).all())
@@ -0,0 +1,418 @@
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+import httpx
+from app.http_client import get_http_client
+from app.services.metrics import (
+    llm_requests_total, llm_request_seconds, llm_first_token_seconds, record_llm_usage, register_collector,
+)
+
+# OpenRouter endpoint and models; the fallback takes over when the primary is slow, failing or tripped
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+OPENROUTER_API_URL = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "mistralai/mistral-small-3.1-24b-instruct")
+OPENROUTER_FALLBACK_MODEL = os.getenv("OPENROUTER_FALLBACK_MODEL", "openai/gpt-4o-mini")  # empty disables fallback
+OPENROUTER_MAX_TOKENS = int(os.getenv("OPENROUTER_MAX_TOKENS", 150))
+
+# Deadlines: connect and read (gap between bytes) per attempt, first streamed token, whole call
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 3))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 15))
+LLM_FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", 8))
+LLM_TOTAL_TIMEOUT = float(os.getenv("LLM_TOTAL_TIMEOUT", 30))
+# Retries with full jitter; the budget caps retries at a fraction of recent requests
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 0.25))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", 2))
+LLM_RETRY_BUDGET_RATIO = float(os.getenv("LLM_RETRY_BUDGET_RATIO", 0.2))
+LLM_RETRY_BUDGET_MIN = int(os.getenv("LLM_RETRY_BUDGET_MIN", 10))  # Retries always allowed per window
+LLM_RETRY_BUDGET_WINDOW = float(os.getenv("LLM_RETRY_BUDGET_WINDOW", 10))
+# Circuit breaker per model: open after N consecutive failures, probe again after the cooldown
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", 30))
+# Non-streaming calls start the fallback model if the primary hasn't answered within this (0 disables)
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", 4))
+
+class LLMError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+class LLMUnavailable(LLMError):
+    """No model produced an answer (all failed, tripped or out of time)."""
+
+class RetryBudget:
+    """Allows retries only while they stay under a fraction of the requests seen in the current window."""
+
+    def __init__(self, ratio: float = LLM_RETRY_BUDGET_RATIO, minimum: int = LLM_RETRY_BUDGET_MIN,
+                 window: float = LLM_RETRY_BUDGET_WINDOW):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window = window
+        self._window_started = time.monotonic()
+        self._requests = 0
+        self._retries = 0
+        self.exhausted = 0
+
+    def _roll(self):
+        now = time.monotonic()
+        if now - self._window_started >= self.window:
+            self._window_started = now
+            self._requests = 0
+            self._retries = 0
+
+    def record_request(self):
+        self._roll()
+        self._requests += 1
+
+    def try_retry(self) -> bool:
+        self._roll()
+        if self._retries >= self.minimum + self.ratio * self._requests:
+            self.exhausted += 1
+            return False
+        self._retries += 1
+        return True
+
+class CircuitBreaker:
+    """closed -> open after consecutive failures -> half_open (one probe) after the cooldown."""
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.failure_threshold = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+            self._probing = False
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """A probe that ended without a verdict (cancelled) lets the next call probe instead."""
+        self._probing = False
+
+class _ModelStats:
+    def __init__(self):
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "retries": 0, "short_circuited": 0, "hedged": 0, "fallbacks": 0}
+        self.latencies = deque(maxlen=1000)
+
+    def snapshot(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            return round(1000 * latencies[min(len(latencies) - 1, int(q * len(latencies)))], 1) if latencies else None
+
+        return {**self.counts, "p50_ms": percentile(0.5), "p95_ms": percentile(0.95), "p99_ms": percentile(0.99)}
+
+def build_ai_request(model: str, messages: list, stream: bool = False) -> dict:
+    """Builds the OpenRouter chat completion payload."""
+    return {"model": model, "messages": messages, "max_tokens": OPENROUTER_MAX_TOKENS, "stream": stream}
+
+def ai_request_headers() -> dict:
+    return {"Authorization": f"Bearer {OPENROUTER_API_KEY}", "Content-Type": "application/json"}
+
+def _retryable_status(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+# A 200 whose body isn't the expected JSON (proxy error page, truncated chunk) is a provider failure
+MALFORMED_RESPONSE_ERRORS = (ValueError, AttributeError, TypeError, IndexError, KeyError)
+
+class LLMClient:
+    """OpenRouter client over the shared HTTP pool with deadlines, retries, circuit breakers and model fallback.
+
+    Non-streaming calls hedge: if the current model is slow, the next one starts alongside
+    it and the first answer wins. Streams fall back only before their first token; once
+    tokens have been sent the stream is committed to that model.
+    """
+
+    def __init__(self, models: list):
+        self.models = [model for model in models if model]
+        self.breakers = {model: CircuitBreaker() for model in self.models}
+        self.model_stats = {model: _ModelStats() for model in self.models}
+        self.retry_budget = RetryBudget()
+        self.timeout = httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+    async def complete(self, messages: list) -> str:
+        """Returns the completion text; raises LLMUnavailable if no model answers within LLM_TOTAL_TIMEOUT."""
+        try:
+            async with asyncio.timeout(LLM_TOTAL_TIMEOUT):
+                return await self._hedged_complete(messages)
+        except TimeoutError:
+            raise LLMUnavailable("LLM deadline exceeded") from None
+
+    async def _hedged_complete(self, messages: list) -> str:
+        candidates = iter(self.models)
+        pending, errors = {}, []
+
+        def launch_next(reason: str = None) -> bool:
+            for model in candidates:
+                if self.breakers[model].allow():
+                    if reason:
+                        self.model_stats[model].counts[reason] += 1
+                    pending[asyncio.create_task(self._complete_with_retries(model, messages))] = model
+                    return True
+                self.model_stats[model].counts["short_circuited"] += 1
+            return False
+
+        can_hedge = launch_next()
+        try:
+            while pending:
+                timeout = LLM_HEDGE_AFTER if can_hedge and LLM_HEDGE_AFTER > 0 else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    can_hedge = launch_next("hedged")
+                    continue
+                for task in done:
+                    pending.pop(task)
+                    if task.exception() is None:
+                        # Losing to a hedge counts as a failure, so a model that stays slow trips its breaker
+                        for model in pending.values():
+                            self.breakers[model].record_failure()
+                        return task.result()
+                    errors.append(task.exception())
+                if not pending:
+                    can_hedge = launch_next("fallbacks")
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        raise LLMUnavailable("; ".join(map(str, errors)) or "all LLM circuits open")
+
+    async def _complete_with_retries(self, model: str, messages: list) -> str:
+        breaker = self.breakers[model]
+        last_error = None
+        try:
+            for attempt in range(LLM_MAX_RETRIES + 1):
+                if attempt:
+                    if breaker.state == "open" or not self.retry_budget.try_retry():
+                        break
+                    self.model_stats[model].counts["retries"] += 1
+                    await asyncio.sleep(self._backoff(attempt, last_error))
+                else:
+                    self.retry_budget.record_request()
+                try:
+                    text = await self._post(model, messages)
+                except LLMError as exc:
+                    last_error = exc
+                    if not exc.retryable:
+                        breaker.release()  # The provider answered; this request is the problem
+                        raise
+                    breaker.record_failure()
+                    continue
+                except Exception:
+                    breaker.record_failure()
+                    raise
+                breaker.record_success()
+                return text
+            raise last_error
+        finally:
+            breaker.release()  # However the call ended (cancelled included), a half-open probe is never left claimed
+
+    async def _post(self, model: str, messages: list) -> str:
+        stats = self.model_stats[model]
+        stats.counts["requests"] += 1
+        started = time.perf_counter()
+        try:
+            response = await get_http_client().post(
+                OPENROUTER_API_URL, json=build_ai_request(model, messages), headers=ai_request_headers(), timeout=self.timeout,
+            )
+        except httpx.HTTPError as exc:
+            self._record_error(model, "error")
+            raise LLMError(f"{model}: {type(exc).__name__}") from exc
+        if response.status_code != 200:
+            self._record_error(model, f"http_{response.status_code}")
+            error = LLMError(f"{model}: HTTP {response.status_code}", retryable=_retryable_status(response.status_code))
+            error.retry_after = response.headers.get("Retry-After")
+            raise error
+        try:
+            body = response.json()
+            choices = body.get("choices") or [{}]
+            text = choices[0].get("message", {}).get("content") or ""
+            record_llm_usage(model, body.get("usage"))
+        except MALFORMED_RESPONSE_ERRORS as exc:
+            self._record_error(model, "malformed")
+            raise LLMError(f"{model}: malformed response ({type(exc).__name__})") from exc
+        elapsed = time.perf_counter() - started
+        llm_request_seconds.observe(elapsed, model=model, stream="false")
+        llm_requests_total.inc(model=model, outcome="ok")
+        stats.counts["ok"] += 1
+        stats.latencies.append(elapsed)
+        return text
+
+    async def stream(self, messages: list):
+        """Yields completion tokens; raises LLMUnavailable if no model starts streaming, or if the chosen one fails mid-stream."""
+        deadline = time.monotonic() + LLM_TOTAL_TIMEOUT
+        errors = []
+        for position, model in enumerate(self.models):
+            if not self.breakers[model].allow():
+                self.model_stats[model].counts["short_circuited"] += 1
+                continue
+            if position:
+                self.model_stats[model].counts["fallbacks"] += 1
+            sent = False
+            try:
+                async for token in self._stream_with_retries(model, messages, deadline):
+                    sent = True
+                    yield token
+                return
+            except LLMError as exc:
+                if sent:
+                    raise LLMUnavailable(str(exc)) from exc
+                errors.append(exc)
+        raise LLMUnavailable("; ".join(map(str, errors)) or "all LLM circuits open")
+
+    async def _stream_with_retries(self, model: str, messages: list, deadline: float):
+        breaker = self.breakers[model]
+        last_error = None
+        try:
+            for attempt in range(LLM_MAX_RETRIES + 1):
+                if attempt:
+                    if breaker.state == "open" or not self.retry_budget.try_retry():
+                        break
+                    self.model_stats[model].counts["retries"] += 1
+                    await asyncio.sleep(self._backoff(attempt, last_error))
+                else:
+                    self.retry_budget.record_request()
+                tokens = self._open_stream(model, messages)
+                sent = False
+                try:
+                    while True:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise LLMError(f"{model}: LLM deadline exceeded", retryable=False)
+                        wait = remaining if sent else min(remaining, LLM_FIRST_TOKEN_TIMEOUT)
+                        try:
+                            token = await asyncio.wait_for(anext(tokens), wait)
+                        except StopAsyncIteration:
+                            break
+                        except TimeoutError:
+                            # A slow model is better skipped than retried: go straight to the fallback
+                            self._record_error(model, "timeout")
+                            breaker.record_failure()
+                            raise LLMError(f"{model}: no token within {wait:.1f}s", retryable=False) from None
+                        sent = True
+                        yield token
+                except LLMError as exc:
+                    last_error = exc
+                    if exc.retryable:
+                        breaker.record_failure()
+                    else:
+                        breaker.release()
+                    if sent or not exc.retryable:
+                        raise
+                    continue
+                except Exception:
+                    breaker.record_failure()
+                    raise
+                finally:
+                    await tokens.aclose()
+                breaker.record_success()
+                return
+            raise last_error
+        finally:
+            breaker.release()  # However the stream ended (cancelled or closed early included), free a half-open probe
+
+    async def _open_stream(self, model: str, messages: list):
+        """One streaming attempt (server-sent events); raises LLMError on transport, HTTP or malformed chunk errors."""
+        stats = self.model_stats[model]
+        stats.counts["requests"] += 1
+        started = time.perf_counter()
+        first_token = True
+        try:
+            async with get_http_client().stream(
+                "POST", OPENROUTER_API_URL, json=build_ai_request(model, messages, stream=True), headers=ai_request_headers(), timeout=self.timeout,
+            ) as response:
+                if response.status_code != 200:
+                    self._record_error(model, f"http_{response.status_code}")
+                    raise LLMError(f"{model}: HTTP {response.status_code}", retryable=_retryable_status(response.status_code))
+                async for line in response.aiter_lines():
+                    # Skip keep-alive comments (": OPENROUTER PROCESSING") and blank separators
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                        record_llm_usage(model, chunk.get("usage"))  # Sent on the final chunk
+                        choices = chunk.get("choices") or [{}]
+                        token = choices[0].get("delta", {}).get("content")
+                    except MALFORMED_RESPONSE_ERRORS as exc:
+                        self._record_error(model, "malformed")
+                        raise LLMError(f"{model}: malformed stream chunk ({type(exc).__name__})") from exc
+                    if token:
+                        if first_token:
+                            llm_first_token_seconds.observe(time.perf_counter() - started, model=model)
+                            first_token = False
+                        yield token
+        except httpx.HTTPError as exc:
+            self._record_error(model, "error")
+            raise LLMError(f"{model}: {type(exc).__name__}") from exc
+        elapsed = time.perf_counter() - started
+        llm_requests_total.inc(model=model, outcome="ok")
+        llm_request_seconds.observe(elapsed, model=model, stream="true")
+        stats.counts["ok"] += 1
+        stats.latencies.append(elapsed)
+
+    def _record_error(self, model: str, outcome: str):
+        llm_requests_total.inc(model=model, outcome=outcome)
+        self.model_stats[model].counts["errors"] += 1
+
+    @staticmethod
+    def _backoff(attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, or the provider's Retry-After when it is short enough."""
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after and retry_after.isdigit() and int(retry_after) <= LLM_RETRY_MAX_DELAY:
+            return float(retry_after)
+        return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+    def get_stats(self) -> dict:
+        return {
+            "models": {
+                model: {**self.model_stats[model].snapshot(), "circuit": self.breakers[model].state, "trips": self.breakers[model].trips}
+                for model in self.models
+            },
+            "retry_budget_exhausted": self.retry_budget.exhausted,
+        }
+
+llm_client = LLMClient([OPENROUTER_MODEL, OPENROUTER_FALLBACK_MODEL])
+
+def _llm_samples():
+    collected = [
+        ("llm_circuit_open", "gauge", "1 while the model's circuit breaker is not closed",
+         [({"model": model}, float(breaker.state != "closed")) for model, breaker in llm_client.breakers.items()]),
+        ("llm_retry_budget_exhausted_total", "counter", "Retries refused by the retry budget",
+         [({}, float(llm_client.retry_budget.exhausted))]),
+    ]
+    for key in ("retries", "short_circuited", "hedged", "fallbacks"):
+        collected.append((f"llm_{key}_total", "counter", f"LLM calls {key.replace('_', ' ')}, by model",
+                          [({"model": model}, float(stats.counts[key])) for model, stats in llm_client.model_stats.items()]))
+    return collected
+
+register_collector(_llm_samples)
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, OperationalError, InterfaceError
+from app.database import async_engine
+from app.models import ChatLogs
+from app.services.metrics import register_stats, stage_seconds
+
+# Write-behind settings for chat logs
+CHAT_LOG_QUEUE_SIZE = int(os.getenv("CHAT_LOG_QUEUE_SIZE", 10000))
+CHAT_LOG_BATCH_SIZE = int(os.getenv("CHAT_LOG_BATCH_SIZE", 200))
+CHAT_LOG_FLUSH_INTERVAL = float(os.getenv("CHAT_LOG_FLUSH_INTERVAL", 1.0))
+CHAT_LOG_MAX_RETRIES = int(os.getenv("CHAT_LOG_MAX_RETRIES", 3))
+# When set, records that can't be queued or written are appended here (JSON lines) and replayed after startup
+CHAT_LOG_SPILL_PATH = os.getenv("CHAT_LOG_SPILL_PATH", "")
+
+logger = logging.getLogger(__name__)
+
+class ChatLogWriter:
+    """Buffers chat log records in memory and writes them in multi-row INSERTs off the request path."""
+
+    def __init__(self, queue_size: int = CHAT_LOG_QUEUE_SIZE, batch_size: int = CHAT_LOG_BATCH_SIZE,
+                 flush_interval: float = CHAT_LOG_FLUSH_INTERVAL, spill_path: str = CHAT_LOG_SPILL_PATH):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self._queue = None
+        self._task = None
+        self._replay_task = None
+        self._closing = False
+        # One thread does all spill file I/O, in submission order, off the event loop
+        self._spill_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-log-spill")
+        self.stats = {"enqueued": 0, "flushed": 0, "batches": 0, "dropped": 0, "rejected": 0, "spilled": 0, "replayed": 0, "flush_errors": 0}
+
+    def log(self, record: dict):
+        """Queues one chat_logs row without waiting; spills or drops it if the buffer is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+            self.stats["enqueued"] += 1
+        except asyncio.QueueFull:
+            self._spill_later([record])
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = self._queue or asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def start(self):
+        """Starts the writer; spilled records are replayed in the background so startup never waits on the database."""
+        self._ensure_started()
+        if self.spill_path and (self._replay_task is None or self._replay_task.done()):
+            self._replay_task = asyncio.get_running_loop().create_task(self._replay_spill())
+
+    async def stop(self):
+        """Flushes everything still buffered, then stops the writer and waits for pending spill writes."""
+        if self._replay_task is not None:
+            self._replay_task.cancel()
+            await asyncio.gather(self._replay_task, return_exceptions=True)
+            self._replay_task = None
+        if self._task is not None:
+            self._closing = True
+            await self._task
+            self._task = None
+            self._closing = False
+        # The spill thread runs jobs in order, so this returns once every earlier spill is on disk
+        await asyncio.get_running_loop().run_in_executor(self._spill_pool, lambda: None)
+
+    def _drain(self) -> list:
+        batch = []
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not (self._closing and self._queue.empty()):
+            if self._closing:
+                batch = self._drain()
+            else:
+                # Flush when a full batch is buffered or the interval elapses, whichever comes first
+                batch = []
+                deadline = loop.time() + self.flush_interval
+                while len(batch) < self.batch_size and not self._closing:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            if batch:
+                await self._write(batch)
+
+    async def _write(self, batch: list):
+        """Inserts a batch, retrying transient errors; constraint violations are narrowed down to the bad rows."""
+        for attempt in range(CHAT_LOG_MAX_RETRIES):
+            if attempt:
+                await asyncio.sleep(min(2 ** (attempt - 1) * 0.5, 5))
+            try:
+                with stage_seconds.time(stage="log_flush", tenant="all"):
+                    async with async_engine.begin() as conn:
+                        await conn.execute(insert(ChatLogs), batch)
+                self.stats["flushed"] += len(batch)
+                self.stats["batches"] += 1
+                return
+            except IntegrityError:
+                await self._isolate(batch)
+                return
+            except (OperationalError, InterfaceError, OSError, asyncio.TimeoutError):
+                self.stats["flush_errors"] += 1
+                logger.exception("Chat log flush failed (attempt %s)", attempt + 1)
+            except Exception:
+                self.stats["flush_errors"] += 1
+                logger.exception("Chat log flush failed, not retrying")
+                break
+        self._spill_later(batch)
+
+    async def _isolate(self, batch: list):
+        """One row failing a constraint fails the whole INSERT: write the halves separately so
+        only rows that fail on their own are rejected (not spilled, since a replay would fail again)."""
+        if len(batch) == 1:
+            self.stats["rejected"] += 1
+            logger.warning("Chat log row rejected by a constraint (tenant %s, user %s)", batch[0].get("tenant_id"), batch[0].get("user_id"))
+            return
+        middle = len(batch) // 2
+        await self._write(batch[:middle])
+        await self._write(batch[middle:])
+
+    def _spill_later(self, records: list):
+        """Hands records to the spill thread; the request path never waits on file I/O."""
+        if not self.spill_path:
+            self.stats["dropped"] += len(records)
+            return
+        self._spill_pool.submit(self._spill, records)
+
+    def _spill(self, records: list):
+        """Spill thread: appends records to the spill file."""
+        try:
+            _write_lines(self.spill_path, records, "a")
+            self.stats["spilled"] += len(records)
+        except OSError:
+            logger.exception("Chat log spill failed")
+            self.stats["dropped"] += len(records)
+
+    def _load_replay(self, replay_path: str):
+        """Spill thread: claims the spill file (after any replay left unfinished by a shutdown) and reads it."""
+        if not os.path.exists(replay_path):
+            if not os.path.exists(self.spill_path):
+                return None
+            os.replace(self.spill_path, replay_path)
+        with open(replay_path, encoding="utf-8") as spill:
+            records = [json.loads(line) for line in spill if line.strip()]
+        for record in records:
+            record["created_at"] = datetime.fromisoformat(record["created_at"])
+        return records
+
+    async def _replay_spill(self):
+        """Writes records spilled by a previous run; rows that fail again are spilled anew, not retried in a loop."""
+        loop = asyncio.get_running_loop()
+        replay_path = self.spill_path + ".replay"
+        try:
+            records = await loop.run_in_executor(self._spill_pool, self._load_replay, replay_path)
+        except Exception:
+            logger.exception("Chat log spill replay failed")
+            return
+        if records is None:
+            return
+        written = 0
+        try:
+            for written in range(0, len(records), self.batch_size):
+                await self._write(records[written:written + self.batch_size])
+        except asyncio.CancelledError:
+            # Shutdown mid-replay: keep the rest (the batch in flight included) for the next start
+            await loop.run_in_executor(self._spill_pool, _write_lines, replay_path, records[written:], "w")
+            raise
+        self.stats["replayed"] += len(records)
+        await loop.run_in_executor(self._spill_pool, os.remove, replay_path)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "queue_depth": self._queue.qsize() if self._queue else 0, "queue_size": self.queue_size}
+
+def _write_lines(path: str, records: list, mode: str):
+    with open(path, mode, encoding="utf-8") as spill:
+        for record in records:
+            spill.write(json.dumps(record, default=str) + "\n")
+
+# Shared per-process writer used by the chat pipeline
+chat_log_writer = ChatLogWriter()
+register_stats("chat_log_writer", chat_log_writer.get_stats, counters=("enqueued", "flushed", "batches", "dropped", "rejected", "spilled", "replayed", "flush_errors"))
@@ -1,9 +1,28 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.models import ChatLogs
+from app.services.pagination import keyset_page, DEFAULT_PAGE_SIZE
 
-def get_all_logs(db: Session, user_id: int):
-    """Retrieves all chat logs for a specific user."""
-    return db.query(ChatLogs).filter(ChatLogs.user_id == user_id).order_by(ChatLogs.created_at.desc()).all()
+# Columns returned by list/export endpoints (newest first, keyed on created_at + id)
+CHAT_LOG_COLUMNS = (
+    ChatLogs.id, ChatLogs.tenant_id, ChatLogs.user_id, ChatLogs.message, ChatLogs.response,
+    ChatLogs.source, ChatLogs.user_feedback, ChatLogs.intent_detected, ChatLogs.created_at,
+)
+CHAT_LOG_KEY = [ChatLogs.created_at, ChatLogs.id]
+
+def chat_log_query(user_id: int, tenant_id: int = None):
+    """Projection of a user's chat logs, served by idx_chat_logs_tenant_user / idx_chat_logs_user."""
+    stmt = select(*CHAT_LOG_COLUMNS).where(ChatLogs.user_id == user_id)
+    if tenant_id is not None:
+        stmt = stmt.where(ChatLogs.tenant_id == tenant_id)
+    return stmt
+
+def chat_log_export_query(user_id: int, tenant_id: int = None):
+    return chat_log_query(user_id, tenant_id).order_by(*[c.desc() for c in CHAT_LOG_KEY])
+
+def get_all_logs(db: Session, user_id: int, tenant_id: int = None, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    """Retrieves one page of chat logs for a specific user, newest first."""
+    return keyset_page(db, chat_log_query(user_id, tenant_id), CHAT_LOG_KEY, limit, cursor, descending=True)
 
 def get_log_by_id(db: Session, log_id: int, user_id: int):
     """Retrieves a specific chat log entry by ID."""
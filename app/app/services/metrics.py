@@ -0,0 +1,211 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+import psutil
+
+# Background system sampling (request handlers read the last sample instead of blocking on psutil)
+SYSTEM_METRICS_INTERVAL = float(os.getenv("SYSTEM_METRICS_INTERVAL", 5))
+SYSTEM_SAMPLE_ERROR_LOG_INTERVAL = 60  # Seconds between logged sampler failures while they keep happening
+
+# Seconds; covers sub-millisecond cache lookups up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_metrics = []
+_collectors = []
+
+def _label_key(labelnames: tuple, labels: dict) -> tuple:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+def _format_labels(labelnames: tuple, values: tuple, extra: dict = None) -> str:
+    pairs = list(zip(labelnames, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def tenant_label(tenant_id) -> str:
+    return "none" if tenant_id is None else str(tenant_id)
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        _metrics.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self) -> list:
+        with _lock:
+            return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in self._values.items()]
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [bucket counts..., sum, count]
+        _metrics.append(self)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list:
+        lines = []
+        with _lock:
+            for key, state in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, {'le': bound})} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, {'le': '+Inf'})} {state[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {round(state[-2], 6)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+def register_collector(collect):
+    """`collect()` returns [(name, type, help, [(labels_dict, value), ...]), ...] read at scrape time."""
+    _collectors.append(collect)
+
+def register_stats(prefix: str, stats, counters: tuple = ()):
+    """Exposes the numeric fields of a component's `stats()` dict; keys in `counters` become counters."""
+    def collect():
+        collected = []
+        for key, value in stats().items():
+            if not isinstance(value, (int, float)):
+                continue
+            metric_type = "counter" if key in counters else "gauge"
+            name = f"{prefix}_{key}_total" if key in counters else f"{prefix}_{key}"
+            collected.append((name, metric_type, f"{prefix.replace('_', ' ')}: {key.replace('_', ' ')}", [({}, float(value))]))
+        return collected
+    register_collector(collect)
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        samples = metric.render()
+        if samples:
+            lines += [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.type}", *samples]
+    for collect in _collectors:
+        for name, metric_type, help, samples in collect():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {metric_type}"]
+            for labels, value in samples:
+                labelnames = tuple(labels)
+                lines.append(f"{name}{_format_labels(labelnames, tuple(labels[n] for n in labelnames))} {value}")
+    return "\n".join(lines) + "\n"
+
+# Chat pipeline metrics
+stage_seconds = Histogram("chat_stage_seconds", "Time spent in each chat pipeline stage", ("stage", "tenant"))
+chat_request_seconds = Histogram("chat_request_seconds", "End-to-end chat query latency by answer source", ("tenant", "source"))
+chat_requests_total = Counter("chat_requests_total", "Chat queries answered, by answer source", ("tenant", "source"))
+stage_errors_total = Counter("chat_stage_errors_total", "Chat pipeline stages that failed and were skipped", ("stage", "tenant"))
+llm_requests_total = Counter("llm_requests_total", "LLM completion requests by outcome", ("model", "outcome"))
+llm_request_seconds = Histogram("llm_request_seconds", "LLM completion latency (full response)", ("model", "stream"))
+llm_first_token_seconds = Histogram("llm_first_token_seconds", "Time to the first streamed LLM token", ("model",))
+llm_tokens_total = Counter("llm_tokens_total", "LLM tokens reported by the provider", ("model", "kind"))
+
+def stage_timer(stage: str, tenant_id=None):
+    return stage_seconds.time(stage=stage, tenant=tenant_label(tenant_id))
+
+def record_llm_usage(model: str, usage: dict):
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage and usage.get(kind):
+            llm_tokens_total.inc(usage[kind], model=model, kind=kind.replace("_tokens", ""))
+
+class SystemSampler:
+    """Samples psutil on a daemon thread; readers get the latest values without blocking."""
+
+    def __init__(self, interval: float = SYSTEM_METRICS_INTERVAL):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.latest = {}
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self) -> dict:
+        memory = psutil.virtual_memory()
+        with self.process.oneshot():
+            rss = self.process.memory_info().rss
+            threads = self.process.num_threads()
+        self.latest = {
+            "cpu_usage": psutil.cpu_percent(interval=None),  # Since the previous sample
+            "memory_usage": memory.percent,
+            "memory_available_bytes": memory.available,
+            "disk_usage": psutil.disk_usage("/").percent,
+            "process_rss_bytes": rss,
+            "process_threads": threads,
+            "sampled_at": time.time(),
+        }
+        return self.latest
+
+    def start(self):
+        if self._thread is None:
+            psutil.cpu_percent(interval=None)  # Prime the CPU counter
+            self.sample()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        last_logged = None
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception:
+                # Keep sampling; the gauges hold the last good values (see system_sampled_at)
+                self.failures += 1
+                now = time.monotonic()
+                if last_logged is None or now - last_logged >= SYSTEM_SAMPLE_ERROR_LOG_INTERVAL:
+                    last_logged = now
+                    logger.exception("System metrics sample failed (%s failures so far)", self.failures)
+
+    def current(self) -> dict:
+        return self.latest or self.sample()
+
+system_sampler = SystemSampler()
+
+def _system_samples():
+    values = system_sampler.current()
+    return [
+        (f"system_{key}", "gauge", f"Latest background sample of {key.replace('_', ' ')}", [({}, value)])
+        for key, value in values.items()
+    ] + [("system_sample_failures_total", "counter", "Background system samples that raised", [({}, float(system_sampler.failures))])]
+
+register_collector(_system_samples)
@@ -0,0 +1,77 @@
+import base64
+import csv
+import io
+import json
+from datetime import date, datetime
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_FETCH_SIZE = 1000  # Rows pulled per round trip from the server-side cursor
+EXPORT_FORMATS = ("ndjson", "csv")
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(values) -> str:
+    payload = json.dumps([v.isoformat() if isinstance(v, (datetime, date)) else v for v in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str, columns) -> list:
+    """Decodes a cursor back into typed values for the given key columns."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as exc:
+        raise InvalidCursor("Malformed cursor") from exc
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidCursor("Malformed cursor")
+    decoded = []
+    for value, column in zip(values, columns):
+        python_type = column.type.python_type
+        decoded.append(python_type.fromisoformat(value) if python_type in (datetime, date) and value is not None else value)
+    return decoded
+
+def keyset_page(db: Session, stmt, key_columns: list, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, descending: bool = False):
+    """Runs one page of `stmt` ordered by `key_columns` (which must be unique together).
+
+    Instead of OFFSET, the page starts strictly after the cursor row, so every
+    page costs the same index range scan. Returns {"items", "next_cursor"}.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        after = tuple_(*key_columns) < tuple_(*decode_cursor(cursor, key_columns)) if descending \
+            else tuple_(*key_columns) > tuple_(*decode_cursor(cursor, key_columns))
+        stmt = stmt.where(after)
+    order = [c.desc() for c in key_columns] if descending else list(key_columns)
+    rows = db.execute(stmt.order_by(*order).limit(limit + 1)).all()
+    items = [row._asdict() for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor([items[-1][c.key] for c in key_columns])
+    return {"items": items, "next_cursor": next_cursor}
+
+def stream_export(session_factory, stmt, fmt: str = "ndjson"):
+    """Yields the query result as NDJSON lines or CSV text in constant memory.
+
+    Rows come from a server-side cursor. The generator opens its own session
+    because it keeps running after the request handler has returned.
+    """
+    with session_factory() as db:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=EXPORT_FETCH_SIZE))
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(result.keys())
+            for partition in result.partitions():
+                writer.writerows(partition)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        else:
+            keys = list(result.keys())
+            for partition in result.partitions():
+                yield "".join(json.dumps(dict(zip(keys, row)), default=str) + "\n" for row in partition)
+
+def export_media_type(fmt: str) -> str:
+    return "text/csv" if fmt == "csv" else "application/x-ndjson"
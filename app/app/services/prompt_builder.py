@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+from app.services.embedding_backends import EMBEDDING_MODEL_NAME
+from app.services.settings_cache import settings_cache
+
+# Retrieval-augmented prompt settings: how many passages to consider and how much of them to send
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", 8))
+RAG_MIN_SIMILARITY = float(os.getenv("RAG_MIN_SIMILARITY", 0.5))  # Context floor; below the direct-answer threshold
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", 1200))
+RAG_MIN_PASSAGE_TOKENS = int(os.getenv("RAG_MIN_PASSAGE_TOKENS", 48))  # Don't send truncated stubs shorter than this
+RAG_DEDUP_SIMILARITY = float(os.getenv("RAG_DEDUP_SIMILARITY", 0.8))  # Word-shingle Jaccard treated as a near-duplicate
+# Local tokenizer (tokenizer.json from a Hugging Face repo or directory); counts fall back to ~4 chars/token
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", EMBEDDING_MODEL_NAME)
+
+# Per-tenant overrides in chatbot_settings
+CONTEXT_TOKENS_SETTING = "rag_context_tokens"
+SYSTEM_PROMPT_SETTING = "rag_system_prompt"
+
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a customer support assistant. Answer using the numbered context passages when they are relevant. "
+    "If the context doesn't cover the question, say so briefly instead of guessing. Keep answers short."
+)
+
+logger = logging.getLogger(__name__)
+
+class TokenCounter:
+    """Counts tokens with a local `tokenizers` tokenizer, loaded on first use."""
+
+    def __init__(self, name: str = PROMPT_TOKENIZER):
+        self.name = name
+        self._tokenizer = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.report = {"tokenizer": name, "loaded": False}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self):
+        """Loads the tokenizer once (may download tokenizer.json); safe to call from several threads."""
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                from tokenizers import Tokenizer
+                if os.path.isdir(self.name):
+                    tokenizer = Tokenizer.from_file(os.path.join(self.name, "tokenizer.json"))
+                else:
+                    from huggingface_hub import hf_hub_download
+                    tokenizer = Tokenizer.from_file(hf_hub_download(self.name, "tokenizer.json"))
+                tokenizer.no_truncation()
+                tokenizer.no_padding()
+                self._tokenizer = tokenizer
+                self.report["loaded"] = True
+            except Exception as exc:
+                logger.warning("prompt tokenizer %s unavailable, estimating tokens from length: %s", self.name, exc)
+                self.report["error"] = str(exc)
+            self._loaded = True
+
+    def count(self, text: str) -> int:
+        if not self._loaded:
+            self.load()
+        if self._tokenizer is None:
+            return (len(text) + 3) // 4
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """The longest prefix of `text` within `max_tokens`, cut at a word boundary."""
+        if not self._loaded:
+            self.load()
+        if self._tokenizer is None:
+            if len(text) <= max_tokens * 4:
+                return text
+            cut = text[:max_tokens * 4]
+        else:
+            offsets = self._tokenizer.encode(text, add_special_tokens=False).offsets
+            if len(offsets) <= max_tokens:
+                return text
+            cut = text[:offsets[max_tokens - 1][1]]
+        return cut.rsplit(" ", 1)[0] if " " in cut else cut
+
+token_counter = TokenCounter()
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+def dedupe_passages(passages: list, threshold: float = RAG_DEDUP_SIMILARITY) -> list:
+    """Drops exact (normalized) and near-duplicate passages, keeping the first, most relevant, copy."""
+    kept, seen_hashes, kept_shingles = [], set(), []
+    for passage in passages:
+        normalized = " ".join(re.findall(r"\w+", passage["content"].lower()))
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        if digest in seen_hashes:
+            continue
+        shingles = _shingles(normalized)
+        if any(len(shingles & other) / len(shingles | other) >= threshold for other in kept_shingles):
+            continue
+        seen_hashes.add(digest)
+        kept_shingles.append(shingles)
+        kept.append(passage)
+    return kept
+
+def pack_passages(passages: list, budget: int, counter: TokenCounter = token_counter) -> list:
+    """Greedily fits passages (best first) into `budget` tokens; the last one may be truncated."""
+    packed, remaining = [], budget
+    for passage in passages:
+        text = f"{passage['title']}\n{passage['content']}" if passage.get("title") else passage["content"]
+        tokens = counter.count(text)
+        if tokens > remaining:
+            if remaining < RAG_MIN_PASSAGE_TOKENS:
+                break
+            text = counter.truncate(text, remaining)
+            tokens = counter.count(text)
+        packed.append(text)
+        remaining -= tokens
+        if remaining < RAG_MIN_PASSAGE_TOKENS:
+            break
+    return packed
+
+async def get_prompt_settings(tenant_id: int) -> tuple:
+    """Returns (system_prompt, context_token_budget) for the tenant, with env defaults."""
+    if tenant_id is None:
+        return DEFAULT_SYSTEM_PROMPT, RAG_CONTEXT_TOKENS
+    settings = await settings_cache.get_async(tenant_id)
+    budget = settings.get(CONTEXT_TOKENS_SETTING, "")
+    return settings.get(SYSTEM_PROMPT_SETTING) or DEFAULT_SYSTEM_PROMPT, int(budget) if budget.isdigit() else RAG_CONTEXT_TOKENS
+
+async def build_prompt(message: str, passages: list, tenant_id: int = None, history=None) -> list:
+    """Chat messages for the LLM: a stable per-tenant system prefix, then conversation memory,
+    packed context and the question.
+
+    The system message comes first and is byte-identical across requests, so providers that cache
+    prompt prefixes can reuse it; everything that varies per question follows it. `history` is a
+    session_memory.SessionContext (bounded summary plus recent turns).
+    """
+    if not token_counter.loaded:
+        await asyncio.to_thread(token_counter.load)  # Keep a first-use download off the event loop
+    system_prompt, budget = await get_prompt_settings(tenant_id)
+    messages = [{"role": "system", "content": system_prompt}]
+    if history is not None:
+        if history.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{history.summary}"})
+        for user_message, assistant_message in history.turns:
+            messages += [{"role": "user", "content": user_message}, {"role": "assistant", "content": assistant_message}]
+    packed = pack_passages(dedupe_passages(passages), budget)
+    if not packed:
+        messages.append({"role": "user", "content": message})
+        return messages
+    context = "\n\n".join(f"[{n}] {text}" for n, text in enumerate(packed, 1))
+    messages.append({"role": "user", "content": f"Context:\n{context}\n\nQuestion: {message}"})
+    return messages
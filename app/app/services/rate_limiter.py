@@ -0,0 +1,186 @@
+import math
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+from sqlalchemy import text
+from app.database import async_engine
+from app.services.settings_cache import settings_cache
+
+# Rate limit settings (defaults; tenants override them through chatbot_settings)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "local")  # 'local' (per process) or 'postgres' (shared)
+RATE_LIMIT_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", 60))
+RATE_LIMIT_USER_PER_WINDOW = int(os.getenv("RATE_LIMIT_USER_PER_WINDOW", 5))
+RATE_LIMIT_TENANT_PER_WINDOW = int(os.getenv("RATE_LIMIT_TENANT_PER_WINDOW", 300))
+RATE_LIMIT_LOCAL_MAX_KEYS = int(os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS", 100000))
+
+USER_LIMIT_SETTING = "rate_limit_user_per_minute"
+TENANT_LIMIT_SETTING = "rate_limit_tenant_per_minute"
+
+class RateLimitDecision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # Seconds until the current window ends
+    retry_after: float  # Seconds until a request would be allowed again (0 if allowed)
+
+    def headers(self) -> dict:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+class RateLimitExceeded(Exception):
+    def __init__(self, decision: RateLimitDecision):
+        super().__init__("Rate limit exceeded")
+        self.decision = decision
+
+def sliding_window_decision(now: float, window: int, limit: int, current: int, previous: int) -> RateLimitDecision:
+    """Sliding-window-counter estimate: the previous window's count weighted by its remaining overlap.
+
+    `current` already includes this request.
+    """
+    elapsed = now % window
+    weight = (window - elapsed) / window
+    estimated = previous * weight + current
+    allowed = estimated <= limit
+    if allowed:
+        retry_after = 0.0
+    elif current > limit:
+        retry_after = window - elapsed
+    else:
+        # Wait until enough of the previous window has slid out
+        retry_after = min(window - elapsed, (estimated - limit) * window / previous if previous else window - elapsed)
+    return RateLimitDecision(allowed, limit, max(0, int(limit - estimated)), window - elapsed, retry_after)
+
+class LocalRateLimitBackend:
+    """In-process counters (O(1) per hit, LRU-bounded). Limits apply per worker process."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_LOCAL_MAX_KEYS):
+        self.max_keys = max_keys
+        self.counters = OrderedDict()  # key -> [window_index, current, previous]
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitDecision:
+        now = time.time()
+        index = int(now // window)
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.counters[key] = [index, 0, 0]
+            if len(self.counters) > self.max_keys:
+                self.counters.popitem(last=False)  # Idle keys fall off the LRU end
+        else:
+            self.counters.move_to_end(key)
+            if counter[0] != index:
+                counter[2] = counter[1] if counter[0] == index - 1 else 0
+                counter[0], counter[1] = index, 0
+        counter[1] += 1
+        return sliding_window_decision(now, window, limit, counter[1], counter[2])
+
+    async def hit_nested(self, key: str, limit: int, outer_key: str, outer_limit: int, window: int) -> tuple:
+        """Counts `key`, then `outer_key` only if `key` was allowed. Returns (decision, outer decision or None)."""
+        decision = await self.hit(key, limit, window)
+        if not decision.allowed:
+            return decision, None
+        return decision, await self.hit(outer_key, outer_limit, window)
+
+class PostgresRateLimitBackend:
+    """Counters in an UNLOGGED Postgres table, shared by every worker process (one round trip per hit)."""
+
+    HIT_QUERY = text("""
+        WITH current_window AS (
+            INSERT INTO rate_limit_counters (bucket_key, window_start, hits)
+            VALUES (:key, :window_start, 1)
+            ON CONFLICT (bucket_key, window_start) DO UPDATE SET hits = rate_limit_counters.hits + 1
+            RETURNING hits
+        )
+        SELECT (SELECT hits FROM current_window),
+               COALESCE((SELECT hits FROM rate_limit_counters
+                         WHERE bucket_key = :key AND window_start = :previous_start), 0)
+    """)
+    # Both buckets in one statement; the outer (tenant) bucket is only counted if the inner (user)
+    # bucket's sliding-window estimate is within its limit, as with two sequential hits
+    NESTED_HIT_QUERY = text("""
+        WITH inner_current AS (
+            INSERT INTO rate_limit_counters (bucket_key, window_start, hits)
+            VALUES (:key, :window_start, 1)
+            ON CONFLICT (bucket_key, window_start) DO UPDATE SET hits = rate_limit_counters.hits + 1
+            RETURNING hits
+        ),
+        inner_previous AS (
+            SELECT COALESCE((SELECT hits FROM rate_limit_counters
+                             WHERE bucket_key = :key AND window_start = :previous_start), 0) AS hits
+        ),
+        outer_current AS (
+            INSERT INTO rate_limit_counters (bucket_key, window_start, hits)
+            SELECT CAST(:outer_key AS VARCHAR), CAST(:window_start AS BIGINT), 1 FROM inner_current, inner_previous
+            WHERE inner_previous.hits * CAST(:weight AS DOUBLE PRECISION) + inner_current.hits <= CAST(:limit AS INTEGER)
+            ON CONFLICT (bucket_key, window_start) DO UPDATE SET hits = rate_limit_counters.hits + 1
+            RETURNING hits
+        )
+        SELECT (SELECT hits FROM inner_current), (SELECT hits FROM inner_previous), (SELECT hits FROM outer_current),
+               COALESCE((SELECT hits FROM rate_limit_counters
+                         WHERE bucket_key = :outer_key AND window_start = :previous_start), 0)
+    """)
+    CLEANUP_QUERY = text("DELETE FROM rate_limit_counters WHERE window_start < :cutoff")
+    CLEANUP_PROBABILITY = 0.001
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitDecision:
+        now = time.time()
+        window_start = int(now // window) * window
+        async with async_engine.begin() as conn:
+            current, previous = (await conn.execute(
+                self.HIT_QUERY, {"key": key, "window_start": window_start, "previous_start": window_start - window}
+            )).one()
+            if random.random() < self.CLEANUP_PROBABILITY:
+                await conn.execute(self.CLEANUP_QUERY, {"cutoff": window_start - window})
+        return sliding_window_decision(now, window, limit, current, previous)
+
+    async def hit_nested(self, key: str, limit: int, outer_key: str, outer_limit: int, window: int) -> tuple:
+        """Counts `key`, then `outer_key` only if `key` was allowed, in one round trip."""
+        now = time.time()
+        window_start = int(now // window) * window
+        async with async_engine.begin() as conn:
+            current, previous, outer_current, outer_previous = (await conn.execute(self.NESTED_HIT_QUERY, {
+                "key": key, "outer_key": outer_key, "limit": limit, "weight": (window - now % window) / window,
+                "window_start": window_start, "previous_start": window_start - window,
+            })).one()
+            if random.random() < self.CLEANUP_PROBABILITY:
+                await conn.execute(self.CLEANUP_QUERY, {"cutoff": window_start - window})
+        decision = sliding_window_decision(now, window, limit, current, previous)
+        if outer_current is None:
+            return decision, None
+        return decision, sliding_window_decision(now, window, outer_limit, outer_current, outer_previous)
+
+RATE_LIMIT_BACKENDS = {"local": LocalRateLimitBackend, "postgres": PostgresRateLimitBackend}
+rate_limit_backend = RATE_LIMIT_BACKENDS[RATE_LIMIT_BACKEND]()
+
+def _setting_int(settings: dict, key: str, default: int) -> int:
+    value = settings.get(key, "")
+    return int(value) if value.isdigit() else default
+
+async def get_tenant_limits(tenant_id: int) -> tuple:
+    """Returns (user_limit, tenant_limit) per window from chatbot_settings, with env defaults."""
+    if tenant_id is None:
+        return RATE_LIMIT_USER_PER_WINDOW, RATE_LIMIT_TENANT_PER_WINDOW
+    settings = await settings_cache.get_async(tenant_id)
+    return (
+        _setting_int(settings, USER_LIMIT_SETTING, RATE_LIMIT_USER_PER_WINDOW),
+        _setting_int(settings, TENANT_LIMIT_SETTING, RATE_LIMIT_TENANT_PER_WINDOW),
+    )
+
+async def check_ai_rate_limit(tenant_id: int, user_id: int) -> RateLimitDecision:
+    """Applies the per-user and per-tenant AI limits; returns the most restrictive decision."""
+    user_limit, tenant_limit = await get_tenant_limits(tenant_id)
+    user_decision, tenant_decision = await rate_limit_backend.hit_nested(
+        f"user:{tenant_id}:{user_id}", user_limit, f"tenant:{tenant_id}", tenant_limit, RATE_LIMIT_WINDOW
+    )
+    if tenant_decision is None:
+        return user_decision
+    if not tenant_decision.allowed or tenant_decision.remaining < user_decision.remaining:
+        return tenant_decision
+    return user_decision
@@ -0,0 +1,162 @@
+import os
+import re
+import time
+from collections import OrderedDict
+import numpy as np
+from app.services.metrics import register_stats
+
+# Semantic cache settings (per tenant)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 5000))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 3600))
+RESPONSE_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIMILARITY_THRESHOLD", 0.92))
+
+CONTRACTIONS = {
+    "what's": "what is", "where's": "where is", "how's": "how is", "who's": "who is",
+    "it's": "it is", "that's": "that is", "there's": "there is", "can't": "cannot",
+    "won't": "will not", "don't": "do not", "doesn't": "does not", "isn't": "is not",
+    "i'm": "i am", "you're": "you are", "i've": "i have", "i'd": "i would",
+}
+
+def normalize_message(message: str) -> str:
+    """Lowercases, expands common contractions and strips punctuation."""
+    text = message.lower().replace("’", "'")
+    text = " ".join(CONTRACTIONS.get(word, word) for word in text.split())
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+class _TenantCache:
+    """LRU of cached answers for one tenant plus a matrix of their embeddings."""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # normalized message -> (response, expires_at, row)
+        self.keys = []                # row -> normalized message
+        self.matrix = None            # unit-norm embeddings, one row per entry
+
+    def _remove(self, key):
+        _, _, row = self.entries.pop(key)
+        last = len(self.keys) - 1
+        # Keep the matrix dense by moving the last row into the freed slot
+        if row != last:
+            moved = self.keys[last]
+            self.keys[row] = moved
+            self.matrix[row] = self.matrix[last]
+            response, expires_at, _ = self.entries[moved]
+            self.entries[moved] = (response, expires_at, row)
+        self.keys.pop()
+        self.matrix = self.matrix[:last] if last else None
+
+class SemanticResponseCache:
+    """Tenant-scoped response cache matching near-duplicate questions by embedding similarity."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl: float = RESPONSE_CACHE_TTL,
+                 threshold: float = RESPONSE_CACHE_SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.tenants = {}
+        self.exact_hits = 0  # get_exact() lookups, counted apart from full get() lookups
+        self.exact_misses = 0
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_exact(self, tenant_id, message: str):
+        """Exact normalized-message lookup that needs no embedding.
+
+        Counted as exact_hits/exact_misses: a miss here is not always followed by a full get()
+        (retrieval may answer first), so the two lookups keep separate counters.
+        """
+        cache = self.tenants.get(tenant_id)
+        key = normalize_message(message)
+        entry = cache.entries.get(key) if cache is not None else None
+        if entry is not None and entry[1] > time.monotonic():
+            cache.entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry[0]
+        self.exact_misses += 1
+        return None
+
+    def get(self, tenant_id, message: str, embedding=None):
+        """Returns a cached response for the message, or None on a miss."""
+        cache = self.tenants.get(tenant_id)
+        if cache is None:
+            self.misses += 1
+            return None
+        now = time.monotonic()
+        key = normalize_message(message)
+
+        entry = cache.entries.get(key)
+        if entry is not None and entry[1] > now:
+            cache.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        if embedding is not None and cache.matrix is not None:
+            scores = cache.matrix @ _unit(embedding)
+            row = int(np.argmax(scores))
+            if scores[row] >= self.threshold:
+                match = cache.keys[row]
+                response, expires_at, _ = cache.entries[match]
+                if expires_at > now:
+                    cache.entries.move_to_end(match)
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return response
+        self.misses += 1
+        return None
+
+    def set(self, tenant_id, message: str, response: str, embedding):
+        """Caches a response under the message and its embedding."""
+        cache = self.tenants.setdefault(tenant_id, _TenantCache())
+        key = normalize_message(message)
+        if key in cache.entries:
+            cache._remove(key)
+        self._evict(cache)
+
+        vector = _unit(embedding)[np.newaxis, :]
+        cache.matrix = vector if cache.matrix is None else np.vstack([cache.matrix, vector])
+        cache.keys.append(key)
+        cache.entries[key] = (response, time.monotonic() + self.ttl, len(cache.keys) - 1)
+
+    def _evict(self, cache: _TenantCache):
+        """Drops expired entries, then least recently used ones until there is room."""
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at, _) in cache.entries.items() if expires_at <= now]:
+            cache._remove(key)
+            self.evictions += 1
+        while len(cache.entries) >= self.max_entries:
+            cache._remove(next(iter(cache.entries)))
+            self.evictions += 1
+
+    def invalidate(self, tenant_id=None):
+        """Clears one tenant's entries, or the whole cache."""
+        if tenant_id is None:
+            self.tenants.clear()
+        else:
+            self.tenants.pop(tenant_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        exact_lookups = self.exact_hits + self.exact_misses
+        return {
+            "entries": sum(len(c.entries) for c in self.tenants.values()),
+            "tenants": len(self.tenants),
+            "exact_hits": self.exact_hits,
+            "exact_misses": self.exact_misses,
+            "exact_hit_ratio": self.exact_hits / exact_lookups if exact_lookups else 0.0,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+def _unit(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+# Shared per-process cache used by the chat pipeline
+response_cache = SemanticResponseCache()
+register_stats("response_cache", response_cache.stats, counters=("exact_hits", "exact_misses", "hits", "semantic_hits", "misses", "evictions"))
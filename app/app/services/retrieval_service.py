@@ -0,0 +1,100 @@
+import os
+from sqlalchemy import select, func, or_, case, cast, Float
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import KnowledgeBase, VectorIndex
+from app.services.knowledge_service import TEXT_SEARCH_CONFIG, TEXT_SEARCH_MIN_RANK
+from app.services.vector_service import VECTOR_MIN_SIMILARITY, generate_embedding, ann_session_settings
+from app.services.metrics import stage_timer
+
+# Hybrid retrieval: candidates from each ranking, fused with reciprocal rank fusion
+HYBRID_TEXT_K = int(os.getenv("HYBRID_TEXT_K", 20))
+HYBRID_VECTOR_K = int(os.getenv("HYBRID_VECTOR_K", 20))
+HYBRID_LIMIT = int(os.getenv("HYBRID_LIMIT", 5))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", 60))  # Damps the weight of the very top ranks
+
+def build_hybrid_search_query(query_text: str, query_vector: list, tenant_id: int = None, limit: int = HYBRID_LIMIT,
+                              min_similarity: float = VECTOR_MIN_SIMILARITY, candidate_min_similarity: float = None):
+    """Full-text and pgvector rankings as CTEs, fused with RRF and joined to knowledge_base in one statement.
+
+    A row `qualified` as an answer if it passes either ranking's own threshold; `source` says which did.
+    With `candidate_min_similarity` below `min_similarity`, weaker vector matches are returned too
+    (unqualified), e.g. as prompt context.
+    """
+    ts_query = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, query_text)
+    text_score = func.ts_rank_cd(KnowledgeBase.search_vector, ts_query)
+    text_top = select(KnowledgeBase.id.label("knowledge_id"), text_score.label("text_score")).where(
+        KnowledgeBase.search_vector.op("@@")(ts_query)
+    )
+    # Rank inside a limited subquery so each side keeps its index-ordered scan (GIN / HNSW)
+    distance = VectorIndex.embedding_vector.cosine_distance(query_vector)
+    vector_top = select(VectorIndex.knowledge_id, (1 - distance).label("similarity"))
+    if tenant_id is not None:
+        text_top = text_top.where(KnowledgeBase.tenant_id == tenant_id)
+        vector_top = vector_top.where(VectorIndex.tenant_id == tenant_id)
+    text_top = text_top.order_by(text_score.desc()).limit(HYBRID_TEXT_K).subquery("text_top")
+    vector_top = vector_top.order_by(distance).limit(HYBRID_VECTOR_K).subquery("vector_top")
+
+    text_hits = select(
+        text_top.c.knowledge_id, text_top.c.text_score,
+        func.row_number().over(order_by=text_top.c.text_score.desc()).label("text_rank"),
+    ).cte("text_hits")
+    vector_hits = select(
+        vector_top.c.knowledge_id, vector_top.c.similarity,
+        func.row_number().over(order_by=vector_top.c.similarity.desc()).label("vector_rank"),
+    ).cte("vector_hits")
+    fused = select(
+        func.coalesce(text_hits.c.knowledge_id, vector_hits.c.knowledge_id).label("knowledge_id"),
+        text_hits.c.text_score, text_hits.c.text_rank, vector_hits.c.similarity, vector_hits.c.vector_rank,
+    ).select_from(
+        text_hits.join(vector_hits, text_hits.c.knowledge_id == vector_hits.c.knowledge_id, full=True)
+    ).cte("fused")
+
+    text_match = fused.c.text_score >= TEXT_SEARCH_MIN_RANK
+    vector_match = fused.c.similarity >= min_similarity
+    score = cast(
+        func.coalesce(1.0 / (HYBRID_RRF_K + fused.c.text_rank), 0.0)
+        + func.coalesce(1.0 / (HYBRID_RRF_K + fused.c.vector_rank), 0.0),
+        Float,
+    ).label("score")
+    qualified = func.coalesce(or_(text_match, vector_match), False).label("qualified")
+    candidate_floor = min_similarity if candidate_min_similarity is None else min(candidate_min_similarity, min_similarity)
+    source = case(
+        (text_match & vector_match, "hybrid_search"),
+        (text_match, "knowledge_base"),
+        else_="vector_search",
+    ).label("source")
+    return select(
+        KnowledgeBase.id, KnowledgeBase.title, KnowledgeBase.content,
+        fused.c.text_score, fused.c.similarity, score, source, qualified,
+    ).join(fused, KnowledgeBase.id == fused.c.knowledge_id).where(
+        or_(text_match, fused.c.similarity >= candidate_floor)
+    ).order_by(score.desc()).limit(limit)
+
+def _hybrid_results(rows):
+    return [
+        {"id": r.id, "title": r.title, "content": r.content, "text_score": r.text_score,
+         "similarity": r.similarity, "score": r.score, "source": r.source, "qualified": r.qualified}
+        for r in rows
+    ]
+
+def hybrid_search(db: Session, query_text: str, tenant_id: int = None, limit: int = HYBRID_LIMIT,
+                  min_similarity: float = VECTOR_MIN_SIMILARITY, ef_search: int = None):
+    """Returns knowledge base entries ranked by fused full-text and vector relevance, best first."""
+    with stage_timer("embedding", tenant_id):
+        query_vector = generate_embedding(query_text)
+    with stage_timer("hybrid_search", tenant_id):
+        if ef_search is not None:
+            db.execute(ann_session_settings(ef_search))
+        rows = db.execute(build_hybrid_search_query(query_text, query_vector, tenant_id, limit, min_similarity)).all()
+    return _hybrid_results(rows)
+
+async def hybrid_search_async(db: AsyncSession, query_text: str, query_vector: list, tenant_id: int = None,
+                              limit: int = HYBRID_LIMIT, min_similarity: float = VECTOR_MIN_SIMILARITY,
+                              candidate_min_similarity: float = None):
+    """Async variant of hybrid_search for the chat pipeline; takes an already computed embedding."""
+    with stage_timer("hybrid_search", tenant_id):
+        rows = (await db.execute(build_hybrid_search_query(
+            query_text, query_vector, tenant_id, limit, min_similarity, candidate_min_similarity
+        ))).all()
+    return _hybrid_results(rows)
@@ -0,0 +1,211 @@
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, insert, func, text, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import ChatLogs, ChatLogRollup, ChatIntentRollup, ChatLogRollupState
+
+# Chat log maintenance: monthly partitions ahead of time, retention, and hourly rollups for analytics
+CHAT_LOG_PARTITIONS_AHEAD = int(os.getenv("CHAT_LOG_PARTITIONS_AHEAD", 2))  # Future months kept ready
+CHAT_LOG_RETENTION_MONTHS = int(os.getenv("CHAT_LOG_RETENTION_MONTHS", 0))  # Raw logs kept (0 = forever)
+CHAT_ROLLUP_INTERVAL = float(os.getenv("CHAT_ROLLUP_INTERVAL", 60))
+# Hours re-aggregated on every run, so late log flushes and feedback updates are picked up
+CHAT_ROLLUP_LOOKBACK_HOURS = int(os.getenv("CHAT_ROLLUP_LOOKBACK_HOURS", 2))
+CHAT_ROLLUP_BATCH_HOURS = int(os.getenv("CHAT_ROLLUP_BATCH_HOURS", 24))  # Per transaction while catching up
+CHAT_MAINTENANCE_LOCK_TIMEOUT = os.getenv("CHAT_MAINTENANCE_LOCK_TIMEOUT", "5s")  # DDL gives up rather than queue inserts
+
+ROLLUP_NAME = "chat_logs"
+ROLLUP_LOCK_ID = 7426001  # pg advisory lock: one maintenance run at a time across workers
+PARTITION_PATTERN = re.compile(r"^chat_logs_p(\d{4})_(\d{2})$")
+DEFAULT_PARTITION = "chat_logs_default"
+
+logger = logging.getLogger(__name__)
+
+# Counters for this process's workers
+rollup_stats = {"runs": 0, "hours_rolled_up": 0, "partitions_created": 0, "partitions_dropped": 0, "failures": 0}
+_stats_lock = threading.Lock()
+
+def month_start(moment: datetime, months: int = 0) -> datetime:
+    month = moment.year * 12 + moment.month - 1 + months
+    return datetime(month // 12, month % 12 + 1, 1)
+
+def hour_start(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def partition_name(start: datetime) -> str:
+    return f"chat_logs_p{start:%Y_%m}"
+
+def _try_lock(db: Session) -> bool:
+    """Transaction-scoped advisory lock; False if another worker is already running maintenance."""
+    return db.execute(select(func.pg_try_advisory_xact_lock(ROLLUP_LOCK_ID))).scalar()
+
+def list_partitions(db: Session) -> dict:
+    """Monthly chat_logs partitions as {name: month start}."""
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'chat_logs'::regclass"
+    )).scalars()
+    partitions = {}
+    for name in names:
+        match = PARTITION_PATTERN.match(name)
+        if match:
+            partitions[name] = datetime(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+def _create_partition(db: Session, start: datetime):
+    end = month_start(start, 1)
+    name = partition_name(start)
+    create = f"CREATE TABLE {name} PARTITION OF chat_logs FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+    stranded = db.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end)"
+    ), {"start": start, "end": end}).scalar()
+    if not stranded:
+        db.execute(text(create))
+        return
+    # Rows already in the default partition for this month would violate the new bounds: move them across
+    db.execute(text(f"ALTER TABLE chat_logs DETACH PARTITION {DEFAULT_PARTITION}"))
+    db.execute(text(create))
+    db.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end RETURNING *) "
+        "INSERT INTO chat_logs SELECT * FROM moved"
+    ), {"start": start, "end": end})
+    db.execute(text(f"ALTER TABLE chat_logs ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+
+def maintain_partitions(db: Session, now: datetime = None) -> tuple:
+    """Creates missing partitions up to CHAT_LOG_PARTITIONS_AHEAD months out and drops ones past retention.
+
+    A partition is only dropped once the rollups cover it, so analytics keep its history.
+    Returns (created, dropped) partition names.
+    """
+    now = now or datetime.utcnow()
+    if not _try_lock(db):
+        db.rollback()
+        return [], []
+    db.execute(text(f"SET LOCAL lock_timeout = '{CHAT_MAINTENANCE_LOCK_TIMEOUT}'"))
+    partitions = list_partitions(db)
+    created, dropped = [], []
+    for months in range(CHAT_LOG_PARTITIONS_AHEAD + 1):
+        start = month_start(now, months)
+        if partition_name(start) not in partitions:
+            _create_partition(db, start)
+            created.append(partition_name(start))
+    if CHAT_LOG_RETENTION_MONTHS > 0:
+        cutoff = month_start(now, -CHAT_LOG_RETENTION_MONTHS)
+        rolled_up_to = _watermark(db)
+        for name, start in sorted(partitions.items(), key=lambda item: item[1]):
+            end = month_start(start, 1)
+            if end <= cutoff and rolled_up_to is not None and end <= rolled_up_to:
+                db.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+    db.commit()
+    if created or dropped:
+        logger.info("chat_logs partitions created %s, dropped %s", created, dropped)
+    with _stats_lock:
+        rollup_stats["partitions_created"] += len(created)
+        rollup_stats["partitions_dropped"] += len(dropped)
+    return created, dropped
+
+def _watermark(db: Session):
+    return db.execute(select(ChatLogRollupState.rolled_up_to).where(ChatLogRollupState.name == ROLLUP_NAME)).scalar()
+
+def _rollup_rows(start: datetime, end: datetime):
+    """Per tenant/hour/source counts and per tenant/hour/intent counts for logs created in [start, end)."""
+    # Inline constants: grouped expressions must match the selected ones exactly, bind parameters included
+    bucket = func.date_trunc(literal_column("'hour'"), ChatLogs.created_at)
+    tenant = func.coalesce(ChatLogs.tenant_id, literal_column("0"))
+    in_window = (ChatLogs.created_at >= start, ChatLogs.created_at < end)
+    sources = select(
+        tenant, bucket, ChatLogs.source, func.count(),
+        func.count().filter(ChatLogs.user_feedback == "positive"),
+        func.count().filter(ChatLogs.user_feedback == "neutral"),
+        func.count().filter(ChatLogs.user_feedback == "negative"),
+    ).where(*in_window).group_by(tenant, bucket, ChatLogs.source)
+    intents = select(tenant, bucket, ChatLogs.intent_detected, func.count()).where(
+        *in_window, ChatLogs.intent_detected.is_not(None)
+    ).group_by(tenant, bucket, ChatLogs.intent_detected)
+    return sources, intents
+
+def roll_up(db: Session, now: datetime = None) -> bool:
+    """Re-aggregates one batch of hours from the watermark (minus the lookback) in a single transaction.
+
+    Buckets are deleted and rebuilt rather than incremented, so re-running an hour is idempotent
+    and rows flushed late are counted once they land (within CHAT_ROLLUP_LOOKBACK_HOURS).
+    Returns True if more hours are left to catch up on.
+    """
+    now = now or datetime.utcnow()
+    if not _try_lock(db):
+        db.rollback()
+        return False
+    rolled_up_to = _watermark(db)
+    if rolled_up_to is None:
+        rolled_up_to = db.execute(select(func.min(ChatLogs.created_at))).scalar()  # Backfill from the oldest log
+        if rolled_up_to is None:
+            db.rollback()
+            return False
+    start = hour_start(min(rolled_up_to, now - timedelta(hours=CHAT_ROLLUP_LOOKBACK_HOURS)))
+    current_end = hour_start(now) + timedelta(hours=1)
+    end = min(current_end, start + timedelta(hours=CHAT_ROLLUP_BATCH_HOURS))
+
+    db.execute(delete(ChatLogRollup).where(ChatLogRollup.bucket >= start, ChatLogRollup.bucket < end))
+    db.execute(delete(ChatIntentRollup).where(ChatIntentRollup.bucket >= start, ChatIntentRollup.bucket < end))
+    sources, intents = _rollup_rows(start, end)
+    db.execute(insert(ChatLogRollup).from_select(
+        ["tenant_id", "bucket", "source", "requests", "positive_feedback", "neutral_feedback", "negative_feedback"], sources
+    ))
+    db.execute(insert(ChatIntentRollup).from_select(["tenant_id", "bucket", "intent", "requests"], intents))
+    watermark = min(end, now)
+    db.execute(
+        pg_insert(ChatLogRollupState)
+        .values(name=ROLLUP_NAME, rolled_up_to=watermark, updated_at=func.now())
+        .on_conflict_do_update(index_elements=["name"], set_={"rolled_up_to": watermark, "updated_at": func.now()})
+    )
+    db.commit()
+    with _stats_lock:
+        rollup_stats["hours_rolled_up"] += int((end - start) / timedelta(hours=1))
+    return end < current_end
+
+def rollup_status(db: Session) -> dict:
+    """Watermark, lag behind the newest hour, partitions and worker counters."""
+    state = db.execute(
+        select(ChatLogRollupState.rolled_up_to, ChatLogRollupState.updated_at).where(ChatLogRollupState.name == ROLLUP_NAME)
+    ).first()
+    partitions = sorted(list_partitions(db))
+    lag = (datetime.utcnow() - state.rolled_up_to).total_seconds() if state else None
+    with _stats_lock:
+        return {
+            "rolled_up_to": state.rolled_up_to if state else None,
+            "last_run": state.updated_at if state else None,
+            "lag_seconds": round(lag, 3) if lag is not None else None,
+            "partitions": partitions,
+            "retention_months": CHAT_LOG_RETENTION_MONTHS,
+            **rollup_stats,
+        }
+
+def run_maintenance(db: Session) -> bool:
+    """One maintenance cycle: partitions, then a rollup batch. Returns True if rollups are behind."""
+    maintain_partitions(db)
+    behind = roll_up(db)
+    with _stats_lock:
+        rollup_stats["runs"] += 1
+    return behind
+
+def run_worker(stop_event: threading.Event = None, interval: float = CHAT_ROLLUP_INTERVAL):
+    """Runs maintenance every `interval` seconds until stop_event is set; catches up without sleeping."""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        started = time.monotonic()
+        try:
+            with SessionLocal() as db:
+                behind = run_maintenance(db)
+        except Exception:
+            logger.exception("Chat log rollup worker error")
+            with _stats_lock:
+                rollup_stats["failures"] += 1
+            behind = False
+        if not behind:
+            stop_event.wait(max(0.0, interval - (time.monotonic() - started)))
@@ -0,0 +1,301 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import NamedTuple
+from sqlalchemy import text
+from app.database import async_engine
+from app.services.llm_client import llm_client, LLMError
+from app.services.prompt_builder import token_counter
+from app.services.metrics import register_stats
+
+# Conversation memory: recent turns verbatim, older turns folded into a bounded rolling summary
+# 'local' keeps sessions in the worker process (single worker or sticky routing); 'postgres' shares them
+SESSION_MEMORY_BACKEND = os.getenv("SESSION_MEMORY_BACKEND", "local")
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", 6))  # Ring buffer size
+SESSION_TURN_TOKENS = int(os.getenv("SESSION_TURN_TOKENS", 150))  # Per message kept in the ring
+SESSION_SUMMARY_TOKENS = int(os.getenv("SESSION_SUMMARY_TOKENS", 200))
+SESSION_SUMMARIZE_EVERY = int(os.getenv("SESSION_SUMMARIZE_EVERY", 4))  # Evicted turns batched per summary update
+SESSION_MAX_PENDING = int(os.getenv("SESSION_MAX_PENDING", 16))  # Evicted turns kept while the summarizer catches up
+SESSION_SUMMARY_MODE = os.getenv("SESSION_SUMMARY_MODE", "llm")  # 'llm' or 'extractive' (no LLM calls)
+SESSION_TTL = float(os.getenv("SESSION_TTL", 1800))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", 10000))
+
+SUMMARY_INSTRUCTIONS = (
+    "Update the running summary of a support conversation with the new turns. Keep facts the customer gave "
+    "(order numbers, products, preferences) and open questions. Reply with the summary only, under 120 words."
+)
+
+logger = logging.getLogger(__name__)
+
+class SessionContext(NamedTuple):
+    summary: str
+    turns: tuple  # ((user message, assistant response), ...) oldest first
+
+    @property
+    def empty(self) -> bool:
+        return not self.summary and not self.turns
+
+class _Session:
+    __slots__ = ("turns", "pending", "pending_offset", "summary", "expires_at")
+
+    def __init__(self, ttl: float):
+        self.turns = deque(maxlen=SESSION_MAX_TURNS)
+        self.pending = []  # Turns pushed out of the ring, not yet in the summary
+        self.pending_offset = 0  # Turns ever removed from the front of pending (summarized or dropped)
+        self.summary = ""
+        self.expires_at = time.monotonic() + ttl
+
+    def to_state(self) -> dict:
+        return {"turns": list(self.turns), "pending": self.pending, "pending_offset": self.pending_offset, "summary": self.summary}
+
+    @classmethod
+    def from_state(cls, state: dict, ttl: float) -> "_Session":
+        session = cls(ttl)
+        session.turns.extend(tuple(turn) for turn in state["turns"])
+        session.pending = [tuple(turn) for turn in state["pending"]]
+        session.pending_offset = state["pending_offset"]
+        session.summary = state["summary"]
+        return session
+
+class LocalSessionStore:
+    """In-process sessions (LRU-bounded, TTL-expired).
+
+    Only the worker that served a turn remembers it, so with several workers follow-ups
+    lose their context unless requests for a session are routed to the same process.
+    Stores implement get/create/save/delete; callers save() every session they change.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, ttl: float = SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.sessions = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    async def get(self, key) -> _Session:
+        session = self.sessions.get(key)
+        if session is None:
+            return None
+        if session.expires_at <= time.monotonic():
+            del self.sessions[key]
+            self.expirations += 1
+            return None
+        self.sessions.move_to_end(key)
+        session.expires_at = time.monotonic() + self.ttl
+        return session
+
+    async def create(self, key) -> _Session:
+        session = self.sessions[key] = _Session(self.ttl)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)  # Least recently used conversation
+            self.evictions += 1
+        return session
+
+    async def save(self, key, session: _Session):
+        pass  # get() hands out the stored object itself
+
+    async def delete(self, key):
+        self.sessions.pop(key, None)
+
+    def size(self) -> int:
+        return len(self.sessions)
+
+class PostgresSessionStore:
+    """Sessions as JSONB rows in an UNLOGGED table, shared by every worker process.
+
+    get() returns a copy, so changes only land on save(). Saves are last-writer-wins:
+    a summary saved by one worker can overwrite a turn another worker appended meanwhile.
+    """
+
+    GET_QUERY = text("""
+        UPDATE chat_sessions SET expires_at = :expires_at
+        WHERE session_key = :key AND expires_at > :now
+        RETURNING state
+    """)
+    SAVE_QUERY = text("""
+        INSERT INTO chat_sessions (session_key, state, expires_at) VALUES (:key, CAST(:state AS JSONB), :expires_at)
+        ON CONFLICT (session_key) DO UPDATE SET state = EXCLUDED.state, expires_at = EXCLUDED.expires_at
+    """)
+    DELETE_QUERY = text("DELETE FROM chat_sessions WHERE session_key = :key")
+    CLEANUP_QUERY = text("DELETE FROM chat_sessions WHERE expires_at <= :now")
+    CLEANUP_PROBABILITY = 0.001
+
+    def __init__(self, ttl: float = SESSION_TTL):
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(key) -> str:
+        return json.dumps(key)
+
+    async def get(self, key) -> _Session:
+        now = datetime.utcnow()
+        async with async_engine.begin() as conn:
+            state = (await conn.execute(self.GET_QUERY, {
+                "key": self._key(key), "now": now, "expires_at": now + timedelta(seconds=self.ttl),
+            })).scalar()
+        return None if state is None else _Session.from_state(state, self.ttl)
+
+    async def create(self, key) -> _Session:
+        return _Session(self.ttl)
+
+    async def save(self, key, session: _Session):
+        now = datetime.utcnow()
+        async with async_engine.begin() as conn:
+            await conn.execute(self.SAVE_QUERY, {
+                "key": self._key(key), "state": json.dumps(session.to_state()), "expires_at": now + timedelta(seconds=self.ttl),
+            })
+            if random.random() < self.CLEANUP_PROBABILITY:
+                await conn.execute(self.CLEANUP_QUERY, {"now": now})
+
+    async def delete(self, key):
+        async with async_engine.begin() as conn:
+            await conn.execute(self.DELETE_QUERY, {"key": self._key(key)})
+
+    def size(self):
+        return None  # Not tracked per worker
+
+SESSION_STORES = {"local": LocalSessionStore, "postgres": PostgresSessionStore}
+
+async def _load_tokenizer():
+    """First use may download tokenizer.json; turns answered from the KB never ran build_prompt's load."""
+    if not token_counter.loaded:
+        await asyncio.to_thread(token_counter.load)
+
+def _format_turns(turns) -> str:
+    return "\n".join(f"Customer: {user}\nAssistant: {assistant}" for user, assistant in turns)
+
+def extractive_summary(summary: str, turns: list) -> str:
+    """LLM-free fallback: the newest lines that fit SESSION_SUMMARY_TOKENS."""
+    lines = [line for line in summary.splitlines() if line] + [f"Customer asked: {user}" for user, _ in turns]
+    kept, budget = [], SESSION_SUMMARY_TOKENS
+    for line in reversed(lines):
+        budget -= token_counter.count(line)
+        if budget < 0:
+            break
+        kept.append(line)
+    return "\n".join(reversed(kept))
+
+class SessionMemory:
+    """Per-session ring buffer of recent turns plus a rolling summary updated in the background.
+
+    The context handed to the prompt is at most SESSION_MAX_TURNS truncated turns and one
+    summary of at most SESSION_SUMMARY_TOKENS, however long the conversation runs.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._queue = None
+        self._queued = set()
+        self._task = None
+        self.stats = {"turns": 0, "summaries": 0, "summary_fallbacks": 0, "pending_dropped": 0}
+
+    async def get_context(self, key) -> SessionContext:
+        session = await self.store.get(key)
+        if session is None:
+            return SessionContext("", ())
+        return SessionContext(session.summary, tuple(session.turns))
+
+    async def append(self, key, message: str, response: str):
+        """Records one turn; a turn pushed out of the ring is queued for summarization."""
+        await _load_tokenizer()
+        session = await self.store.get(key) or await self.store.create(key)
+        if len(session.turns) == session.turns.maxlen:
+            session.pending.append(session.turns[0])
+            if len(session.pending) > SESSION_MAX_PENDING:
+                session.pending.pop(0)  # Summarizer is behind; the oldest detail goes
+                session.pending_offset += 1
+                self.stats["pending_dropped"] += 1
+        session.turns.append((
+            token_counter.truncate(message, SESSION_TURN_TOKENS),
+            token_counter.truncate(response, SESSION_TURN_TOKENS),
+        ))
+        await self.store.save(key, session)
+        self.stats["turns"] += 1
+        if len(session.pending) >= SESSION_SUMMARIZE_EVERY:
+            self._schedule(key)
+
+    async def clear(self, key):
+        await self.store.delete(key)
+
+    def _schedule(self, key):
+        if key in self._queued:
+            return
+        self._ensure_started()
+        self._queued.add(key)
+        self._queue.put_nowait(key)
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = self._queue or asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def start(self):
+        self._ensure_started()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            key = await self._queue.get()
+            self._queued.discard(key)
+            try:
+                await self._summarize(key)
+            except Exception:
+                logger.exception("session summary update failed")
+
+    async def _summarize(self, key):
+        session = await self.store.get(key)
+        if session is None or not session.pending:
+            return
+        batch, batch_end = list(session.pending), session.pending_offset + len(session.pending)
+        await _load_tokenizer()
+        summary = await self._summarize_turns(session.summary, batch)
+        # Re-read: turns may have been appended meanwhile, here or (shared store) in another worker
+        session = await self.store.get(key)
+        if session is None:
+            return
+        # Positions may have shifted meanwhile (new evictions, overflow drops): remove only what the batch covered
+        summarized = batch_end - session.pending_offset
+        if summarized > 0:
+            del session.pending[:summarized]
+            session.pending_offset += summarized
+        session.summary = summary
+        await self.store.save(key, session)
+        self.stats["summaries"] += 1
+
+    async def _summarize_turns(self, summary: str, turns: list) -> str:
+        if SESSION_SUMMARY_MODE == "llm":
+            prompt = f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{_format_turns(turns)}"
+            try:
+                text = await llm_client.complete([
+                    {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                    {"role": "user", "content": prompt},
+                ])
+                if text:
+                    return token_counter.truncate(text.strip(), SESSION_SUMMARY_TOKENS)
+            except LLMError:
+                pass
+            self.stats["summary_fallbacks"] += 1
+        return extractive_summary(summary, turns)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "sessions": self.store.size(),
+            "evictions": getattr(self.store, "evictions", 0),
+            "expirations": getattr(self.store, "expirations", 0),
+            "summary_queue": self._queue.qsize() if self._queue else 0,
+        }
+
+session_memory = SessionMemory(SESSION_STORES[SESSION_MEMORY_BACKEND]())
+register_stats("session_memory", session_memory.get_stats,
+               counters=("turns", "summaries", "summary_fallbacks", "pending_dropped", "evictions", "expirations"))
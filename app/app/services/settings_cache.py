@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, AsyncSessionLocal
+from app.models import ChatbotSettings
+from app.services.change_listener import change_listener, notify_change
+from app.services.metrics import register_stats
+
+# Per-process chatbot settings cache
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", 60))  # Upper bound on staleness if a notification is missed
+SETTINGS_NOTIFY_CHANNEL = "chatbot_settings_changed"
+
+def notify_settings_changed(db: Session, tenant_id: int = None):
+    """Queues a change notification; Postgres delivers it to every listener when the transaction commits."""
+    notify_change(db, SETTINGS_NOTIFY_CHANNEL, "" if tenant_id is None else str(tenant_id))
+
+class SettingsCache:
+    """Per-tenant {setting_key: setting_value} maps held in worker memory.
+
+    Loads always read the primary, so an entry reloaded right after a change
+    notification can't come from a lagging replica.
+    """
+
+    def __init__(self, ttl: float = SETTINGS_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}  # tenant_id -> (expires_at, settings)
+        self._generations = {}  # tenant_id -> bumped on every invalidation
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "notifications": 0}
+
+    def _lookup(self, tenant_id):
+        entry = self._entries.get(tenant_id)
+        if entry and entry[0] > time.monotonic():
+            self.stats["hits"] += 1
+            return entry[1]
+        self.stats["misses"] += 1
+        return None
+
+    def _store(self, tenant_id, generation: int, rows) -> dict:
+        settings = {key: value for key, value in rows}
+        with self._lock:
+            # Skip caching if the tenant was invalidated while this load was in flight
+            if self._generations.get(tenant_id, 0) == generation:
+                self._entries[tenant_id] = (time.monotonic() + self.ttl, settings)
+        return settings
+
+    def _query(self, tenant_id):
+        return select(ChatbotSettings.setting_key, ChatbotSettings.setting_value).where(ChatbotSettings.tenant_id == tenant_id)
+
+    def get(self, tenant_id: int) -> dict:
+        settings = self._lookup(tenant_id)
+        if settings is not None:
+            return settings
+        generation = self._generations.get(tenant_id, 0)
+        with SessionLocal() as db:
+            rows = db.execute(self._query(tenant_id)).all()
+        return self._store(tenant_id, generation, rows)
+
+    async def get_async(self, tenant_id: int) -> dict:
+        settings = self._lookup(tenant_id)
+        if settings is not None:
+            return settings
+        generation = self._generations.get(tenant_id, 0)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(self._query(tenant_id))).all()
+        return self._store(tenant_id, generation, rows)
+
+    def invalidate(self, tenant_id: int = None, everything: bool = False):
+        with self._lock:
+            tenants = list(set(self._entries) | set(self._generations)) if everything else [tenant_id]
+            for tenant in tenants:
+                self._entries.pop(tenant, None)
+                self._generations[tenant] = self._generations.get(tenant, 0) + 1
+        self.stats["invalidations"] += 1
+
+    async def warm_up(self):
+        """Loads every tenant's settings in one query."""
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(select(ChatbotSettings.tenant_id, ChatbotSettings.setting_key, ChatbotSettings.setting_value))).all()
+        by_tenant = {}
+        for tenant_id, key, value in rows:
+            by_tenant.setdefault(tenant_id, []).append((key, value))
+        for tenant_id, tenant_rows in by_tenant.items():
+            self._store(tenant_id, self._generations.get(tenant_id, 0), tenant_rows)
+
+    def _on_notify(self, payload: str):
+        self.stats["notifications"] += 1
+        self.invalidate(int(payload) if payload else None)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "tenants": len(self._entries), "listening": change_listener.listening, "ttl": self.ttl}
+
+# Shared per-process cache
+settings_cache = SettingsCache()
+register_stats("settings_cache", settings_cache.get_stats, counters=("hits", "misses", "invalidations", "notifications"))
+change_listener.subscribe(SETTINGS_NOTIFY_CHANNEL, settings_cache._on_notify, lambda: settings_cache.invalidate(everything=True))
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from app.services.metrics import register_stats
+
+logger = logging.getLogger(__name__)
+
+class FlightCancelled(Exception):
+    """Raised to callers sharing a call whose task was cancelled."""
+
+class _Flight:
+    """One in-flight upstream call; chunks are kept so late joiners can replay the stream."""
+
+    def __init__(self):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: str):
+        self.chunks.append(chunk)
+        self._wake()
+
+    def finish(self, error: BaseException = None):
+        self.finished = True
+        self.error = error
+        self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def stream(self):
+        """Yields every chunk from the start, then follows the live call; re-raises its error."""
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.chunks):
+                yield self.chunks[position]
+                position += 1
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+    async def result(self):
+        """The full text once the call completes, or None if it produced nothing."""
+        async for _ in self.stream():
+            pass
+        return "".join(self.chunks) or None
+
+class SingleFlight:
+    """Coalesces identical concurrent calls: one upstream call per key, shared by every caller.
+
+    The call runs in its own task, so a caller that disconnects doesn't cancel it for the
+    others, and `on_result` (e.g. the cache write) runs once per call rather than per caller.
+    """
+
+    def __init__(self):
+        self.flights = {}
+        self.stats = {"calls": 0, "joined": 0, "failures": 0}
+
+    def _join(self, key, source, on_result=None) -> _Flight:
+        flight = self.flights.get(key)
+        if flight is not None:
+            self.stats["joined"] += 1
+            return flight
+        flight = _Flight()
+        self.flights[key] = flight
+        self.stats["calls"] += 1
+        flight.task = asyncio.get_running_loop().create_task(self._run(key, flight, source, on_result))
+        return flight
+
+    async def _run(self, key, flight: _Flight, source, on_result):
+        try:
+            async for chunk in source():
+                flight.publish(chunk)
+        except Exception as exc:
+            self.stats["failures"] += 1
+            flight.finish(exc)
+            return
+        except BaseException:
+            # Cancelled: callers must still be released, or they would wait on this flight forever
+            self.stats["failures"] += 1
+            flight.finish(FlightCancelled("shared call was cancelled"))
+            raise
+        finally:
+            # New callers start a fresh call from here on; current ones keep this flight
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+        flight.finish()
+        text = "".join(flight.chunks)
+        if text and on_result is not None:
+            try:
+                on_result(text)
+            except Exception:
+                logger.exception("single-flight result callback failed")
+
+    def stream(self, key, source, on_result=None):
+        """Async iterator over the shared call's chunks; `source()` must return an async iterator."""
+        return self._join(key, source, on_result).stream()
+
+    async def result(self, key, source, on_result=None):
+        """Awaits the shared call's full text (None if it produced nothing)."""
+        return await self._join(key, source, on_result).result()
+
+    def get_stats(self) -> dict:
+        requests = self.stats["calls"] + self.stats["joined"]
+        return {
+            **self.stats,
+            "in_flight": len(self.flights),
+            "coalesced_ratio": self.stats["joined"] / requests if requests else 0.0,
+        }
+
+llm_flights = SingleFlight()
+register_stats("llm_coalescing", llm_flights.get_stats, counters=("calls", "joined", "failures"))
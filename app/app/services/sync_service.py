@@ -0,0 +1,142 @@
+import logging
+import os
+import threading
+from sqlalchemy import select, delete, update, insert, func, case
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import KnowledgeBase, VectorIndex, EmbeddingJob
+from app.services.ingestion_service import chunk_text, compute_content_hash
+from app.services.vector_service import embedding_engine
+
+# Embedding sync worker settings
+EMBEDDING_SYNC_BATCH_SIZE = int(os.getenv("EMBEDDING_SYNC_BATCH_SIZE", 64))
+EMBEDDING_SYNC_POLL_INTERVAL = float(os.getenv("EMBEDDING_SYNC_POLL_INTERVAL", 1.0))
+EMBEDDING_SYNC_MAX_ATTEMPTS = int(os.getenv("EMBEDDING_SYNC_MAX_ATTEMPTS", 5))
+
+logger = logging.getLogger(__name__)
+
+# Counters for this process's workers
+worker_stats = {"jobs_processed": 0, "entries_reembedded": 0, "entries_unchanged": 0, "vectors_written": 0, "failures": 0}
+_stats_lock = threading.Lock()
+
+def enqueue_embedding_job(db: Session, entry: KnowledgeBase) -> bool:
+    """Records the entry's content hash and queues a re-embed if it changed.
+
+    Runs inside the caller's transaction (the job commits with the KB write),
+    so the request only pays for one extra INSERT.
+    """
+    content_hash = compute_content_hash(entry.content)
+    if entry.id is not None and entry.content_hash == content_hash:
+        return False
+    entry.content_hash = content_hash
+    db.flush()  # Assigns entry.id for new rows
+    db.add(EmbeddingJob(tenant_id=entry.tenant_id, knowledge_id=entry.id))
+    return True
+
+def _claim_jobs(db: Session, batch_size: int):
+    return db.execute(
+        select(EmbeddingJob.id, EmbeddingJob.knowledge_id)
+        .where(EmbeddingJob.status == "pending", EmbeddingJob.available_at <= func.now())
+        .order_by(EmbeddingJob.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+
+def _reembed(db: Session, knowledge_ids: list) -> tuple:
+    """Re-embeds entries whose content hash differs from their stored vectors. Returns (changed, unchanged)."""
+    # Locking the KB rows serializes workers that claimed jobs for the same entry
+    entries = db.execute(
+        select(KnowledgeBase.id, KnowledgeBase.tenant_id, KnowledgeBase.content)
+        .where(KnowledgeBase.id.in_(knowledge_ids))
+        .with_for_update()
+    ).all()
+    stored = {}
+    for knowledge_id, content_hash in db.execute(
+        select(VectorIndex.knowledge_id, VectorIndex.content_hash).where(VectorIndex.knowledge_id.in_(knowledge_ids))
+    ):
+        stored.setdefault(knowledge_id, set()).add(content_hash)
+
+    changed = []
+    for entry in entries:
+        content_hash = compute_content_hash(entry.content)
+        if stored.get(entry.id) != {content_hash}:
+            changed.append((entry, content_hash))
+    if not changed:
+        return 0, len(entries)
+
+    rows = [(entry, content_hash, chunk) for entry, content_hash in changed for chunk in chunk_text(entry.content)]
+    vectors = embedding_engine.embed_many([chunk for _, _, chunk in rows])
+
+    # Old vectors are replaced in the same transaction, so searches never see a gap
+    db.execute(delete(VectorIndex).where(VectorIndex.knowledge_id.in_([entry.id for entry, _ in changed])))
+    if rows:
+        db.execute(insert(VectorIndex), [
+            {"tenant_id": entry.tenant_id, "knowledge_id": entry.id, "embedding_vector": vector,
+             "model_used": "MiniLM", "content_hash": content_hash}
+            for (entry, content_hash, _), vector in zip(rows, vectors)
+        ])
+    with _stats_lock:
+        worker_stats["vectors_written"] += len(rows)
+    return len(changed), len(entries) - len(changed)
+
+def process_embedding_jobs(db: Session, batch_size: int = EMBEDDING_SYNC_BATCH_SIZE) -> int:
+    """Claims and processes one batch of queued jobs. Returns the number of jobs handled."""
+    jobs = _claim_jobs(db, batch_size)
+    if not jobs:
+        db.rollback()
+        return 0
+    job_ids = [job.id for job in jobs]
+    try:
+        changed, unchanged = _reembed(db, list({job.knowledge_id for job in jobs}))
+        db.execute(delete(EmbeddingJob).where(EmbeddingJob.id.in_(job_ids)))
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        _record_failure(db, job_ids, exc)
+        return len(job_ids)
+    with _stats_lock:
+        worker_stats["jobs_processed"] += len(job_ids)
+        worker_stats["entries_reembedded"] += changed
+        worker_stats["entries_unchanged"] += unchanged
+    return len(job_ids)
+
+def _record_failure(db: Session, job_ids: list, exc: Exception):
+    """Backs failed jobs off exponentially; gives up after EMBEDDING_SYNC_MAX_ATTEMPTS."""
+    logger.exception("Embedding sync batch failed for jobs %s", job_ids)
+    with _stats_lock:
+        worker_stats["failures"] += 1
+    attempts = EmbeddingJob.attempts + 1
+    db.execute(
+        update(EmbeddingJob)
+        .where(EmbeddingJob.id.in_(job_ids))
+        .values(
+            attempts=attempts,
+            last_error=str(exc)[:1000],
+            available_at=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, func.power(2, attempts)),
+            status=case((attempts >= EMBEDDING_SYNC_MAX_ATTEMPTS, "failed"), else_="pending"),
+        )
+    )
+    db.commit()
+
+def queue_stats(db: Session) -> dict:
+    """Queue depth and lag (age of the oldest pending job) plus worker counters."""
+    pending, lag = db.execute(
+        select(func.count(), func.extract("epoch", func.localtimestamp() - func.min(EmbeddingJob.created_at)))
+        .where(EmbeddingJob.status == "pending")
+    ).one()
+    failed = db.execute(select(func.count()).select_from(EmbeddingJob).where(EmbeddingJob.status == "failed")).scalar()
+    with _stats_lock:
+        return {"pending": pending, "failed": failed, "lag_seconds": round(float(lag or 0.0), 3), **worker_stats}
+
+def run_worker(stop_event: threading.Event = None, poll_interval: float = EMBEDDING_SYNC_POLL_INTERVAL):
+    """Drains the queue until stop_event is set, sleeping while it is empty."""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            with SessionLocal() as db:
+                handled = process_embedding_jobs(db)
+        except Exception:
+            logger.exception("Embedding sync worker error")
+            handled = 0
+        if not handled:
+            stop_event.wait(poll_interval)
@@ -1,16 +1,17 @@
-import psutil
 import os
 from sqlalchemy.orm import Session
 from app.models import APIKey
+from app.services.metrics import system_sampler
 
 def get_api_usage_stats(db: Session):
     """Retrieve API usage statistics from the database."""
     total_api_keys = db.query(APIKey).count()
+    system = system_sampler.current()  # Background sample, no blocking cpu_percent(interval=1)
     return {
         "total_api_keys": total_api_keys,
-        "cpu_usage": psutil.cpu_percent(interval=1),
-        "memory_usage": psutil.virtual_memory().percent,
-        "disk_usage": psutil.disk_usage("/").percent
+        "cpu_usage": system["cpu_usage"],
+        "memory_usage": system["memory_usage"],
+        "disk_usage": system["disk_usage"]
     }
 
 def get_system_logs():
@@ -21,4 +22,4 @@ def get_system_logs():
             logs = log_file.readlines()[-50:]  # Get the last 50 log lines
         return {"logs": logs}
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
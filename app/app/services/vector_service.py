@@ -1,21 +1,53 @@
+import os
+from sqlalchemy import select, func, event
 from sqlalchemy.orm import Session
-from sentence_transformers import SentenceTransformer
-import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import read_engine, async_read_engine
 from app.models import VectorIndex
+from app.services.embedding_backends import get_embedding_backend
+from app.services.embedding_engine import EmbeddingBatcher
+from app.services.metrics import stage_timer, register_stats
 
-# Load sentence-transformer model once
-embedding_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+# Similarity search settings
+EMBEDDING_DIM = 384
+VECTOR_SEARCH_K = int(os.getenv("VECTOR_SEARCH_K", 5))
+VECTOR_MIN_SIMILARITY = float(os.getenv("VECTOR_MIN_SIMILARITY", 0.7))
+VECTOR_EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", 40))
+VECTOR_IVFFLAT_PROBES = int(os.getenv("VECTOR_IVFFLAT_PROBES", 10))
+# Tenant filters are applied to the shared HNSW index, so a plain scan can return fewer than k rows for
+# a small tenant; iterative scans keep walking the graph until enough rows pass (pgvector >= 0.8).
+# Set to "off" on older pgvector.
+VECTOR_ITERATIVE_SCAN = os.getenv("VECTOR_ITERATIVE_SCAN", "relaxed_order")
+
+# Embedding model backend; loaded on first use or by warm_up_embeddings()
+embedding_backend = get_embedding_backend()
+
+def encode_batch(texts: list):
+    """Encode a batch of texts in one model call."""
+    return embedding_backend.encode(texts)
+
+# Concurrent single-text requests are micro-batched into encode_batch calls
+embedding_engine = EmbeddingBatcher(encode_batch)
+register_stats("embedding_batcher", embedding_engine.stats, counters=("batches", "items", "errors"))
 
 def generate_embedding(text: str) -> list:
     """Generate a vector embedding for the given text."""
-    embedding = embedding_model.encode(text, convert_to_numpy=True)
-    return embedding.tolist()  # Convert NumPy array to a list for DB storage
+    return embedding_engine.embed(text)  # List of floats for DB storage
+
+async def generate_embedding_async(text: str) -> list:
+    """Generate a vector embedding without blocking the event loop."""
+    return await embedding_engine.embed_async(text)
 
-def store_vector_embedding(db: Session, knowledge_id: int, text: str, model_used: str = "MiniLM"):
+def warm_up_embeddings() -> dict:
+    """Load the embedding model ahead of traffic and return its startup report."""
+    return embedding_backend.warm_up()
+
+def store_vector_embedding(db: Session, knowledge_id: int, text: str, model_used: str = "MiniLM", tenant_id: int = None):
     """Generate and store vector embeddings for a knowledge base entry."""
     embedding_vector = generate_embedding(text)
 
     new_vector = VectorIndex(
+        tenant_id=tenant_id,
         knowledge_id=knowledge_id,
         embedding_vector=embedding_vector,
         model_used=model_used
@@ -25,28 +57,92 @@ def store_vector_embedding(db: Session, knowledge_id: int, text: str, model_used
     db.refresh(new_vector)
     return new_vector
 
-def get_all_vector_entries(db: Session):
-    """Retrieve all stored vector embeddings."""
-    return db.query(VectorIndex).all()
+def get_all_vector_entries(db: Session, tenant_id: int = None):
+    """Retrieve all stored vector embeddings (for one tenant when given)."""
+    query = db.query(VectorIndex)
+    if tenant_id is not None:
+        query = query.filter(VectorIndex.tenant_id == tenant_id)
+    return [
+        {
+            "id": v.id,
+            "tenant_id": v.tenant_id,
+            "knowledge_id": v.knowledge_id,
+            "embedding_vector": v.embedding_vector.tolist(),  # pgvector returns NumPy arrays
+            "model_used": v.model_used,
+            "created_at": v.created_at,
+        }
+        for v in query.all()
+    ]
+
+def build_vector_search_query(query_vector: list, tenant_id: int = None, k: int = VECTOR_SEARCH_K):
+    """Builds a tenant-scoped nearest-neighbour query (ordered by distance so the HNSW index is used)."""
+    distance = VectorIndex.embedding_vector.cosine_distance(query_vector)
+    stmt = select(VectorIndex.id, VectorIndex.knowledge_id, (1 - distance).label("similarity"))
+    if tenant_id is not None:
+        stmt = stmt.where(VectorIndex.tenant_id == tenant_id)
+    # relaxed_order iterative scans may return neighbours slightly out of order: re-sort the k rows
+    nearest = stmt.order_by(distance).limit(k).subquery("nearest")
+    return select(nearest).order_by(nearest.c.similarity.desc())
+
+def ann_settings(ef_search: int = None) -> dict:
+    settings = {"hnsw.ef_search": ef_search or VECTOR_EF_SEARCH, "ivfflat.probes": VECTOR_IVFFLAT_PROBES}
+    if VECTOR_ITERATIVE_SCAN and VECTOR_ITERATIVE_SCAN != "off":
+        settings["hnsw.iterative_scan"] = VECTOR_ITERATIVE_SCAN
+    return settings
+
+def ann_session_settings(ef_search: int = None):
+    """Transaction-local pgvector tuning, for searches that override the connection defaults."""
+    return select(*[func.set_config(name, str(value), True) for name, value in ann_settings(ef_search).items()])
+
+# Read connections get the default ANN settings once when they are opened, so a search
+# with the default ef_search doesn't spend a round trip on set_config
+ANN_DEFAULTS_SQL = "; ".join(f"SET {name} = '{value}'" for name, value in ann_settings().items())
+
+@event.listens_for(read_engine, "connect")
+def apply_ann_defaults(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(ANN_DEFAULTS_SQL)
+    cursor.close()
+    dbapi_connection.commit()  # Session-level SET must outlive the pool's reset rollback
+
+@event.listens_for(async_read_engine.sync_engine, "connect")
+def apply_ann_defaults_async(dbapi_connection, connection_record):
+    dbapi_connection.run_async(lambda connection: connection.execute(ANN_DEFAULTS_SQL))
+
+def _vector_search_results(rows, min_similarity: float):
+    return [{"id": r.id, "knowledge_id": r.knowledge_id, "similarity": r.similarity} for r in rows if r.similarity >= min_similarity]
+
+def search_vector_entries(db: Session, query_text: str, tenant_id: int = None, k: int = VECTOR_SEARCH_K,
+                          min_similarity: float = VECTOR_MIN_SIMILARITY, ef_search: int = None):
+    """Perform an approximate nearest-neighbour search using pgvector cosine distance."""
+    with stage_timer("embedding", tenant_id):
+        query_vector = generate_embedding(query_text)  # Convert input text to vector
 
-def search_vector_entries(db: Session, query_text: str):
-    """Perform a similarity search using pgvector cosine similarity."""
-    query_vector = generate_embedding(query_text)  # Convert input text to vector
+    with stage_timer("vector_search", tenant_id):
+        if ef_search is not None:
+            db.execute(ann_session_settings(ef_search))
+        results = db.execute(build_vector_search_query(query_vector, tenant_id, k)).all()
+    return _vector_search_results(results, min_similarity)
 
-    search_query = """
-    SELECT id, knowledge_id, embedding_vector, model_used, 
-           1 - (embedding_vector <=> CAST(:query_vector AS VECTOR)) AS similarity
-    FROM vector_index
-    ORDER BY similarity DESC
-    LIMIT 5;
-    """
+async def search_vector_entries_async(db: AsyncSession, query_text: str, query_vector: list = None, tenant_id: int = None,
+                                      k: int = VECTOR_SEARCH_K, min_similarity: float = VECTOR_MIN_SIMILARITY, ef_search: int = None):
+    """Async similarity search; the embedding runs in a worker thread unless one is passed in."""
+    if query_vector is None:
+        with stage_timer("embedding", tenant_id):
+            query_vector = await generate_embedding_async(query_text)
 
-    results = db.execute(search_query, {"query_vector": query_vector}).fetchall()
-    return [{"id": r[0], "knowledge_id": r[1], "similarity": r[4]} for r in results]
+    with stage_timer("vector_search", tenant_id):
+        if ef_search is not None:
+            await db.execute(ann_session_settings(ef_search))
+        results = (await db.execute(build_vector_search_query(query_vector, tenant_id, k))).all()
+    return _vector_search_results(results, min_similarity)
 
-def delete_vector_entry(db: Session, vector_id: int):
-    """Delete a vector entry by ID."""
-    db_entry = db.query(VectorIndex).filter(VectorIndex.id == vector_id).first()
+def delete_vector_entry(db: Session, vector_id: int, tenant_id: int = None):
+    """Delete a vector entry by ID (only within the tenant when given)."""
+    query = db.query(VectorIndex).filter(VectorIndex.id == vector_id)
+    if tenant_id is not None:
+        query = query.filter(VectorIndex.tenant_id == tenant_id)
+    db_entry = query.first()
     if not db_entry:
         return None
     db.delete(db_entry)
@@ -0,0 +1,67 @@
+"""Shared helpers for the benchmark scripts: latency summaries and JSON result files."""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))], 3) if ordered else 0.0
+
+def summarize(latencies_ms: list, elapsed: float) -> dict:
+    """Count, throughput and latency percentiles (milliseconds) for one run."""
+    return {
+        "count": len(latencies_ms),
+        "per_second": round(len(latencies_ms) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": percentile(latencies_ms, 0.5),
+        "p95_ms": percentile(latencies_ms, 0.95),
+        "p99_ms": percentile(latencies_ms, 0.99),
+        "mean_ms": round(statistics.fmean(latencies_ms), 3) if latencies_ms else 0.0,
+        "max_ms": round(max(latencies_ms), 3) if latencies_ms else 0.0,
+    }
+
+def time_calls(func, iterations: int, warmup: int = 3) -> dict:
+    """Runs `func()` sequentially and summarizes per-call latency."""
+    for _ in range(warmup):
+        func()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        func()
+        latencies.append(1000 * (time.perf_counter() - call_started))
+    return summarize(latencies, time.perf_counter() - started)
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+def run_metadata(args=None) -> dict:
+    """Enough context to tell two result files apart: commit, host, arguments and tuning env vars."""
+    tuning_prefixes = ("DB_", "VECTOR_", "EMBEDDING_", "RESPONSE_CACHE_", "KB_", "HYBRID_", "RAG_", "SESSION_", "HTTP_", "OPENROUTER_MODEL", "OPENROUTER_FALLBACK_MODEL", "LLM_", "RATE_LIMIT_")
+    return {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": vars(args) if args is not None else {},
+        "env": {k: v for k, v in sorted(os.environ.items()) if k.startswith(tuning_prefixes)},
+    }
+
+def save_results(name: str, results, args=None, output: str = None) -> str:
+    """Writes {"benchmark", "metadata", "results"} to `output` or benchmarks/results/<name>-<timestamp>.json."""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as result_file:
+        json.dump({"benchmark": name, "metadata": run_metadata(args), "results": results}, result_file, indent=2, default=str)
+    return output
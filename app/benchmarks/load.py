@@ -0,0 +1,107 @@
+"""End-to-end load generator for /chatbot/query.
+
+Replays the seeded query mix against a running API at several concurrency
+levels and reports RPS and p50/p95/p99 per level (and per query kind).
+    python -m benchmarks.stub_openrouter &                 # OPENROUTER_API_URL must point at it
+    python -m benchmarks.seed_data --tenants 3 --entries-per-tenant 20000
+    python -m benchmarks.load --url http://localhost:8000 --concurrency 1 8 32 64 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import httpx
+from benchmarks.common import summarize, save_results, RESULTS_DIR
+
+QUERY_KINDS = ("kb_queries", "semantic_queries", "llm_queries")
+
+def build_mix(queries: dict, weights: dict, rng: random.Random):
+    """Endless (tenant, kind, message) stream drawn with the given kind weights."""
+    tenants = [t for t in queries["tenants"] if any(t[kind] for kind in QUERY_KINDS)]
+    kinds = [kind for kind in QUERY_KINDS if weights.get(kind)]
+    while True:
+        tenant = rng.choice(tenants)
+        kind = rng.choices(kinds, [weights[k] for k in kinds])[0]
+        if tenant[kind]:
+            yield tenant, kind, rng.choice(tenant[kind])
+
+async def run_level(client: httpx.AsyncClient, path: str, mix, concurrency: int, duration: float, stream: bool, users: int, rng: random.Random) -> dict:
+    latencies = {kind: [] for kind in QUERY_KINDS}
+    statuses = {}
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            tenant, kind, message = next(mix)
+            body = {"message": message, "tenant_id": tenant["tenant_id"], "user_id": rng.randint(1, users), "stream": stream}
+            started = time.perf_counter()
+            try:
+                if stream:
+                    async with client.stream("POST", path, json=body, headers={"X-API-Key": tenant["api_key"]}) as response:
+                        async for _ in response.aiter_raw():
+                            pass
+                else:
+                    response = await client.post(path, json=body, headers={"X-API-Key": tenant["api_key"]})
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies[kind].append(1000 * (time.perf_counter() - started))
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    combined = [value for values in latencies.values() for value in values]
+    return {
+        "concurrency": concurrency,
+        "overall": summarize(combined, elapsed),
+        "by_kind": {kind: summarize(values, elapsed) for kind, values in latencies.items() if values},
+        "status_codes": statuses,
+        "transport_errors": errors,
+    }
+
+async def run(args) -> list:
+    with open(args.queries, encoding="utf-8") as queries_file:
+        queries = json.load(queries_file)
+    rng = random.Random(args.seed)
+    mix = build_mix(queries, {"kb_queries": args.kb_weight, "semantic_queries": args.semantic_weight, "llm_queries": args.llm_weight}, rng)
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    results = []
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        for concurrency in args.concurrency:
+            if args.warmup:
+                await run_level(client, args.path, mix, concurrency, args.warmup, args.stream, args.users, rng)
+            level = await run_level(client, args.path, mix, concurrency, args.duration, args.stream, args.users, rng)
+            overall = level["overall"]
+            print(f"c={concurrency:<4} rps={overall['per_second']:<8} p50={overall['p50_ms']}ms p95={overall['p95_ms']}ms "
+                  f"p99={overall['p99_ms']}ms statuses={level['status_codes']} errors={level['transport_errors']}")
+            results.append(level)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /chatbot/query at several concurrency levels.")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/chatbot/chatbot/query")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=15, help="Seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=3, help="Unrecorded seconds before each level")
+    parser.add_argument("--stream", action="store_true", help="Use SSE mode and time the full stream")
+    parser.add_argument("--kb-weight", type=float, default=0.5)
+    parser.add_argument("--semantic-weight", type=float, default=0.3)
+    parser.add_argument("--llm-weight", type=float, default=0.2)
+    parser.add_argument("--users", type=int, default=1000, help="Distinct user_ids to spread requests over")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--queries", default=os.path.join(RESULTS_DIR, "queries.json"), help="Written by benchmarks.seed_data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/load-<timestamp>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"Saved {save_results('load', results, args, args.output)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Login throughput benchmark.
+
+Offline (no database): compares bcrypt verification on the shared request
+threadpool (how sync login handlers ran) with the bounded password pool,
+while light "request" jobs run alongside to show how much auth starves them.
+    python -m benchmarks.login_throughput --logins 200
+
+Live, against a running API:
+    python -m benchmarks.login_throughput --url http://localhost:8000 --username admin --password secret
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from app.services import auth_service
+from benchmarks.common import summarize, save_results
+
+REQUEST_THREADS = 40  # Starlette's default threadpool size for sync handlers
+
+async def timed(coro_factory, latencies: list):
+    started = time.perf_counter()
+    try:
+        return await coro_factory()
+    finally:
+        latencies.append(1000 * (time.perf_counter() - started))
+
+def light_request_job():
+    """Stands in for a cheap sync handler (settings read, history page)."""
+    return sum(range(2000))
+
+async def run_offline(mode: str, logins: int, probes: int) -> dict:
+    loop = asyncio.get_running_loop()
+    request_pool = ThreadPoolExecutor(max_workers=REQUEST_THREADS)
+    hashed = auth_service.get_password_hash("benchmark-password")
+    if mode == "request-threadpool":
+        verify = lambda: loop.run_in_executor(request_pool, auth_service.verify_password, "benchmark-password", hashed)
+    else:
+        # Unbounded pending queue here: the benchmark measures throughput, not 503 shedding
+        auth_service.PASSWORD_HASH_MAX_PENDING = logins + 1
+        verify = lambda: auth_service.verify_password_async("benchmark-password", hashed)
+
+    login_latencies, probe_latencies = [], []
+
+    async def probe_traffic():
+        for _ in range(probes):
+            await timed(lambda: loop.run_in_executor(request_pool, light_request_job), probe_latencies)
+            await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    probe_task = asyncio.create_task(probe_traffic())
+    await asyncio.gather(*(timed(verify, login_latencies) for _ in range(logins)))
+    login_elapsed = time.perf_counter() - started
+    await probe_task
+    request_pool.shutdown()
+    return {"mode": mode, "logins": summarize(login_latencies, login_elapsed), "request_jobs": summarize(probe_latencies, time.perf_counter() - started)}
+
+async def run_live(url: str, username: str, password: str, logins: int, concurrency: int) -> dict:
+    latencies, statuses = [], {}
+    limit = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        async def login():
+            async with limit:
+                response = await timed(lambda: client.post("/auth/login", json={"username": username, "password": password}), latencies)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+    return {"mode": "live", "logins": summarize(latencies, elapsed), "status_codes": statuses}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure login throughput and its effect on other request work.")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--probes", type=int, default=100, help="Light request jobs run during the offline burst")
+    parser.add_argument("--url", help="Benchmark a running API instead of the offline comparison")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/login-<timestamp>.json)")
+    args = parser.parse_args()
+
+    if args.url:
+        results = [asyncio.run(run_live(args.url, args.username, args.password, args.logins, args.concurrency))]
+    else:
+        results = [asyncio.run(run_offline(mode, args.logins, args.probes)) for mode in ("request-threadpool", "password-pool")]
+    print(json.dumps(results, indent=2))
+    print(f"Saved {save_results('login', results, args, args.output)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Micro-benchmarks for the retrieval steps of the chat path.
+
+    python -m benchmarks.micro                       # everything; DB cases need seed_data first
+    python -m benchmarks.micro --only embedding cache
+    python -m benchmarks.micro --only vector --ef-search 20 40 100
+
+Cases:
+  embedding  single-text latency, micro-batched concurrent throughput, direct batch encode
+  vector     pgvector ANN search per tenant at several ef_search values (seeded query vectors)
+  kb         full-text knowledge base lookup (seeded direct-match and miss queries)
+  hybrid     single-statement full-text + vector retrieval with rank fusion
+  cache      semantic response cache lookups (in memory)
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import summarize, time_calls, save_results, RESULTS_DIR
+
+CASES = ("embedding", "vector", "kb", "hybrid", "cache")
+
+def load_queries(path: str) -> dict:
+    with open(path, encoding="utf-8") as queries_file:
+        return json.load(queries_file)
+
+def bench_embedding(args) -> dict:
+    from app.services.vector_service import embedding_engine, encode_batch, warm_up_embeddings
+    warm_up_embeddings()
+    texts = [f"how do I return the item from order {i} after {i % 30} days" for i in range(args.iterations)]
+    results = {"single": time_calls(lambda: embedding_engine.embed(random.choice(texts)), args.iterations)}
+
+    # Concurrent callers: the micro-batcher should coalesce them into larger encode calls
+    for workers in args.concurrency:
+        latencies = []
+
+        def one(text):
+            started = time.perf_counter()
+            embedding_engine.embed(text)
+            latencies.append(1000 * (time.perf_counter() - started))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(one, texts))
+        results[f"concurrent_{workers}"] = summarize(latencies, time.perf_counter() - started)
+    results["batcher"] = embedding_engine.stats()
+
+    for size in (8, 32, 128):
+        batch = texts[:size]
+        timing = time_calls(lambda: encode_batch(batch), max(3, args.iterations // size))
+        timing["texts_per_second"] = round(size * 1000 / timing["mean_ms"], 1) if timing["mean_ms"] else 0.0
+        results[f"encode_batch_{size}"] = timing
+    return results
+
+def bench_vector(args, queries: dict) -> dict:
+    from app.database import SessionLocal
+    from app.services.vector_service import build_vector_search_query, ann_session_settings, VECTOR_SEARCH_K
+    results = {}
+    with SessionLocal() as db:
+        for tenant in queries["tenants"]:
+            vectors = tenant["query_vectors"]
+            if not vectors:
+                continue
+            for ef_search in args.ef_search:
+                def search():
+                    db.execute(ann_session_settings(ef_search))
+                    db.execute(build_vector_search_query(random.choice(vectors), tenant["tenant_id"], VECTOR_SEARCH_K)).all()
+                    db.rollback()  # set_config(..., true) is transaction-local
+                results[f"tenant_{tenant['tenant_id']}_ef_{ef_search}"] = time_calls(search, args.iterations)
+    return results
+
+def bench_kb(args, queries: dict) -> dict:
+    from app.database import SessionLocal
+    from app.services.knowledge_service import search_knowledge_entries
+    results = {}
+    with SessionLocal() as db:
+        for tenant in queries["tenants"]:
+            for kind in ("kb_queries", "llm_queries"):
+                texts = tenant[kind]
+                if texts:
+                    results[f"tenant_{tenant['tenant_id']}_{kind}"] = time_calls(
+                        lambda: search_knowledge_entries(db, random.choice(texts), tenant["tenant_id"]), args.iterations
+                    )
+    return results
+
+def bench_hybrid(args, queries: dict) -> dict:
+    from app.database import SessionLocal
+    from app.services.retrieval_service import build_hybrid_search_query
+    results = {}
+    with SessionLocal() as db:
+        for tenant in queries["tenants"]:
+            vectors = tenant["query_vectors"]
+            for kind in ("kb_queries", "semantic_queries"):
+                texts = tenant[kind]
+                if texts and vectors:
+                    results[f"tenant_{tenant['tenant_id']}_{kind}"] = time_calls(
+                        lambda: db.execute(build_hybrid_search_query(random.choice(texts), random.choice(vectors), tenant["tenant_id"])).all(),
+                        args.iterations,
+                    )
+    return results
+
+def bench_cache(args) -> dict:
+    import numpy as np
+    from app.services.response_cache import SemanticResponseCache
+    rng = np.random.default_rng(args.seed)
+    results = {}
+    for size in (100, 1000, 5000):
+        cache = SemanticResponseCache(max_entries=size)
+        vectors = rng.standard_normal((size, 384)).astype(np.float32)
+        for i in range(size):
+            cache.set(1, f"question {i}", f"answer {i}", vectors[i])
+        probes = rng.standard_normal((64, 384)).astype(np.float32)
+        results[f"exact_hit_{size}"] = time_calls(lambda: cache.get(1, f"question {random.randrange(size)}", None), args.iterations)
+        results[f"semantic_miss_{size}"] = time_calls(lambda: cache.get(1, "unseen question", probes[random.randrange(64)]), args.iterations)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for embedding, vector search, KB lookup and the response cache.")
+    parser.add_argument("--only", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100])
+    parser.add_argument("--queries", default=os.path.join(RESULTS_DIR, "queries.json"), help="Written by benchmarks.seed_data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/micro-<timestamp>.json)")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    results = {}
+    needs_db = {"vector", "kb", "hybrid"} & set(args.only)
+    queries = load_queries(args.queries) if needs_db else None
+    if "embedding" in args.only:
+        results["embedding"] = bench_embedding(args)
+    if "vector" in args.only:
+        results["vector"] = bench_vector(args, queries)
+    if "kb" in args.only:
+        results["kb"] = bench_kb(args, queries)
+    if "hybrid" in args.only:
+        results["hybrid"] = bench_hybrid(args, queries)
+    if "cache" in args.only:
+        results["cache"] = bench_cache(args)
+    path = save_results("micro", results, args, args.output)
+    print(json.dumps(results, indent=2))
+    print(f"Saved {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Seeded synthetic multi-tenant knowledge base for benchmarks.
+
+Creates bench-tenant-N tenants, each with an API key, knowledge base entries
+and matching vector_index rows. Also writes a query file that the load
+generator and micro-benchmarks replay. The same --seed always produces the
+same data.
+    python -m benchmarks.seed_data --tenants 4 --entries-per-tenant 25000          # 100k rows, random vectors
+    python -m benchmarks.seed_data --tenants 2 --entries-per-tenant 2000 --vectors model
+    python -m benchmarks.seed_data --reset-only
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import numpy as np
+from sqlalchemy import insert, delete, select
+from app.database import SessionLocal
+from app.models import Tenant, APIKey, KnowledgeBase, VectorIndex, ChatbotSettings
+from app.services.rate_limiter import USER_LIMIT_SETTING, TENANT_LIMIT_SETTING
+from app.services.ingestion_service import compute_content_hash
+from benchmarks.common import RESULTS_DIR
+
+BENCH_TENANT_PREFIX = "bench-tenant-"
+EMBEDDING_DIM = 384
+
+VERTICALS = {
+    "ecommerce": {
+        "topics": ["shipping", "returns", "warranty", "payment", "sizing", "discounts"],
+        "product": ["headphones", "backpack", "kettle", "monitor", "sneakers", "lamp", "blender", "jacket"],
+    },
+    "support": {
+        "topics": ["password", "billing", "installation", "sync", "notifications", "export"],
+        "product": ["desktop app", "mobile app", "router", "printer", "dashboard", "plugin"],
+    },
+    "healthcare": {
+        "topics": ["appointments", "prescriptions", "insurance", "vaccination", "lab results", "telehealth"],
+        "product": ["clinic", "pharmacy", "patient portal", "care plan", "screening", "checkup"],
+    },
+}
+FILLER = ("please contact our team if you need more help with this request and keep your reference number ready "
+          "most questions are resolved within one business day through the help center or live chat").split()
+OFF_TOPIC = ["astronomy", "volcano", "origami", "chess", "jazz", "glacier", "poetry", "robotics", "sailing", "cactus"]
+
+def entry_code(tenant_index: int, n: int) -> str:
+    """A single full-text token unique to one entry, so direct-match queries are selective."""
+    return f"zq{tenant_index}x{n}"
+
+def make_entry(rng: random.Random, vertical: dict, tenant_index: int, n: int) -> dict:
+    topic = rng.choice(vertical["topics"])
+    product = rng.choice(vertical["product"])
+    code = entry_code(tenant_index, n)
+    filler = " ".join(rng.choice(FILLER) for _ in range(rng.randint(20, 60)))
+    content = f"{product.capitalize()} {code}: {topic} information. For {topic} questions about the {product} {code}, {filler}."
+    return {"title": f"{product} {code} {topic}"[:255], "content": content, "category": topic, "source": "manual",
+            "content_hash": compute_content_hash(content), "_topic": topic, "_product": product, "_code": code}
+
+def random_vectors(np_rng: np.random.Generator, centroids: dict, rows: list) -> np.ndarray:
+    """Unit vectors clustered around one centroid per topic, so nearest-neighbour queries have real structure."""
+    base = np.stack([centroids[row["_topic"]] for row in rows])
+    vectors = base + 0.35 * np_rng.standard_normal((len(rows), EMBEDDING_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def reset(db) -> int:
+    tenant_ids = db.execute(select(Tenant.id).where(Tenant.name.like(f"{BENCH_TENANT_PREFIX}%"))).scalars().all()
+    if tenant_ids:
+        # knowledge_base, vector_index, api_keys and settings cascade from tenants
+        db.execute(delete(Tenant).where(Tenant.id.in_(tenant_ids)))
+        db.commit()
+    return len(tenant_ids)
+
+def seed(args) -> dict:
+    rng = random.Random(args.seed)
+    np_rng = np.random.default_rng(args.seed)
+    embed_many = None
+    if args.vectors == "model":
+        from app.services.vector_service import embedding_engine
+        embed_many = embedding_engine.embed_many
+
+    report = {"tenants": [], "entries": 0, "seconds": 0.0}
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        report["removed_tenants"] = reset(db)
+        for tenant_index in range(1, args.tenants + 1):
+            vertical_name = list(VERTICALS)[(tenant_index - 1) % len(VERTICALS)]
+            vertical = VERTICALS[vertical_name]
+            tenant_id = db.execute(insert(Tenant).returning(Tenant.id), {
+                "name": f"{BENCH_TENANT_PREFIX}{tenant_index}", "domain": f"bench-{tenant_index}.example",
+            }).scalar_one()
+            api_key = f"bench-key-{args.seed}-{tenant_index}"
+            db.execute(insert(APIKey), {"tenant_id": tenant_id, "api_key": api_key, "status": "active"})
+            # Load tests shouldn't measure the AI rate limiter unless asked to
+            db.execute(insert(ChatbotSettings), [
+                {"tenant_id": tenant_id, "setting_key": key, "setting_value": str(args.rate_limit)}
+                for key in (USER_LIMIT_SETTING, TENANT_LIMIT_SETTING)
+            ])
+            centroids = {}
+            for topic in vertical["topics"]:
+                centroid = np_rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+                centroids[topic] = centroid / np.linalg.norm(centroid)
+
+            samples = []
+            for batch_start in range(0, args.entries_per_tenant, args.batch_size):
+                rows = [make_entry(rng, vertical, tenant_index, n)
+                        for n in range(batch_start, min(batch_start + args.batch_size, args.entries_per_tenant))]
+                if embed_many:
+                    vectors = embed_many([row["content"] for row in rows])
+                else:
+                    vectors = random_vectors(np_rng, centroids, rows)
+                ids = db.execute(
+                    insert(KnowledgeBase).returning(KnowledgeBase.id, sort_by_parameter_order=True),
+                    [{k: v for k, v in row.items() if not k.startswith("_")} | {"tenant_id": tenant_id} for row in rows],
+                ).scalars().all()
+                db.execute(insert(VectorIndex), [
+                    {"tenant_id": tenant_id, "knowledge_id": knowledge_id, "embedding_vector": list(map(float, vector)),
+                     "model_used": "MiniLM" if embed_many else "synthetic", "content_hash": row["content_hash"]}
+                    for knowledge_id, vector, row in zip(ids, vectors, rows)
+                ])
+                db.commit()
+                report["entries"] += len(rows)
+                samples += [(row, vector) for row, vector in zip(rows, vectors) if rng.random() < args.sample_rate]
+                print(f"\rtenant {tenant_index}: {batch_start + len(rows)}/{args.entries_per_tenant}", end="", file=sys.stderr, flush=True)
+            print(file=sys.stderr)
+
+            rng.shuffle(samples)
+            samples = samples[:args.queries_per_tenant]
+            report["tenants"].append({
+                "tenant_id": tenant_id,
+                "vertical": vertical_name,
+                "api_key": api_key,
+                # Full-text direct matches (topic word plus the entry's unique code)
+                "kb_queries": [f"{row['_topic']} for {row['_product']} {row['_code']}" for row, _ in samples],
+                # Same topic wording without the code: misses full-text, exercises embedding + vector search
+                "semantic_queries": [f"how does {row['_topic']} work for my {row['_product']}" for row, _ in samples],
+                # Nothing in the knowledge base matches: goes to the cache/LLM path
+                "llm_queries": [f"tell me about {rng.choice(OFF_TOPIC)} {rng.choice(OFF_TOPIC)} {rng.randint(1, 10**6)}" for _ in samples],
+                # Noisy copies of stored vectors for the vector-search micro-benchmark
+                "query_vectors": [[round(float(x), 5) for x in vector + 0.1 * np_rng.standard_normal(EMBEDDING_DIM)] for _, vector in samples[:50]],
+            })
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    report["rows_per_second"] = round(report["entries"] / report["seconds"], 1) if report["seconds"] else 0.0
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a synthetic multi-tenant knowledge base for benchmarks.")
+    parser.add_argument("--tenants", type=int, default=3)
+    parser.add_argument("--entries-per-tenant", type=int, default=10000)
+    parser.add_argument("--vectors", choices=("random", "model"), default="random",
+                        help="'random' writes clustered synthetic vectors (fast, any scale); 'model' embeds the text")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--queries-per-tenant", type=int, default=200)
+    parser.add_argument("--sample-rate", type=float, default=0.05, help="Fraction of entries considered for the query file")
+    parser.add_argument("--rate-limit", type=int, default=1000000, help="Per-minute AI limits stored for the bench tenants")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--queries-out", default=os.path.join(RESULTS_DIR, "queries.json"))
+    parser.add_argument("--reset-only", action="store_true", help="Remove benchmark tenants and exit")
+    args = parser.parse_args()
+
+    if args.reset_only:
+        with SessionLocal() as db:
+            print({"removed_tenants": reset(db)})
+        return
+    report = seed(args)
+    os.makedirs(os.path.dirname(os.path.abspath(args.queries_out)), exist_ok=True)
+    with open(args.queries_out, "w", encoding="utf-8") as queries_file:
+        json.dump({"seed": args.seed, "tenants": report["tenants"]}, queries_file)
+    print(json.dumps({k: v for k, v in report.items() if k != "tenants"} | {"queries_file": args.queries_out}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Local stand-in for the OpenRouter chat completions API.
+
+Answers both plain and streaming (SSE) requests after a configurable delay,
+so load tests measure our pipeline rather than a remote model.
+    python -m benchmarks.stub_openrouter --port 8099 --latency-ms 400 --tokens 60 --token-interval-ms 15
+To exercise model fallback, make one model slow or failing:
+    python -m benchmarks.stub_openrouter --degrade-model mistralai/mistral-small-3.1-24b-instruct --degraded-latency-ms 20000
+Then start the API with OPENROUTER_API_URL=http://127.0.0.1:8099/api/v1/chat/completions.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+WORDS = "the order ships within two business days and you can track it from your account page at any time".split()
+
+def build_app(latency_ms: float, jitter_ms: float, tokens: int, token_interval_ms: float, error_rate: float, seed: int,
+              degrade_model: str = None, degraded_latency_ms: float = None, degraded_error_rate: float = None) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    stats = {"requests": 0, "streamed": 0, "errors": 0, "by_model": {}}
+
+    def completion_tokens() -> list:
+        return [WORDS[i % len(WORDS)] + " " for i in range(tokens)]
+
+    def usage(body: dict) -> dict:
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": tokens, "total_tokens": prompt_tokens + tokens}
+
+    @app.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        stats["by_model"][body.get("model")] = stats["by_model"].get(body.get("model"), 0) + 1
+        degraded = degrade_model is not None and body.get("model") == degrade_model
+        delay_ms = degraded_latency_ms if degraded and degraded_latency_ms is not None else latency_ms
+        failure_rate = degraded_error_rate if degraded and degraded_error_rate is not None else error_rate
+        await asyncio.sleep(max(0.0, delay_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000)
+        if rng.random() < failure_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"message": "stub upstream error"}}, status_code=502)
+        created = int(time.time())
+        if not body.get("stream"):
+            return {
+                "id": f"stub-{stats['requests']}", "object": "chat.completion", "created": created, "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(completion_tokens()).strip()}, "finish_reason": "stop"}],
+                "usage": usage(body),
+            }
+
+        async def events():
+            stats["streamed"] += 1
+            yield ": OPENROUTER PROCESSING\n\n"
+            for token in completion_tokens():
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "created": created, "model": body.get("model"),
+                         "choices": [{"index": 0, "delta": {"content": token}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(token_interval_ms / 1000)
+            final = {"id": "stub", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage(body)}
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenRouter server with configurable latency and token streaming.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Delay before the first byte")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--tokens", type=int, default=50, help="Completion length in tokens")
+    parser.add_argument("--token-interval-ms", type=float, default=10, help="Gap between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 502")
+    parser.add_argument("--degrade-model", help="Model name that gets the degraded latency/error rate below")
+    parser.add_argument("--degraded-latency-ms", type=float)
+    parser.add_argument("--degraded-error-rate", type=float)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    app = build_app(args.latency_ms, args.jitter_ms, args.tokens, args.token_interval_ms, args.error_rate, args.seed,
+                    args.degrade_model, args.degraded_latency_ms, args.degraded_error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
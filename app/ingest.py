@@ -0,0 +1,42 @@
+"""Bulk knowledge base ingestion.
+
+Usage (from the app directory):
+    python ingest.py docs.jsonl --tenant-id 1
+    python ingest.py faq.md --tenant-id 2 --category FAQ
+"""
+import argparse
+import os
+import sys
+from app.database import SessionLocal
+from app.services.ingestion_service import ingest_documents, parse_records, detect_format, IngestionError, INGEST_FORMATS, INGEST_BATCH_SIZE
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk, embed and bulk-load documents into the knowledge base.")
+    parser.add_argument("path", help="Input file (.jsonl, .csv, .md or plain text); '-' reads stdin")
+    parser.add_argument("--tenant-id", type=int, default=None)
+    parser.add_argument("--format", choices=INGEST_FORMATS, default=None, help="Defaults to the file extension")
+    parser.add_argument("--category", default=None)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    title = os.path.splitext(os.path.basename(args.path))[0] if args.path != "-" else "stdin"
+
+    def progress(report):
+        print(f"\r{report['documents']} docs, {report['chunks']} chunks, {report['chunks_per_second']} chunks/s",
+              end="", file=sys.stderr, flush=True)
+
+    stream = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8", newline="")
+    with stream, SessionLocal() as db:
+        documents = parse_records(stream, fmt, default_title=title, category=args.category)
+        try:
+            report = ingest_documents(db, documents, args.tenant_id, batch_size=args.batch_size, progress=progress)
+        except IngestionError as exc:
+            print(file=sys.stderr)
+            sys.exit(f"Ingestion failed ({exc}); already committed: "
+                     f"{exc.report['committed_documents']} documents, {exc.report['committed_chunks']} chunks")
+    print(file=sys.stderr)
+    print(report)
+
+if __name__ == "__main__":
+    main()
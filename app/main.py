@@ -1,16 +1,78 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends
+from app.database import dispose_engines
+from app.http_client import close_http_client
+from app.services.vector_service import warm_up_embeddings
+from app.services.prompt_builder import token_counter
+from app.services.sync_service import run_worker
+from app.services.rollup_service import run_worker as run_rollup_worker
+from app.services.log_writer import chat_log_writer
+from app.services.session_memory import session_memory
+from app.services.settings_cache import settings_cache
+from app.services.change_listener import change_listener
+from app.services.api_key_service import api_key_cache, require_api_key
+from app.services.metrics import system_sampler
+from app.routes.auth import router as auth_router
 from app.routes.chatbot import router as chatbot_router
 from app.routes.knowledge_base import router as knowledge_router
 from app.routes.vector_search import router as vector_router
 from app.routes.system_monitoring import router as monitoring_router
+from app.routes.analytics import router as analytics_router
 
-app = FastAPI()
+# Load the embedding model before serving instead of on the first request
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "false").lower() == "true"
+# Run an embedding sync worker thread inside the API process (otherwise use sync_worker.py)
+EMBEDDING_SYNC_IN_PROCESS = os.getenv("EMBEDDING_SYNC_IN_PROCESS", "false").lower() == "true"
+# Run the chat log partition/rollup worker inside the API process (otherwise use rollup_worker.py)
+CHAT_ROLLUP_IN_PROCESS = os.getenv("CHAT_ROLLUP_IN_PROCESS", "false").lower() == "true"
+# Load every tenant's chatbot settings at startup instead of on first use
+SETTINGS_CACHE_WARMUP = os.getenv("SETTINGS_CACHE_WARMUP", "false").lower() == "true"
+
+logger = logging.getLogger("uvicorn.error")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if EMBEDDING_WARMUP:
+        report = await asyncio.to_thread(warm_up_embeddings)
+        logger.info("Embedding backend ready: %s", report)
+        await asyncio.to_thread(token_counter.load)
+        logger.info("Prompt tokenizer ready: %s", token_counter.report)
+    system_sampler.start()
+    await chat_log_writer.start()
+    if SETTINGS_CACHE_WARMUP:
+        await settings_cache.warm_up()
+    await change_listener.start()
+    await api_key_cache.start()
+    await session_memory.start()
+    stop_sync = threading.Event()
+    if EMBEDDING_SYNC_IN_PROCESS:
+        threading.Thread(target=run_worker, args=(stop_sync,), name="embedding-sync", daemon=True).start()
+    if CHAT_ROLLUP_IN_PROCESS:
+        threading.Thread(target=run_rollup_worker, args=(stop_sync,), name="chat-rollups", daemon=True).start()
+    yield
+    stop_sync.set()
+    system_sampler.stop()
+    await change_listener.stop()
+    await session_memory.stop()
+    await api_key_cache.stop()  # Write pending last_used timestamps
+    await chat_log_writer.stop()  # Flush buffered chat logs before the engine goes away
+    # Release pooled outbound and database connections on shutdown
+    await close_http_client()
+    await dispose_engines()
+
+app = FastAPI(lifespan=lifespan)
 
 # Register API Routes
-app.include_router(chatbot_router, prefix="/chatbot", tags=["Chatbot"])
+app.include_router(auth_router)
+app.include_router(chatbot_router, prefix="/chatbot", tags=["Chatbot"], dependencies=[Depends(require_api_key)])
 app.include_router(knowledge_router, prefix="/knowledge-base", tags=["Knowledge Base"])
-app.include_router(vector_router, prefix="/vector-search", tags=["Vector Search"])
+app.include_router(vector_router, prefix="/vector-search", tags=["Vector Search"], dependencies=[Depends(require_api_key)])
 app.include_router(monitoring_router, prefix="/system", tags=["System Monitoring"])
+app.include_router(analytics_router, prefix="/analytics", tags=["Analytics"])
 
 @app.get("/")
 def root():
@@ -0,0 +1,22 @@
+"""Chat log maintenance worker: keeps monthly chat_logs partitions ahead, drops expired ones,
+and maintains the hourly rollups the analytics endpoints read.
+
+Run one next to the API (from the app directory):
+    python rollup_worker.py
+Extra copies are harmless: runs are serialized with a Postgres advisory lock.
+"""
+import logging
+import signal
+import threading
+from app.services.rollup_service import run_worker
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+    logging.getLogger(__name__).info("Chat log rollup worker started")
+    run_worker(stop_event)
+
+if __name__ == "__main__":
+    main()
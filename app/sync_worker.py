@@ -0,0 +1,21 @@
+"""Embedding sync worker: drains the embedding_jobs queue and re-embeds changed entries.
+
+Run one or more of these next to the API (from the app directory):
+    python sync_worker.py
+Workers coordinate through FOR UPDATE SKIP LOCKED, so any number can run at once.
+"""
+import logging
+import signal
+import threading
+from app.services.sync_service import run_worker
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_event.set())
+    logging.getLogger(__name__).info("Embedding sync worker started")
+    run_worker(stop_event)
+
+if __name__ == "__main__":
+    main()
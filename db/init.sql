@@ -32,9 +32,19 @@ CREATE TABLE knowledge_base (
     file_url TEXT,  -- Stores document location (Hetzner S3)
     category VARCHAR(100),
     source VARCHAR(50) CHECK (source IN ('manual', 'ai_generated')),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    content_hash VARCHAR(64), -- sha256 of content; drives re-embedding
+    -- Weighted full-text document (title ranks above content) for the direct-match step;
+    -- the config must match TEXT_SEARCH_CONFIG in app/models.py, which the queries use
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED
 );
 
+CREATE INDEX idx_knowledge_base_search ON knowledge_base USING GIN (search_vector);
+CREATE INDEX idx_knowledge_base_tenant ON knowledge_base (tenant_id, id);
+
 -- Vector Index Table (For AI Retrieval)
 CREATE TABLE vector_index (
     id SERIAL PRIMARY KEY,
@@ -42,18 +52,57 @@ CREATE TABLE vector_index (
     knowledge_id INT REFERENCES knowledge_base(id) ON DELETE CASCADE,
     embedding_vector VECTOR(384), -- OpenAI Embedding Size
     model_used VARCHAR(100),
+    content_hash VARCHAR(64), -- Hash of the knowledge content this vector was built from
     last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Approximate nearest-neighbour index (cosine) plus tenant filter index
+CREATE INDEX idx_vector_index_embedding_hnsw ON vector_index
+    USING hnsw (embedding_vector vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+CREATE INDEX idx_vector_index_tenant ON vector_index (tenant_id);
+CREATE INDEX idx_vector_index_knowledge ON vector_index (knowledge_id);
+
+-- Embedding Jobs (durable re-embedding queue, drained with FOR UPDATE SKIP LOCKED)
+CREATE TABLE embedding_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    tenant_id INT,
+    knowledge_id INT NOT NULL,
+    status VARCHAR(20) CHECK (status IN ('pending', 'failed')) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    available_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_embedding_jobs_pending ON embedding_jobs (available_at) WHERE status = 'pending';
+
 -- Chatbot Settings (Tenant-Specific)
 CREATE TABLE chatbot_settings (
     id SERIAL PRIMARY KEY,
     tenant_id INT REFERENCES tenants(id) ON DELETE CASCADE,
-    setting_key VARCHAR(255) UNIQUE NOT NULL,
-    setting_value TEXT NOT NULL
+    setting_key VARCHAR(255) NOT NULL,
+    setting_value TEXT NOT NULL,
+    UNIQUE (tenant_id, setting_key)
+);
+
+-- Rate Limit Counters (sliding-window counters shared by all API workers)
+CREATE UNLOGGED TABLE rate_limit_counters (
+    bucket_key VARCHAR(255) NOT NULL,
+    window_start BIGINT NOT NULL, -- Unix time of the window start
+    hits INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket_key, window_start)
+);
+
+-- Conversation memory shared by all API workers (SESSION_MEMORY_BACKEND=postgres)
+CREATE UNLOGGED TABLE chat_sessions (
+    session_key TEXT PRIMARY KEY, -- JSON of (tenant_id, user_id, session_id)
+    state JSONB NOT NULL,
+    expires_at TIMESTAMP NOT NULL
 );
 
+CREATE INDEX idx_chat_sessions_expires ON chat_sessions (expires_at);
+
 -- API Keys Table (For Secure Access)
 CREATE TABLE api_keys (
     id SERIAL PRIMARY KEY,
@@ -66,17 +115,68 @@ CREATE TABLE api_keys (
     expires_at TIMESTAMP
 );
 
--- Chat Logs Table (For Tracking Conversations)
+-- Chat Logs Table (For Tracking Conversations), partitioned by month so retention drops whole partitions
 CREATE TABLE chat_logs (
-    id SERIAL PRIMARY KEY,
+    id BIGSERIAL,
     tenant_id INT REFERENCES tenants(id) ON DELETE CASCADE,
     user_id INT REFERENCES users(id) ON DELETE SET NULL,
     message TEXT NOT NULL,
     response TEXT NOT NULL,
-    source VARCHAR(50) CHECK (source IN ('knowledge_base', 'ai_model')) NOT NULL,
+    source VARCHAR(50) CHECK (source IN ('knowledge_base', 'vector_search', 'hybrid_search', 'cached_ai_response', 'ai_model')) NOT NULL,
     user_feedback VARCHAR(10) CHECK (user_feedback IN ('positive', 'neutral', 'negative')),
     intent_detected VARCHAR(255),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at) -- The partition key has to be part of the primary key
+) PARTITION BY RANGE (created_at);
+
+-- Catches rows for months without a partition; the rollup worker moves them out when it creates one
+CREATE TABLE chat_logs_default PARTITION OF chat_logs DEFAULT;
+
+-- This month and the next two; the rollup worker keeps creating partitions ahead (CHAT_LOG_PARTITIONS_AHEAD)
+DO $$
+DECLARE
+    month_start TIMESTAMP;
+BEGIN
+    FOR i IN 0..2 LOOP
+        month_start := date_trunc('month', CURRENT_TIMESTAMP AT TIME ZONE 'UTC') + make_interval(months => i);
+        EXECUTE format('CREATE TABLE chat_logs_p%s PARTITION OF chat_logs FOR VALUES FROM (%L) TO (%L)',
+                       to_char(month_start, 'YYYY_MM'), month_start, month_start + INTERVAL '1 month');
+    END LOOP;
+END $$;
+
+-- Keyset pagination of history/log listings (newest first)
+CREATE INDEX idx_chat_logs_tenant_user ON chat_logs (tenant_id, user_id, created_at, id);
+CREATE INDEX idx_chat_logs_user ON chat_logs (user_id, created_at, id);
+CREATE INDEX idx_chat_logs_tenant_created ON chat_logs (tenant_id, created_at);
+-- Time-range scans (rollups) over append-ordered rows
+CREATE INDEX idx_chat_logs_created ON chat_logs USING BRIN (created_at);
+
+-- Hourly chat log aggregates per tenant and answer source (tenant 0 = no tenant), kept by the rollup worker.
+-- Analytics endpoints read only these, and they outlive the chat_logs retention window.
+CREATE TABLE chat_log_rollups (
+    tenant_id INT NOT NULL,
+    bucket TIMESTAMP NOT NULL, -- Start of the hour (UTC)
+    source VARCHAR(50) NOT NULL,
+    requests INT NOT NULL,
+    positive_feedback INT NOT NULL,
+    neutral_feedback INT NOT NULL,
+    negative_feedback INT NOT NULL,
+    PRIMARY KEY (tenant_id, bucket, source)
+);
+
+CREATE TABLE chat_intent_rollups (
+    tenant_id INT NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    intent VARCHAR(255) NOT NULL,
+    requests INT NOT NULL,
+    PRIMARY KEY (tenant_id, bucket, intent)
+);
+
+-- Rollup watermark: aggregates are complete for logs created before rolled_up_to
+CREATE TABLE chat_log_rollup_state (
+    name VARCHAR(50) PRIMARY KEY,
+    rolled_up_to TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Insert Dummy Tenants
@@ -118,7 +218,9 @@ INSERT INTO vector_index (tenant_id, knowledge_id, embedding_vector, model_used)
 INSERT INTO chatbot_settings (tenant_id, setting_key, setting_value) VALUES
     (1, 'greeting_message', 'Welcome to our store! How can I assist you?'),
     (2, 'greeting_message', 'Hello! How can we help you today?'),
-    (3, 'greeting_message', 'Welcome to the healthcare chatbot. How can I assist?');
+    (3, 'greeting_message', 'Welcome to the healthcare chatbot. How can I assist?'),
+    (1, 'rate_limit_user_per_minute', '5'),
+    (1, 'rate_limit_tenant_per_minute', '300');
 
 -- Insert Dummy API Keys
 INSERT INTO api_keys (tenant_id, user_id, api_key, status) VALUES